@@ -19,8 +19,41 @@ FIREBASE_CLIENT_EMAIL = os.getenv("FIREBASE_CLIENT_EMAIL")
 DEBUG = os.getenv("DEBUG", "True") == "True"
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 
+# Facial Recognition
+FACIAL_DATA_PATH = os.getenv("FACIAL_DATA_PATH")
+# Despliegue solo de autenticación (contraseña/2FA/huella): nunca carga los modelos de visión
+AUTH_ONLY_MODE = os.getenv("AUTH_ONLY_MODE", "False") == "True"
+# "inline" ejecuta el pipeline facial en el proceso de la API; "worker" lo delega
+# al servicio de inferencia (`python -m app.facial_worker`)
+FACIAL_INFERENCE_MODE = os.getenv("FACIAL_INFERENCE_MODE", "inline")
+FACIAL_WORKER_ADDRESS = os.getenv("FACIAL_WORKER_ADDRESS", "127.0.0.1:50055")
+# Clave compartida del broker (obligatoria en modo worker, sin valor por defecto): el broker
+# deserializa lo que recibe, así que quien conozca la clave puede ejecutar código en él
+FACIAL_WORKER_AUTHKEY = os.getenv("FACIAL_WORKER_AUTHKEY", "")
+FACIAL_WORKER_TIMEOUT = float(os.getenv("FACIAL_WORKER_TIMEOUT", "60"))
+
 # Intermediary (fingerprint service)
 INTERMEDIARY_URL = os.getenv("INTERMEDIARY_URL", "http://localhost:9000")
+# Cliente HTTP compartido (pool de conexiones keep-alive) hacia el intermediary-app
+INTERMEDIARY_MAX_CONNECTIONS = int(os.getenv("INTERMEDIARY_MAX_CONNECTIONS", "20"))
+INTERMEDIARY_MAX_KEEPALIVE = int(os.getenv("INTERMEDIARY_MAX_KEEPALIVE", "10"))
+INTERMEDIARY_KEEPALIVE_EXPIRY = float(os.getenv("INTERMEDIARY_KEEPALIVE_EXPIRY", "30"))
+INTERMEDIARY_CONNECT_TIMEOUT = float(os.getenv("INTERMEDIARY_CONNECT_TIMEOUT", "3"))
+# HTTP/2 requiere el paquete `h2` y un intermediary (o proxy TLS) que lo hable
+INTERMEDIARY_HTTP2 = os.getenv("INTERMEDIARY_HTTP2", "False") == "True"
+# Formato de las plantillas en register/verify: "msgpack" (bytes crudos) o "json" (base64)
+INTERMEDIARY_TRANSPORT = os.getenv("INTERMEDIARY_TRANSPORT", "msgpack")
+# Verify envía solo los hashes de las plantillas (el intermediary las guarda en caché);
+# si le faltan responde 409 y se reenvían completas
+INTERMEDIARY_VERIFY_BY_HASH = os.getenv("INTERMEDIARY_VERIFY_BY_HASH", "True") == "True"
+# Sincronización en segundo plano de las plantillas de Mongo con la librería del sensor AS608
+# del intermediary: cada cuántos segundos y cuántas plantillas por petición
+AS608_SYNC_ENABLED = os.getenv("AS608_SYNC_ENABLED", "False") == "True"
+AS608_SYNC_INTERVAL = float(os.getenv("AS608_SYNC_INTERVAL", "60"))
+AS608_SYNC_BATCH = int(os.getenv("AS608_SYNC_BATCH", "50"))
+# Caché 1:N del ZK9500 en el intermediary (`/identify`) al día con Mongo: al arrancar y cada N segundos
+ZK_CACHE_SYNC_ENABLED = os.getenv("ZK_CACHE_SYNC_ENABLED", "True") == "True"
+ZK_CACHE_SYNC_INTERVAL = float(os.getenv("ZK_CACHE_SYNC_INTERVAL", "300"))
 
 # WebAuthn / Passkeys
 WEBAUTHN_RP_ID = "localhost"
@@ -0,0 +1,191 @@
+"""
+Servicio de inferencia facial separado de la API.
+
+Un broker (un `BaseManager` de multiprocessing servido por TCP) mantiene una
+cola de trabajos compartida y una cola de resultados por cliente, que el
+cliente libera al cerrarse (`clients().release`). Los workers
+cargan `FacialRecognitionService` una sola vez y consumen trabajos de la cola;
+la API (`FACIAL_INFERENCE_MODE=worker`) encola y espera el resultado sin cargar
+ningún modelo.
+
+    # broker + 2 workers
+    python -m app.facial_worker --workers 2
+    # workers adicionales (otra máquina o contenedor) contra un broker existente
+    python -m app.facial_worker --connect 10.0.0.5:50055 --workers 4
+
+El broker deserializa (pickle) lo que recibe de cualquier cliente autenticado,
+así que `FACIAL_WORKER_AUTHKEY` es obligatoria y debe ser secreta: sin ella ni
+el broker ni los workers arrancan. Expón el puerto solo en una red interna.
+"""
+import argparse
+import multiprocessing
+import queue
+import threading
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+from fastapi import HTTPException
+from loguru import logger
+from app.config import FACIAL_WORKER_ADDRESS, FACIAL_WORKER_AUTHKEY
+
+# Métodos de FacialRecognitionService que se pueden invocar remotamente
+ALLOWED_METHODS = {
+    "detect_face_in_image",
+    "verify_face",
+    "verify_login_biometrics",
+    "check_facial_uniqueness",
+    "save_facial_image",
+    "get_user_facial_images",
+}
+
+
+class FacialQueueManager(BaseManager):
+    pass
+
+
+FacialQueueManager.register("jobs")
+FacialQueueManager.register("results")
+FacialQueueManager.register("clients")
+
+
+# Longitud mínima de la clave del broker
+MIN_AUTHKEY_LENGTH = 16
+
+# Colas de resultados (proxies) que conserva cada worker; las de clientes que ya no
+# envían trabajos se sueltan y el broker puede liberarlas
+WORKER_RESULT_QUEUES_MAX = 64
+
+
+def require_authkey(authkey: str | None) -> bytes:
+    """Clave del broker en bytes; falla si no está definida o es demasiado corta."""
+    if not authkey:
+        raise RuntimeError(
+            "FACIAL_WORKER_AUTHKEY no definida: el broker de inferencia facial necesita una clave secreta propia")
+    if len(authkey) < MIN_AUTHKEY_LENGTH:
+        raise RuntimeError(f"FACIAL_WORKER_AUTHKEY demasiado corta (mínimo {MIN_AUTHKEY_LENGTH} caracteres)")
+    return authkey.encode()
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def connect(address: str = FACIAL_WORKER_ADDRESS, authkey: str = FACIAL_WORKER_AUTHKEY) -> FacialQueueManager:
+    manager = FacialQueueManager(address=parse_address(address), authkey=require_authkey(authkey))
+    manager.connect()
+    return manager
+
+
+def run_worker(address: str, authkey: str) -> None:
+    """Bucle de un worker: carga los modelos una vez y procesa trabajos hasta recibir None."""
+    from app.services.facial_recognition_service import FacialRecognitionService
+
+    service = FacialRecognitionService()
+    manager = connect(address, authkey)
+    jobs = manager.jobs()
+    result_queues: OrderedDict = OrderedDict()
+    logger.info(f"[FACIAL-WORKER] Listo, consumiendo trabajos de {address}")
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        client_id, job_id, method, args = job
+        try:
+            if method not in ALLOWED_METHODS:
+                raise ValueError(f"Método no permitido: {method}")
+            reply = (job_id, "ok", getattr(service, method)(*args))
+        except HTTPException as exc:
+            reply = (job_id, "http_error", (exc.status_code, exc.detail))
+        except Exception as exc:  # noqa: BLE001
+            reply = (job_id, "error", f"{type(exc).__name__}: {exc}")
+
+        results = result_queues.get(client_id)
+        if results is None:
+            results = result_queues[client_id] = manager.results(client_id)
+            if len(result_queues) > WORKER_RESULT_QUEUES_MAX:
+                result_queues.popitem(last=False)
+        else:
+            result_queues.move_to_end(client_id)
+        results.put(reply)
+
+
+class ClientRegistry:
+    """Colas de resultados del broker, una por cliente, hasta que el cliente la libera."""
+
+    def __init__(self):
+        self._results: dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+
+    def results(self, client_id: str) -> queue.Queue:
+        with self._lock:
+            if client_id not in self._results:
+                self._results[client_id] = queue.Queue()
+            return self._results[client_id]
+
+    def release(self, client_id: str) -> bool:
+        """Olvida la cola de `client_id`; se libera cuando los proxies que la usan se cierran."""
+        with self._lock:
+            return self._results.pop(client_id, None) is not None
+
+
+def serve(address: str, authkey: str, workers: int) -> None:
+    """Arranca el broker en este proceso y `workers` procesos worker hijos."""
+    jobs: queue.Queue = queue.Queue()
+    clients = ClientRegistry()
+
+    class _BrokerManager(BaseManager):
+        pass
+
+    _BrokerManager.register("jobs", callable=lambda: jobs)
+    _BrokerManager.register("results", callable=clients.results)
+    _BrokerManager.register("clients", callable=lambda: clients)
+    server = _BrokerManager(address=parse_address(address), authkey=require_authkey(authkey)).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"[FACIAL-WORKER] Broker escuchando en {address}")
+
+    processes = start_workers(address, authkey, workers)
+    try:
+        for proc in processes:
+            proc.join()
+    except KeyboardInterrupt:
+        for _ in processes:
+            jobs.put(None)
+        for proc in processes:
+            proc.join(timeout=10)
+
+
+def start_workers(address: str, authkey: str, workers: int) -> list:
+    # spawn: cada worker arranca limpio en lugar de heredar hilos de torch por fork
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for idx in range(workers):
+        proc = ctx.Process(target=run_worker, args=(address, authkey),
+                           name=f"facial-worker-{idx}", daemon=False)
+        proc.start()
+        processes.append(proc)
+    return processes
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Servicio de inferencia facial")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos worker a lanzar")
+    parser.add_argument("--bind", default=FACIAL_WORKER_ADDRESS, help="host:puerto del broker")
+    parser.add_argument("--connect", help="Solo lanzar workers contra un broker existente (host:puerto)")
+    args = parser.parse_args(argv)
+    try:
+        require_authkey(FACIAL_WORKER_AUTHKEY)
+    except RuntimeError as exc:
+        parser.error(str(exc))
+
+    if args.connect:
+        processes = start_workers(args.connect, FACIAL_WORKER_AUTHKEY, args.workers)
+        for proc in processes:
+            proc.join()
+    else:
+        serve(args.bind, FACIAL_WORKER_AUTHKEY, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,42 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.config import DEBUG, ENVIRONMENT
+from loguru import logger
+from app.config import AUTH_ONLY_MODE, DEBUG, ENVIRONMENT
 from app.routes import auth, users, facial
+from app.services.facial_inference import close_facial_inference
+from app.services.fingerprint_templates import FingerprintTemplateRepository
+from app.services.intermediary_client import close_intermediary_client, open_intermediary_client
+from app.services.sensor_sync import get_sensor_sync
+from app.services.template_cache_sync import get_template_cache_sync
+
+
+async def _ensure_indexes() -> None:
+    try:
+        await FingerprintTemplateRepository.ensure_indexes()
+    except Exception as exc:  # noqa: BLE001 - Mongo caído no debe impedir el arranque
+        logger.warning(f"No se pudieron crear los índices de Mongo: {exc}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Un cliente HTTP por proceso hacia el intermediary-app (conexiones keep-alive reutilizadas)
+    await open_intermediary_client()
+    # En segundo plano: si Mongo no responde, el arranque no espera al timeout del driver
+    indexes = asyncio.create_task(_ensure_indexes())
+    # Librería del sensor AS608 al día con Mongo (AS608_SYNC_ENABLED)
+    # Y la caché 1:N del ZK9500 (ZK_CACHE_SYNC_ENABLED): se rellena al arrancar
+    syncs = [sync for sync in (get_sensor_sync(), get_template_cache_sync()) if sync is not None]
+    for sync in syncs:
+        sync.start()
+    yield
+    indexes.cancel()
+    for sync in syncs:
+        await sync.stop()
+    await close_intermediary_client()
+    await close_facial_inference()
+
 
 app = FastAPI(
     title="SFS Login Backend",
@@ -9,6 +44,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -34,11 +70,12 @@ app.add_middleware(
 
 app.include_router(auth.router)
 app.include_router(users.router)
-app.include_router(facial.router)
+if not AUTH_ONLY_MODE:
+    app.include_router(facial.router)
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "environment": ENVIRONMENT, "version": "1.0.0"}
+    return {"status": "healthy", "environment": ENVIRONMENT, "version": "1.0.0", "auth_only": AUTH_ONLY_MODE}
 
 @app.get("/")
 async def root():
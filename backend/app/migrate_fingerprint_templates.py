@@ -0,0 +1,61 @@
+"""
+Migra las plantillas de huella del documento del usuario a `fingerprint_templates`.
+
+Antes cada usuario guardaba `fingerprint_templates` (lista de plantillas en
+base64, ~70 KB cada una) y `fingerprint_template_hashes` dentro de su propio
+documento. Este script decodifica esas plantillas, las inserta como BSON
+Binary en la colección `fingerprint_templates` (un documento por plantilla,
+índice por usuario) y borra los dos campos del documento del usuario. Es
+idempotente: los usuarios ya migrados no tienen los campos y se saltan.
+
+    python -m app.migrate_fingerprint_templates --dry-run
+    python -m app.migrate_fingerprint_templates
+"""
+import argparse
+import asyncio
+import base64
+
+import bson
+
+from app.mongo import LEGACY_TEMPLATE_FIELDS, db
+from app.services.fingerprint_templates import COLLECTION, FingerprintTemplateRepository
+
+
+async def migrate(dry_run: bool = False) -> dict:
+    if not dry_run:
+        await FingerprintTemplateRepository.ensure_indexes()
+
+    users = db["users"]
+    stats = {"users": 0, "templates": 0, "bytes_before": 0, "bytes_after": 0}
+    cursor = users.find({"fingerprint_templates": {"$exists": True}})
+    async for user in cursor:
+        user_id = user["_id"]
+        templates = [base64.b64decode(t) for t in user.get("fingerprint_templates") or []]
+        slim = {k: v for k, v in user.items() if k not in LEGACY_TEMPLATE_FIELDS}
+        stats["users"] += 1
+        stats["templates"] += len(templates)
+        stats["bytes_before"] += len(bson.encode(user))
+        stats["bytes_after"] += len(bson.encode(slim))
+        if dry_run:
+            continue
+        await FingerprintTemplateRepository.import_legacy(user_id, templates)
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=f"Migra las plantillas de huella a la colección `{COLLECTION}`")
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar usuarios, plantillas y tamaños")
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(migrate(dry_run=args.dry_run))
+    users = stats["users"]
+    print(f"{'[dry-run] ' if args.dry_run else ''}Usuarios con plantillas en el documento: {users}, "
+          f"plantillas: {stats['templates']}")
+    if users:
+        print(f"Tamaño medio del documento de usuario: {stats['bytes_before'] // users} B "
+              f"-> {stats['bytes_after'] // users} B")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
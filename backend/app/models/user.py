@@ -25,7 +25,6 @@ class UserInDB(UserBase):
     two_factor_enabled: bool = False
     facial_recognition_enabled: bool = False
     fingerprint_enabled: bool = False
-    fingerprint_templates: list[str] = []
     created_at: datetime
     updated_at: Optional[datetime] = None
 
@@ -36,7 +35,6 @@ class UserResponse(UserBase):
     two_factor_enabled: bool
     facial_recognition_enabled: bool
     fingerprint_enabled: bool
-    fingerprint_templates: list[str] = []
     created_at: datetime
 
     class Config:
@@ -9,3 +9,9 @@ MONGODB_DB = os.getenv("MONGODB_DB", "secure_project")
 
 client = AsyncIOMotorClient(MONGODB_URI)
 db = client[MONGODB_DB]
+
+# Plantillas de huella que antes se guardaban (en base64) dentro del documento
+# del usuario; ahora viven en la colección `fingerprint_templates`. Toda lectura
+# de `users` las excluye por si quedan documentos sin migrar.
+LEGACY_TEMPLATE_FIELDS = ("fingerprint_templates", "fingerprint_template_hashes")
+USER_PROJECTION = {field: 0 for field in LEGACY_TEMPLATE_FIELDS}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from app.schemas.user_schema import (
     UserRegisterSchema,
     UserLoginSchema,
@@ -15,16 +15,13 @@ from app.schemas.two_factor_schema import (
 )
 from app.schemas.fingerprint_schema import FingerprintVerifyResponse
 from app.services.auth_service import AuthService
-from app.services.facial_recognition_service import FacialRecognitionService
+from app.services.facial_inference import FacialInference, get_facial_inference
 from app.services.two_factor_service import TwoFactorService
 from app.services.fingerprint_service import FingerprintService
 import base64
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
-# Instanciar servicios
-facial_service = FacialRecognitionService()
-
 
 @router.post("/register", response_model=RegistrationFlowResponseSchema, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserRegisterSchema):
@@ -66,6 +63,7 @@ async def verify_facial_for_login(
     facial_data: FacialCaptureSchema,
     user_id: str = Query(...,
                          description="ID del usuario que intenta hacer login"),
+    facial_service: FacialInference = Depends(get_facial_inference),
 ):
     try:
         image_bytes = base64.b64decode(facial_data.image_base64)
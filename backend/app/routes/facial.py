@@ -5,20 +5,18 @@ from app.schemas.facial_schema import (
     FacialDetectionResponseSchema,
     FacialVerificationResponseSchema
 )
-from app.services.facial_recognition_service import FacialRecognitionService
+from app.services.facial_inference import FacialInference, get_facial_inference
 from app.core.security import get_current_user
 import base64
 
 router = APIRouter(prefix="/api/facial", tags=["Facial Recognition"])
 
-# Instanciar servicio
-facial_service = FacialRecognitionService()
-
 
 @router.post("/capture", response_model=dict)
 async def capture_facial_image(
     facial_data: FacialCaptureSchema,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    facial_service: FacialInference = Depends(get_facial_inference),
 ):
     """
     Captura y guarda una imagen facial para el usuario autenticado
@@ -37,7 +35,7 @@ async def capture_facial_image(
         image_bytes = base64.b64decode(facial_data.image_base64)
         
         # Guardar imagen
-        filepath = facial_service.save_facial_image(
+        filepath = await facial_service.save_facial_image(
             image_bytes,
             current_user["user_id"]
         )
@@ -59,6 +57,7 @@ async def capture_facial_image(
 async def capture_facial_registration(
     facial_data: FacialCaptureSchema,
     user_id: str = Query(..., description="ID del usuario recién registrado"),
+    facial_service: FacialInference = Depends(get_facial_inference),
 ):
     """
     Captura y guarda una imagen facial durante el registro (sin autenticación)
@@ -80,7 +79,7 @@ async def capture_facial_registration(
         image_bytes = base64.b64decode(facial_data.image_base64)
         
         # ✅ NUEVA VERIFICACIÓN: Comprobar que el rostro sea único en el sistema
-        facial_uniqueness = facial_service.check_facial_uniqueness(image_bytes, exclude_user_id=user_id)
+        facial_uniqueness = await facial_service.check_facial_uniqueness(image_bytes, exclude_user_id=user_id)
         
         if not facial_uniqueness["is_unique"]:
             raise HTTPException(
@@ -91,7 +90,7 @@ async def capture_facial_registration(
             )
         
         # Guardar imagen
-        filepath = facial_service.save_facial_image(
+        filepath = await facial_service.save_facial_image(
             image_bytes,
             user_id
         )
@@ -112,7 +111,10 @@ async def capture_facial_registration(
 
 
 @router.post("/detect", response_model=FacialDetectionResponseSchema)
-async def detect_face(facial_data: FacialCaptureSchema):
+async def detect_face(
+    facial_data: FacialCaptureSchema,
+    facial_service: FacialInference = Depends(get_facial_inference),
+):
     """
     Detecta si hay un rostro en la imagen proporcionada
     
@@ -130,7 +132,7 @@ async def detect_face(facial_data: FacialCaptureSchema):
         image_bytes = base64.b64decode(facial_data.image_base64)
         
         # Detectar rostro
-        result = facial_service.detect_face_in_image(image_bytes)
+        result = await facial_service.detect_face_in_image(image_bytes)
         
         return {
             "face_detected": result["face_detected"],
@@ -151,7 +153,8 @@ async def detect_face(facial_data: FacialCaptureSchema):
 @router.post("/verify", response_model=FacialVerificationResponseSchema)
 async def verify_face(
     facial_data: FacialVerificationSchema,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    facial_service: FacialInference = Depends(get_facial_inference),
 ):
     """
     Verifica si el rostro coincide con el registrado para el usuario
@@ -171,7 +174,7 @@ async def verify_face(
         image_bytes = base64.b64decode(facial_data.image_base64)
         
         # Verificar rostro
-        result = facial_service.verify_face(
+        result = await facial_service.verify_face(
             image_bytes,
             current_user["user_id"]
         )
@@ -193,7 +196,10 @@ async def verify_face(
         )
 
 @router.post("/check-uniqueness")
-async def check_facial_uniqueness(facial_data: FacialCaptureSchema):
+async def check_facial_uniqueness(
+    facial_data: FacialCaptureSchema,
+    facial_service: FacialInference = Depends(get_facial_inference),
+):
     """
     Verifica si un rostro es único en el sistema (no pertenece a otro usuario)
     
@@ -213,7 +219,7 @@ async def check_facial_uniqueness(facial_data: FacialCaptureSchema):
         image_bytes = base64.b64decode(facial_data.image_base64)
         
         # Verificar unicidad del rostro
-        result = facial_service.check_facial_uniqueness(image_bytes)
+        result = await facial_service.check_facial_uniqueness(image_bytes)
         
         return result
     
@@ -225,7 +231,10 @@ async def check_facial_uniqueness(facial_data: FacialCaptureSchema):
 
 
 @router.get("/my-images")
-async def get_my_facial_images(current_user: dict = Depends(get_current_user)):
+async def get_my_facial_images(
+    current_user: dict = Depends(get_current_user),
+    facial_service: FacialInference = Depends(get_facial_inference),
+):
     """
     Obtiene todas las imágenes faciales guardadas del usuario autenticado
     
@@ -235,7 +244,7 @@ async def get_my_facial_images(current_user: dict = Depends(get_current_user)):
     - **images**: Lista de rutas de imágenes
     - **count**: Número de imágenes
     """
-    images = facial_service.get_user_facial_images(current_user["user_id"])
+    images = await facial_service.get_user_facial_images(current_user["user_id"])
     
     return {
         "images": images,
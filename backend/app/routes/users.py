@@ -1,7 +1,12 @@
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from app.schemas.user_schema import UserResponseSchema, UserUpdateSchema
 from app.schemas.fingerprint_schema import (
     FingerprintRegisterResponse,
+    FingerprintSensor,
     FingerprintStatusResponse,
 )
 from app.services.user_service import UserService
@@ -67,17 +72,38 @@ async def disable_facial_recognition(current_user: dict = Depends(get_current_us
 
 
 @router.post("/fingerprint/register", response_model=FingerprintRegisterResponse)
-async def register_fingerprint(current_user: dict = Depends(get_current_user)):
+async def register_fingerprint(
+    sensor: FingerprintSensor = "zk9500",
+    current_user: dict = Depends(get_current_user)
+):
     """
     Captura y guarda una plantilla de huella para el usuario autenticado
+    (`sensor=as608` registra en el sensor serie, que la guarda también en su librería)
     """
-    result = await FingerprintService.register_template(current_user["user_id"])
+    result = await FingerprintService.register_template(current_user["user_id"], sensor)
     return {
         "message": "Huella registrada correctamente",
         **result,
     }
 
 
+@router.post("/fingerprint/register/stream")
+async def register_fingerprint_stream(current_user: dict = Depends(get_current_user)):
+    """
+    Registro de huella con progreso en tiempo real (Server-Sent Events): un
+    evento por captura y `completed` con el resultado al guardar la plantilla
+    """
+    async def stream():
+        async for event in FingerprintService.register_template_stream(current_user["user_id"]):
+            if event["event"] == "completed":
+                event = {**event, "result": {"message": "Huella registrada correctamente", **event["result"]}}
+            data = json.dumps(jsonable_encoder(event), ensure_ascii=False)
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.post("/fingerprint/disable")
 async def disable_fingerprint(
     clear_templates: bool = True,
@@ -1,5 +1,8 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
+
+# Lectores con registro en el intermediary-app
+FingerprintSensor = Literal["zk9500", "as608"]
 
 
 class FingerprintRegisterResponse(BaseModel):
@@ -30,7 +30,6 @@ class UserResponseSchema(BaseModel):
     two_factor_enabled: bool
     facial_recognition_enabled: bool
     fingerprint_enabled: bool = False
-    fingerprint_templates: list[str] = []
 
     class Config:
         from_attributes = True
@@ -1,9 +1,9 @@
 from fastapi import HTTPException, status
-from app.mongo import db
+from app.mongo import USER_PROJECTION, db
 from app.core.security import hash_password, verify_password, create_access_token
 from app.schemas.user_schema import UserRegisterSchema, UserLoginSchema
 from app.utils.validators import validate_email, validate_password_strength, validate_username
-from app.services.facial_recognition_service import FacialRecognitionService
+from app.services.facial_inference import get_facial_inference
 from datetime import datetime, timezone
 import uuid
 import base64
@@ -61,10 +61,10 @@ class AuthService:
             logger.info(f"🔍 Verificando unicidad de rostro para: {email}")
             try:
                 image_data = base64.b64decode(user_data.facial_image_base64)
-                facial_service = FacialRecognitionService()
+                facial_service = get_facial_inference()
 
                 # Verificar que el rostro sea único
-                facial_uniqueness = facial_service.check_facial_uniqueness(
+                facial_uniqueness = await facial_service.check_facial_uniqueness(
                     image_data)
 
                 if not facial_uniqueness["is_unique"]:
@@ -107,7 +107,6 @@ class AuthService:
             "two_factor_enabled": False,
             "facial_recognition_enabled": False,
             "fingerprint_enabled": False,
-            "fingerprint_templates": [],
             "created_at": now,
             "updated_at": now
         }
@@ -124,8 +123,8 @@ class AuthService:
         if user_data.facial_image_base64:
             try:
                 image_data = base64.b64decode(user_data.facial_image_base64)
-                facial_service = FacialRecognitionService()
-                facial_service.save_facial_image(image_data, user_id)
+                facial_service = get_facial_inference()
+                await facial_service.save_facial_image(image_data, user_id)
                 await db["users"].update_one(
                     {"_id": user_id},
                     {"$set": {
@@ -162,7 +161,7 @@ class AuthService:
         email = (login_data.email or "").strip().lower()
 
         # Buscar usuario por email (Mongo)
-        user_data = await db["users"].find_one({"email": email})
+        user_data = await db["users"].find_one({"email": email}, USER_PROJECTION)
         if not user_data:
             logger.warning(f"⚠️ Usuario no encontrado: {email}")
             raise HTTPException(
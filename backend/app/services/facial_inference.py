@@ -0,0 +1,211 @@
+"""
+Punto de acceso de la API al pipeline facial.
+
+Las rutas y `AuthService` no usan `FacialRecognitionService` directamente sino
+una fachada asíncrona con la misma interfaz en dos variantes:
+
+- `InlineFacialInference`: ejecuta el servicio en el propio proceso (modo por defecto).
+- `RemoteFacialInference`: encola el trabajo en el servicio de inferencia
+  (`app.facial_worker`) y espera el resultado, sin cargar modelos en la API.
+"""
+import asyncio
+import os
+import socket
+import threading
+import uuid
+from typing import Optional, Union
+
+from fastapi import HTTPException, status
+from loguru import logger
+from app.config import (
+    AUTH_ONLY_MODE,
+    FACIAL_INFERENCE_MODE,
+    FACIAL_WORKER_ADDRESS,
+    FACIAL_WORKER_AUTHKEY,
+    FACIAL_WORKER_TIMEOUT,
+)
+from app.services.facial_recognition_service import (
+    FacialRecognitionService,
+    ensure_facial_login_allowed,
+    get_facial_service,
+)
+
+
+class InlineFacialInference:
+    """Ejecuta el pipeline en el proceso de la API (comportamiento original)."""
+
+    def __init__(self, service: FacialRecognitionService):
+        self._service = service
+
+    async def detect_face_in_image(self, image_data: bytes) -> dict:
+        return self._service.detect_face_in_image(image_data)
+
+    async def verify_face(self, image_data: bytes, user_id: str) -> dict:
+        return self._service.verify_face(image_data, user_id)
+
+    async def verify_face_for_login(self, image_data: bytes, user_id: str) -> dict:
+        return await self._service.verify_face_for_login(image_data, user_id)
+
+    async def check_facial_uniqueness(self, image_data: bytes, exclude_user_id: str = None) -> dict:
+        return self._service.check_facial_uniqueness(image_data, exclude_user_id)
+
+    async def save_facial_image(self, image_data: bytes, user_id: str) -> str:
+        return self._service.save_facial_image(image_data, user_id)
+
+    async def get_user_facial_images(self, user_id: str) -> list:
+        return self._service.get_user_facial_images(user_id)
+
+
+class RemoteFacialInference:
+    """
+    Cliente del servicio de inferencia. Cada proceso de la API tiene su propia
+    cola de resultados (`client_id`); un hilo despachador la lee y resuelve
+    los futures pendientes en el bucle de eventos que los creó.
+    """
+
+    def __init__(self, address: str = FACIAL_WORKER_ADDRESS, authkey: str = FACIAL_WORKER_AUTHKEY,
+                 timeout: float = FACIAL_WORKER_TIMEOUT):
+        self._address = address
+        self._authkey = authkey
+        self._timeout = timeout
+        self._client_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._pending: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._manager = None
+        self._jobs = None
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def _ensure_connected(self):
+        from app.facial_worker import connect, require_authkey
+
+        try:
+            require_authkey(self._authkey)
+        except RuntimeError as exc:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)) from exc
+
+        with self._lock:
+            if self._jobs is not None:
+                return self._jobs
+            manager = connect(self._address, self._authkey)
+            self._jobs = manager.jobs()
+            self._manager = manager
+            results = manager.results(self._client_id)
+            self._dispatcher = threading.Thread(
+                target=self._dispatch, args=(results,), name="facial-dispatcher", daemon=True)
+            self._dispatcher.start()
+            return self._jobs
+
+    def close(self) -> None:
+        """Libera la cola de resultados de este proceso en el broker."""
+        with self._lock:
+            manager, self._manager, self._jobs = self._manager, None, None
+        if manager is None:
+            return
+        try:
+            manager.clients().release(self._client_id)
+        except (OSError, EOFError) as exc:
+            logger.debug(f"[FACIAL] No se pudo liberar la cola de resultados: {exc}")
+
+    def _dispatch(self, results) -> None:
+        try:
+            while True:
+                job_id, outcome, value = results.get()
+                with self._lock:
+                    pending = self._pending.get(job_id)
+                if pending is None:
+                    continue  # la petición ya expiró
+                loop, future = pending
+                loop.call_soon_threadsafe(self._resolve, future, (outcome, value))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(f"[FACIAL] Conexión con el servicio de inferencia perdida: {exc}")
+            with self._lock:
+                self._jobs = None
+                pending = list(self._pending.values())
+            for loop, future in pending:
+                loop.call_soon_threadsafe(
+                    self._resolve, future, ("http_error", (status.HTTP_503_SERVICE_UNAVAILABLE,
+                                                           "Servicio de inferencia facial no disponible")))
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, reply: tuple) -> None:
+        if not future.done():
+            future.set_result(reply)
+
+    async def _submit(self, method: str, *args):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._pending[job_id] = (loop, future)
+        try:
+            try:
+                jobs = await asyncio.to_thread(self._ensure_connected)
+                await asyncio.to_thread(jobs.put, (self._client_id, job_id, method, args))
+            except (OSError, EOFError) as exc:
+                with self._lock:
+                    self._jobs = None
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"Servicio de inferencia facial no disponible: {exc}"
+                ) from exc
+            try:
+                outcome, value = await asyncio.wait_for(future, self._timeout)
+            except asyncio.TimeoutError as exc:
+                raise HTTPException(
+                    status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                    detail="El servicio de inferencia facial no respondió a tiempo"
+                ) from exc
+        finally:
+            with self._lock:
+                self._pending.pop(job_id, None)
+
+        if outcome == "http_error":
+            status_code, detail = value
+            raise HTTPException(status_code=status_code, detail=detail)
+        if outcome == "error":
+            raise RuntimeError(value)
+        return value
+
+    async def detect_face_in_image(self, image_data: bytes) -> dict:
+        return await self._submit("detect_face_in_image", image_data)
+
+    async def verify_face(self, image_data: bytes, user_id: str) -> dict:
+        return await self._submit("verify_face", image_data, user_id)
+
+    async def verify_face_for_login(self, image_data: bytes, user_id: str) -> dict:
+        await ensure_facial_login_allowed(user_id)
+        return await self._submit("verify_login_biometrics", image_data, user_id)
+
+    async def check_facial_uniqueness(self, image_data: bytes, exclude_user_id: str = None) -> dict:
+        return await self._submit("check_facial_uniqueness", image_data, exclude_user_id)
+
+    async def save_facial_image(self, image_data: bytes, user_id: str) -> str:
+        return await self._submit("save_facial_image", image_data, user_id)
+
+    async def get_user_facial_images(self, user_id: str) -> list:
+        return await self._submit("get_user_facial_images", user_id)
+
+
+FacialInference = Union[InlineFacialInference, RemoteFacialInference]
+
+_facial_inference: Optional[FacialInference] = None
+
+
+def get_facial_inference() -> FacialInference:
+    """Dependencia FastAPI: fachada facial según `FACIAL_INFERENCE_MODE`."""
+    global _facial_inference
+    if AUTH_ONLY_MODE:
+        # Lanza el 503 de modo auth-only
+        get_facial_service()
+    if _facial_inference is None:
+        if FACIAL_INFERENCE_MODE == "worker":
+            _facial_inference = RemoteFacialInference()
+        else:
+            _facial_inference = InlineFacialInference(get_facial_service())
+    return _facial_inference
+
+
+async def close_facial_inference() -> None:
+    """Al apagar la API: libera los recursos del servicio de inferencia, si se usó."""
+    if isinstance(_facial_inference, RemoteFacialInference):
+        await asyncio.to_thread(_facial_inference.close)
@@ -1,24 +1,49 @@
-import cv2
 import numpy as np
 import os
 import uuid
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 from fastapi import HTTPException, status
-import mediapipe as mp
-try:
-    import face_recognition
-except ImportError:
-    face_recognition = None
 from PIL import Image
 import io
-from ultralytics import YOLO
+from app.config import AUTH_ONLY_MODE, FACIAL_DATA_PATH
+
+# cv2, mediapipe, face_recognition (dlib) y ultralytics (torch) tardan varios
+# segundos y cientos de MB en importarse; se cargan al crear el servicio, no al
+# importar este módulo, para que los endpoints de contraseña/2FA arranquen rápido.
+cv2 = None
+mp = None
+face_recognition = None
+YOLO = None
+_CV_STACK_LOADED = False
+
+
+def _load_cv_stack() -> None:
+    global cv2, mp, face_recognition, YOLO, _CV_STACK_LOADED
+    if _CV_STACK_LOADED:
+        return
+    import cv2
+    import mediapipe as mp
+    try:
+        import face_recognition
+    except ImportError:
+        face_recognition = None
+    from ultralytics import YOLO
+    _CV_STACK_LOADED = True
+
+
+def _facial_data_dir() -> Path:
+    if FACIAL_DATA_PATH:
+        return Path(FACIAL_DATA_PATH)
+    return Path(__file__).parent.parent / "facial_data"
 
 
 class FacialRecognitionService:
 
     def __init__(self):
-        self.FACIAL_DATA_DIR = Path(__file__).parent.parent / "facial_data"
+        _load_cv_stack()
+        self.FACIAL_DATA_DIR = _facial_data_dir()
         self.mp_face_detection = None
         self.mp_drawing = None
         if hasattr(mp, "solutions"):
@@ -44,7 +69,7 @@ class FacialRecognitionService:
     @staticmethod
     def ensure_facial_data_dir():
         """Asegura que el directorio de datos faciales existe"""
-        facial_data_dir = Path(__file__).parent.parent / "facial_data"
+        facial_data_dir = _facial_data_dir()
         facial_data_dir.mkdir(parents=True, exist_ok=True)
 
     def save_facial_image(self, image_data: bytes, user_id: str) -> str:
@@ -223,35 +248,15 @@ class FacialRecognitionService:
             )
 
     async def verify_face_for_login(self, image_data: bytes, user_id: str) -> dict:
-        try:
-            from app.mongo import db
-            users_col = None
-            if hasattr(db, "__getitem__"):
-                users_col = db["users"]
-            elif hasattr(db, "get_collection"):
-                users_col = db.get_collection("users")
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="❌ DB no compatible: no se pudo obtener colección 'users'"
-                )
-
-            user_doc = await users_col.find_one({"user_id": user_id})
-
-            if not user_doc:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="❌ Usuario no encontrado"
-                )
-
-            facial_enabled = user_doc.get("facial_recognition_enabled", False)
-
-            if not facial_enabled:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="❌ Facial recognition no habilitado para este usuario"
-                )
+        await ensure_facial_login_allowed(user_id)
+        return self.verify_login_biometrics(image_data, user_id)
 
+    def verify_login_biometrics(self, image_data: bytes, user_id: str) -> dict:
+        """
+        Parte de CPU del login facial (detección, liveness y comparación); la
+        comprobación en Mongo la hace `ensure_facial_login_allowed` antes.
+        """
+        try:
             user_images = self.get_user_facial_images(user_id)
 
             if not user_images:
@@ -743,3 +748,62 @@ class FacialRecognitionService:
                 "matched_user_id": None,
                 "confidence": 0
             }
+
+
+async def ensure_facial_login_allowed(user_id: str) -> None:
+    """Comprueba en Mongo que el usuario existe y tiene el login facial habilitado."""
+    try:
+        from app.mongo import USER_PROJECTION, db
+        users_col = None
+        if hasattr(db, "__getitem__"):
+            users_col = db["users"]
+        elif hasattr(db, "get_collection"):
+            users_col = db.get_collection("users")
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="❌ DB no compatible: no se pudo obtener colección 'users'"
+            )
+
+        user_doc = await users_col.find_one({"user_id": user_id}, USER_PROJECTION)
+
+        if not user_doc:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="❌ Usuario no encontrado"
+            )
+
+        facial_enabled = user_doc.get("facial_recognition_enabled", False)
+
+        if not facial_enabled:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="❌ Facial recognition no habilitado para este usuario"
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"[ERROR] verify_face_for_login: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"❌ Error en verificación facial: {str(e)}"
+        )
+
+
+_facial_service: Optional[FacialRecognitionService] = None
+
+
+def get_facial_service() -> FacialRecognitionService:
+    """
+    Devuelve la instancia compartida del servicio, creándola (y cargando los
+    modelos) en el primer uso. En modo auth-only responde 503 sin cargar nada.
+    """
+    global _facial_service
+    if AUTH_ONLY_MODE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Reconocimiento facial deshabilitado en este despliegue (AUTH_ONLY_MODE)"
+        )
+    if _facial_service is None:
+        _facial_service = FacialRecognitionService()
+    return _facial_service
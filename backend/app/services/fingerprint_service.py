@@ -1,14 +1,28 @@
+import base64
 import httpx
+import json
 from datetime import datetime, timezone
+from typing import AsyncIterator
 from fastapi import HTTPException, status
-from app.config import INTERMEDIARY_URL
-from app.mongo import db
+from app.config import INTERMEDIARY_URL, INTERMEDIARY_VERIFY_BY_HASH
+from app.mongo import LEGACY_TEMPLATE_FIELDS, USER_PROJECTION, db
+from app.services.fingerprint_templates import DEFAULT_SENSOR, FingerprintTemplateRepository
+from app.services.intermediary_client import (
+    BINARY_TRANSPORT,
+    CACHE_TIMEOUT,
+    CAPTURE_TIMEOUT,
+    MSGPACK_MEDIA_TYPE,
+    get_intermediary_client,
+    pack,
+    read_payload,
+)
+from app.services.sensor_sync import request_sensor_sync
+from app.services.template_cache_sync import request_template_cache_sync
 from loguru import logger
 
 
 class FingerprintService:
     DEFAULT_SCORE_THRESHOLD = 60
-    TIMEOUT = 35  # 35 segundos para registro, 25 para el tiempo de la persona y 10 para el buffer de la web
 
     @staticmethod
     def _build_url(path: str) -> str:
@@ -16,7 +30,7 @@ class FingerprintService:
 
     @staticmethod
     async def _get_user(user_id: str) -> dict:
-        user = await db["users"].find_one({"_id": user_id})
+        user = await db["users"].find_one({"_id": user_id}, USER_PROJECTION)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -25,14 +39,21 @@ class FingerprintService:
         return user
 
     @staticmethod
-    async def register_template(user_id: str) -> dict:
+    async def register_template(user_id: str, sensor: str = DEFAULT_SENSOR) -> dict:
+        """
+        Captura en el lector `sensor` (`zk9500` o `as608`) y guarda las plantillas,
+        sustituyendo solo las de ese lector. Las del AS608 quedan además en la
+        librería del sensor, y la sincronización (`sensor_sync`) las lleva desde
+        Mongo al resto de sensores.
+        """
         await FingerprintService._get_user(user_id)
 
-        url = FingerprintService._build_url("/fingerprint/zk9500/register")
+        url = FingerprintService._build_url(f"/fingerprint/{sensor}/register")
         logger.info(f"[BACKEND] Registrando huella para {user_id} en {url}")
         try:
-            async with httpx.AsyncClient(timeout=FingerprintService.TIMEOUT) as client:
-                resp = await client.post(url, params={"user_id": user_id})
+            headers = {"Accept": MSGPACK_MEDIA_TYPE} if BINARY_TRANSPORT else None
+            resp = await get_intermediary_client().post(
+                url, params={"user_id": user_id}, headers=headers, timeout=CAPTURE_TIMEOUT)
         except httpx.HTTPError as exc:
             logger.error(f"[BACKEND] Error conectando intermediary-app: {exc}")
             raise HTTPException(
@@ -48,10 +69,52 @@ class FingerprintService:
                 detail=f"Error del servicio de huella: {resp.text}",
             )
 
-        payload = resp.json()
-        templates = payload.get("templates_base64") or []
-        if isinstance(templates, str):
-            templates = [templates]
+        return await FingerprintService._store_templates(user_id, read_payload(resp), sensor)
+
+    @staticmethod
+    async def register_template_stream(user_id: str) -> AsyncIterator[dict]:
+        """
+        Registro con progreso: reenvía los eventos SSE del intermediary-app
+        (`capture_started`, `finger_detected`, `accepted`/`rejected`, ...) y,
+        al recibir `completed`, guarda las plantillas y emite `completed` con
+        la misma respuesta que `register_template`.
+        """
+        url = FingerprintService._build_url("/fingerprint/zk9500/register/stream")
+        logger.info(f"[BACKEND] Registrando huella (stream) para {user_id} en {url}")
+        try:
+            await FingerprintService._get_user(user_id)
+            client = get_intermediary_client()
+            async with client.stream("POST", url, params={"user_id": user_id}, timeout=CAPTURE_TIMEOUT) as resp:
+                if resp.status_code != 200:
+                    body = (await resp.aread()).decode(errors="replace")
+                    logger.warning(
+                        f"[BACKEND] intermediary-app retornó {resp.status_code}: {body}")
+                    yield {"event": "error", "detail": f"Error del servicio de huella: {body}"}
+                    return
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    if event.get("event") == "completed":
+                        result = await FingerprintService._store_templates(user_id, event.get("result") or {})
+                        yield {"event": "completed", "result": result}
+                        return
+                    yield event
+        except httpx.HTTPError as exc:
+            logger.error(f"[BACKEND] Error conectando intermediary-app: {exc}")
+            yield {"event": "error", "detail": f"Servicio de huella no disponible: {exc}"}
+        except HTTPException as exc:
+            yield {"event": "error", "detail": exc.detail}
+
+    @staticmethod
+    async def _store_templates(user_id: str, payload: dict, sensor: str = DEFAULT_SENSOR) -> dict:
+        # msgpack trae las plantillas en bytes (`templates`); JSON, en base64
+        templates = payload.get("templates") or []
+        if not templates:
+            templates_base64 = payload.get("templates_base64") or []
+            if isinstance(templates_base64, str):
+                templates_base64 = [templates_base64]
+            templates = [base64.b64decode(t) for t in templates_base64]
         if not templates:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -69,26 +132,26 @@ class FingerprintService:
         templates = templates[:max_templates]
 
         logger.info(
-            f"[BACKEND] Guardando {len(templates)} template(s) en MongoDB para {user_id}")
+            f"[BACKEND] Guardando {len(templates)} template(s) de {sensor} en MongoDB para {user_id}")
+        await FingerprintTemplateRepository.replace(user_id, templates, sensor)
+        request_sensor_sync()
+        request_template_cache_sync()
         await db["users"].update_one(
             {"_id": user_id},
             {
                 "$set": {
-                    "fingerprint_templates": templates,
                     "fingerprint_enabled": True,
                     "updated_at": now,
-                }
+                },
+                "$unset": {field: "" for field in LEGACY_TEMPLATE_FIELDS},
             },
         )
-
-        updated = await db["users"].find_one({"_id": user_id})
-        templates_count = len(updated.get(
-            "fingerprint_templates", [])) if updated else 0
+        templates_count = len(templates)
         logger.info(
             f"[BACKEND] Registro completado: {templates_count} template(s) guardado(s)")
 
         return {
-            "templates_base64": templates,
+            "templates_base64": [base64.b64encode(t).decode("ascii") for t in templates],
             "quality": quality,
             "fingerprint_enabled": True,
             "templates_count": templates_count,
@@ -97,8 +160,15 @@ class FingerprintService:
     @staticmethod
     async def verify_for_login(user_id: str, score_threshold: int | None = None) -> dict:
         user = await FingerprintService._get_user(user_id)
-        templates = user.get("fingerprint_templates", [])
-        if not templates:
+        # Verify es del ZK9500: solo sus plantillas, nunca las del AS608.
+        # Con verify por hash solo se leen los hashes; las plantillas, si el intermediary no las tiene
+        templates = None
+        if INTERMEDIARY_VERIFY_BY_HASH:
+            hashes = await FingerprintTemplateRepository.hashes(user_id)
+        else:
+            hashes = None
+            templates = await FingerprintTemplateRepository.load(user_id)
+        if not (hashes or templates):
             logger.warning(
                 f"[BACKEND] Usuario {user_id} no tiene huellas registradas")
             raise HTTPException(
@@ -107,25 +177,18 @@ class FingerprintService:
             )
 
         url = FingerprintService._build_url("/fingerprint/zk9500/verify")
-        payload = {
-            "candidates": [
-                {"user_id": user_id, "template_base64": t} for t in templates
-            ],
-            "score_threshold": score_threshold or FingerprintService.DEFAULT_SCORE_THRESHOLD,
-        }
+        threshold = score_threshold or FingerprintService.DEFAULT_SCORE_THRESHOLD
         logger.info(
-            f"[BACKEND] Verificando huella para {user_id} con {len(templates)} template(s), threshold={payload['score_threshold']}")
+            f"[BACKEND] Verificando huella para {user_id} con {len(hashes or templates)} template(s), threshold={threshold}")
 
-        try:
-            async with httpx.AsyncClient(timeout=FingerprintService.TIMEOUT) as client:
-                resp = await client.post(url, json=payload)
-        except httpx.HTTPError as exc:
-            logger.error(
-                f"[BACKEND] Error conectando intermediary-app para verify: {exc}")
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f"Servicio de huella no disponible: {exc}",
-            ) from exc
+        resp = await FingerprintService._post_verify(
+            url, FingerprintService._verify_request(user_id, templates, hashes, threshold))
+        if hashes is not None and resp.status_code == status.HTTP_409_CONFLICT:
+            logger.info(
+                f"[BACKEND] intermediary-app sin las plantillas de {user_id} en caché; reenviando completas")
+            templates = await FingerprintTemplateRepository.load(user_id)
+            resp = await FingerprintService._post_verify(
+                url, FingerprintService._verify_request(user_id, templates, None, threshold))
 
         if resp.status_code != 200:
             logger.warning(
@@ -135,7 +198,7 @@ class FingerprintService:
                 detail=f"Error del servicio de huella: {resp.text}",
             )
 
-        data = resp.json()
+        data = read_payload(resp)
         match = bool(data.get("match"))
         matched_user_id = data.get("user_id")
         score = data.get("score")
@@ -155,20 +218,57 @@ class FingerprintService:
             "fingerprint_enabled": user.get("fingerprint_enabled", False),
         }
 
+    @staticmethod
+    def _verify_request(user_id: str, templates: list[bytes] | None, hashes: list[str] | None,
+                        threshold: int) -> dict:
+        """Argumentos del POST de verify: solo los hashes (si se pasan) o las plantillas completas."""
+        if hashes is not None:
+            candidates = [{"user_id": user_id, "template_hash": h} for h in hashes]
+        elif BINARY_TRANSPORT:
+            candidates = [{"user_id": user_id, "template": t} for t in templates]
+        else:
+            candidates = [{"user_id": user_id, "template_base64": base64.b64encode(t).decode("ascii")}
+                          for t in templates]
+        body = {"candidates": candidates, "score_threshold": threshold}
+        if BINARY_TRANSPORT:
+            return {
+                "content": pack(body),
+                "headers": {"Content-Type": MSGPACK_MEDIA_TYPE, "Accept": MSGPACK_MEDIA_TYPE},
+            }
+        return {"json": body}
+
+    @staticmethod
+    async def _post_verify(url: str, request_kwargs: dict) -> httpx.Response:
+        try:
+            return await get_intermediary_client().post(url, timeout=CAPTURE_TIMEOUT, **request_kwargs)
+        except httpx.HTTPError as exc:
+            logger.error(
+                f"[BACKEND] Error conectando intermediary-app para verify: {exc}")
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Servicio de huella no disponible: {exc}",
+            ) from exc
+
     @staticmethod
     async def disable_fingerprint(user_id: str, clear_templates: bool = True) -> dict:
         await FingerprintService._get_user(user_id)
 
-        update_fields = {
-            "fingerprint_enabled": False,
-            "updated_at": datetime.now(timezone.utc),
+        update = {
+            "$set": {
+                "fingerprint_enabled": False,
+                "updated_at": datetime.now(timezone.utc),
+            }
         }
         if clear_templates:
-            update_fields["fingerprint_templates"] = []
+            update["$unset"] = {field: "" for field in LEGACY_TEMPLATE_FIELDS}
 
-        await db["users"].update_one({"_id": user_id}, {"$set": update_fields})
+        await db["users"].update_one({"_id": user_id}, update)
+        if clear_templates:
+            await FingerprintTemplateRepository.delete(user_id)
+            await FingerprintService._evict_cached_templates(user_id)
+            request_sensor_sync()
 
-        updated = await db["users"].find_one({"_id": user_id})
+        updated = await db["users"].find_one({"_id": user_id}, USER_PROJECTION)
         if not updated:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -179,10 +279,22 @@ class FingerprintService:
         updated.pop("hashed_password", None)
         return updated
 
+    @staticmethod
+    async def _evict_cached_templates(user_id: str) -> None:
+        """Quita las plantillas del usuario de la caché 1:N del intermediary-app (mejor esfuerzo)."""
+        url = FingerprintService._build_url(f"/fingerprint/zk9500/templates/{user_id}")
+        try:
+            resp = await get_intermediary_client().delete(url, timeout=CACHE_TIMEOUT)
+            if resp.status_code != 200:
+                logger.warning(
+                    f"[BACKEND] No se pudo limpiar la caché de plantillas de {user_id}: {resp.status_code}")
+        except httpx.HTTPError as exc:
+            logger.warning(f"[BACKEND] intermediary-app no disponible para limpiar caché: {exc}")
+
     @staticmethod
     async def status(user_id: str) -> dict:
         user = await FingerprintService._get_user(user_id)
         return {
             "fingerprint_enabled": user.get("fingerprint_enabled", False),
-            "templates_count": len(user.get("fingerprint_templates", [])),
+            "templates_count": await FingerprintTemplateRepository.count(user_id),
         }
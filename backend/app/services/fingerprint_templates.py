@@ -0,0 +1,196 @@
+"""
+Plantillas de huella en su propia colección (`fingerprint_templates`).
+
+Un documento por plantilla, con los bytes como BSON Binary (sin base64):
+
+    {user_id, sensor, position, template: Binary, hash: sha1 hex, size, created_at}
+
+Cada lector tiene su formato (las del ZK9500 rondan los KB, las del AS608 son
+de 512 B), así que las plantillas de un usuario se guardan por `sensor`
+(`zk9500` o `as608`, parte del índice único): registrar en un lector solo
+sustituye las de ese lector. `size` (indexado) es lo que filtra la
+sincronización con el sensor (`manifest`).
+
+Así el documento del usuario queda pequeño y las lecturas de `users`
+(login, 2FA, perfil) no arrastran datos biométricos. Las plantillas que aún
+están en el documento del usuario (`fingerprint_templates` en base64, formato
+anterior) se migran al leerlas; `python -m app.migrate_fingerprint_templates`
+migra todas de una vez.
+"""
+import base64
+from datetime import datetime, timezone
+
+from bson import Binary
+from loguru import logger
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from app.mongo import LEGACY_TEMPLATE_FIELDS, db
+from app.services.intermediary_client import template_digest
+
+COLLECTION = "fingerprint_templates"
+
+# Lectores con plantillas propias; las del formato anterior (documento del usuario) son del ZK9500
+DEFAULT_SENSOR = "zk9500"
+AS608_SENSOR = "as608"
+AS608_TEMPLATE_BYTES = 512
+
+
+class FingerprintTemplateRepository:
+    @staticmethod
+    def _collection():
+        return db[COLLECTION]
+
+    @staticmethod
+    async def ensure_indexes() -> None:
+        collection = FingerprintTemplateRepository._collection()
+        # Documentos anteriores a `size`/`sensor`: se calculan una vez en el servidor
+        await collection.update_many(
+            {"size": {"$exists": False}}, [{"$set": {"size": {"$binarySize": "$template"}}}])
+        await collection.update_many(
+            {"sensor": {"$exists": False}},
+            [{"$set": {"sensor": {"$cond": [{"$eq": ["$size", AS608_TEMPLATE_BYTES]},
+                                            AS608_SENSOR, DEFAULT_SENSOR]}}}])
+        await collection.create_index(
+            [("user_id", 1), ("sensor", 1), ("position", 1)], unique=True, name="user_sensor_position")
+        await collection.create_index([("hash", 1)], name="hash")
+        await collection.create_index([("size", 1)], name="size")
+        # Cubre `sensor_manifest` (caché 1:N del ZK9500) sin leer los documentos
+        await collection.create_index([("sensor", 1), ("user_id", 1), ("hash", 1)], name="sensor_user_hash")
+        try:
+            # Índice único anterior, sin `sensor`: impediría tener plantillas de los dos lectores
+            await collection.drop_index("user_position")
+        except OperationFailure:
+            pass
+
+    @staticmethod
+    def _upserts(user_id: str, sensor: str, templates: list[bytes], operator: str) -> list[UpdateOne]:
+        now = datetime.now(timezone.utc)
+        return [
+            UpdateOne(
+                {"user_id": user_id, "sensor": sensor, "position": position},
+                {operator: {
+                    "template": Binary(template),
+                    "hash": template_digest(template),
+                    "size": len(template),
+                    "created_at": now,
+                }},
+                upsert=True,
+            )
+            for position, template in enumerate(templates)
+        ]
+
+    @staticmethod
+    async def replace(user_id: str, templates: list[bytes], sensor: str = DEFAULT_SENSOR) -> list[str]:
+        """
+        Sustituye las plantillas del usuario en `sensor` (las del otro lector no
+        se tocan); devuelve sus hashes en el mismo orden.
+
+        Sin transacción: cada posición se reescribe con un upsert y después se
+        borran las posiciones sobrantes, así que un verify concurrente nunca ve
+        al usuario sin plantillas y dos `replace` simultáneos no chocan con el
+        índice único (gana el último en escribir cada posición).
+        """
+        collection = FingerprintTemplateRepository._collection()
+        if templates:
+            await collection.bulk_write(
+                FingerprintTemplateRepository._upserts(user_id, sensor, templates, "$set"), ordered=False)
+        await collection.delete_many(
+            {"user_id": user_id, "sensor": sensor, "position": {"$gte": len(templates)}})
+        return [template_digest(template) for template in templates]
+
+    @staticmethod
+    async def load(user_id: str, sensor: str = DEFAULT_SENSOR) -> list[bytes]:
+        cursor = FingerprintTemplateRepository._collection().find(
+            {"user_id": user_id, "sensor": sensor}, {"_id": 0, "template": 1, "position": 1}).sort("position", 1)
+        docs = await cursor.to_list(None)
+        if docs:
+            return [bytes(doc["template"]) for doc in docs]
+        if sensor != DEFAULT_SENSOR:
+            return []
+        return await FingerprintTemplateRepository._migrate_legacy(user_id)
+
+    @staticmethod
+    async def hashes(user_id: str, sensor: str = DEFAULT_SENSOR) -> list[str]:
+        """Solo los hashes (unos bytes por plantilla), para verify sin leer las plantillas."""
+        cursor = FingerprintTemplateRepository._collection().find(
+            {"user_id": user_id, "sensor": sensor}, {"_id": 0, "hash": 1, "position": 1}).sort("position", 1)
+        docs = await cursor.to_list(None)
+        if docs:
+            return [doc["hash"] for doc in docs]
+        if sensor != DEFAULT_SENSOR:
+            return []
+        return [template_digest(t) for t in await FingerprintTemplateRepository._migrate_legacy(user_id)]
+
+    @staticmethod
+    async def manifest(template_bytes: int) -> list[tuple[str, str]]:
+        """(user_id, hash) de todas las plantillas de `template_bytes` bytes (formato de un lector concreto)."""
+        cursor = FingerprintTemplateRepository._collection().find(
+            {"size": template_bytes},
+            {"_id": 0, "user_id": 1, "hash": 1})
+        return [(doc["user_id"], doc["hash"]) async for doc in cursor]
+
+    @staticmethod
+    async def sensor_manifest(sensor: str) -> list[tuple[str, str]]:
+        """(user_id, hash) de todas las plantillas de un lector."""
+        cursor = FingerprintTemplateRepository._collection().find(
+            {"sensor": sensor}, {"_id": 0, "user_id": 1, "hash": 1})
+        return [(doc["user_id"], doc["hash"]) async for doc in cursor]
+
+    @staticmethod
+    async def load_by_hashes(hashes: list[str]) -> list[tuple[str, bytes]]:
+        """(user_id, plantilla) de los documentos con esos hashes."""
+        cursor = FingerprintTemplateRepository._collection().find(
+            {"hash": {"$in": hashes}}, {"_id": 0, "user_id": 1, "template": 1})
+        return [(doc["user_id"], bytes(doc["template"])) async for doc in cursor]
+
+    @staticmethod
+    async def count(user_id: str, sensor: str | None = None) -> int:
+        """Plantillas del usuario en `sensor`, o de todos los lectores sin él."""
+        query = {"user_id": user_id} if sensor is None else {"user_id": user_id, "sensor": sensor}
+        count = await FingerprintTemplateRepository._collection().count_documents(query)
+        if count or sensor not in (None, DEFAULT_SENSOR):
+            return count
+        return len(await FingerprintTemplateRepository._migrate_legacy(user_id))
+
+    @staticmethod
+    async def delete(user_id: str) -> int:
+        result = await FingerprintTemplateRepository._collection().delete_many({"user_id": user_id})
+        return result.deleted_count
+
+    @staticmethod
+    async def _migrate_legacy(user_id: str) -> list[bytes]:
+        """Mueve las plantillas base64 del documento del usuario (formato anterior) a la colección."""
+        user = await db["users"].find_one({"_id": user_id}, {"fingerprint_templates": 1})
+        legacy = (user or {}).get("fingerprint_templates") or []
+        if not legacy:
+            return []
+        templates = [base64.b64decode(t) for t in legacy]
+        stored = await FingerprintTemplateRepository.import_legacy(user_id, templates)
+        if stored == templates:
+            logger.info(f"[BACKEND] {len(templates)} plantilla(s) de {user_id} migradas a `{COLLECTION}`")
+        return stored
+
+    @staticmethod
+    async def import_legacy(user_id: str, templates: list[bytes]) -> list[bytes]:
+        """
+        Guarda las plantillas del formato anterior (del ZK9500) sin pisar las que
+        ya haya en la colección: si otra petición migró antes, o el usuario registró
+        huellas nuevas entretanto, se respetan (`$setOnInsert`, y nada si ya tiene
+        alguna del ZK9500). Devuelve las del ZK9500 que quedan en la colección.
+        """
+        collection = FingerprintTemplateRepository._collection()
+        query = {"user_id": user_id, "sensor": DEFAULT_SENSOR}
+        if templates and not await collection.count_documents(query, limit=1):
+            try:
+                await collection.bulk_write(
+                    FingerprintTemplateRepository._upserts(user_id, DEFAULT_SENSOR, templates, "$setOnInsert"),
+                    ordered=False)
+            except BulkWriteError as exc:
+                # Carrera perdida con otra migración del mismo usuario: sus upserts chocan en el índice único
+                if any(error.get("code") != 11000 for error in exc.details.get("writeErrors", [])):
+                    raise
+        await db["users"].update_one(
+            {"_id": user_id}, {"$unset": {field: "" for field in LEGACY_TEMPLATE_FIELDS}})
+        cursor = collection.find(query, {"_id": 0, "template": 1}).sort("position", 1)
+        return [bytes(doc["template"]) async for doc in cursor]
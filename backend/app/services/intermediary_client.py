@@ -0,0 +1,96 @@
+"""
+Cliente HTTP compartido hacia el intermediary-app.
+
+Un único `httpx.AsyncClient` por proceso: las conexiones quedan abiertas
+(keep-alive) y se reutilizan entre peticiones, en lugar de pagar conexión TCP
+y construcción del pool en cada registro o login con huella. Se crea y se
+cierra en el lifespan de la app (`app.main`); si se usa fuera de ella
+(scripts, benchmarks) se crea la primera vez que se pide.
+
+Cada operación pasa su propio `httpx.Timeout`: la conexión siempre falla
+rápido (`INTERMEDIARY_CONNECT_TIMEOUT`) y la lectura espera lo que dura la
+operación (una captura de huella frente a una llamada de caché).
+
+Con `INTERMEDIARY_TRANSPORT=msgpack` (por defecto) las plantillas de
+register/verify viajan como bytes crudos en msgpack en lugar de base64 en
+JSON; ver `intermediary-app/transport.py`.
+"""
+import hashlib
+from typing import Any, Optional
+
+import httpx
+import msgpack
+from loguru import logger
+
+from app.config import (
+    INTERMEDIARY_CONNECT_TIMEOUT,
+    INTERMEDIARY_HTTP2,
+    INTERMEDIARY_KEEPALIVE_EXPIRY,
+    INTERMEDIARY_MAX_CONNECTIONS,
+    INTERMEDIARY_MAX_KEEPALIVE,
+    INTERMEDIARY_TRANSPORT,
+)
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+BINARY_TRANSPORT = INTERMEDIARY_TRANSPORT == "msgpack"
+
+# 35 s de lectura para capturas: 25 para el tiempo de la persona y 10 para el buffer de la web
+CAPTURE_TIMEOUT = httpx.Timeout(35, connect=INTERMEDIARY_CONNECT_TIMEOUT)
+# Operaciones sin lector (caché de plantillas, estado)
+CACHE_TIMEOUT = httpx.Timeout(5, connect=INTERMEDIARY_CONNECT_TIMEOUT)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_enabled() -> bool:
+    if not INTERMEDIARY_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("[BACKEND] INTERMEDIARY_HTTP2=True pero el paquete `h2` no está instalado; se usa HTTP/1.1")
+        return False
+    return True
+
+
+def build_intermediary_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=INTERMEDIARY_MAX_CONNECTIONS,
+        max_keepalive_connections=INTERMEDIARY_MAX_KEEPALIVE,
+        keepalive_expiry=INTERMEDIARY_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, timeout=CAPTURE_TIMEOUT, http2=_http2_enabled())
+
+
+def get_intermediary_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = build_intermediary_client()
+    return _client
+
+
+async def open_intermediary_client() -> None:
+    get_intermediary_client()
+
+
+async def close_intermediary_client() -> None:
+    global _client
+    client, _client = _client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+def pack(payload: Any) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def read_payload(resp: httpx.Response) -> Any:
+    """Body de la respuesta en msgpack o JSON, según su `Content-Type`."""
+    if resp.headers.get("content-type", "").startswith(MSGPACK_MEDIA_TYPE):
+        return msgpack.unpackb(resp.content, raw=False)
+    return resp.json()
+
+
+def template_digest(template: bytes) -> str:
+    """Hash de contenido de una plantilla; el mismo que usa la caché del intermediary-app."""
+    return hashlib.sha1(template).hexdigest()
@@ -0,0 +1,178 @@
+"""
+Sincronización de las plantillas de Mongo con la librería del sensor AS608.
+
+El AS608 del intermediary-app busca 1:N en su propia flash, así que sus
+plantillas tienen que estar guardadas en el sensor antes del login. Una tarea
+en segundo plano (activada con `AS608_SYNC_ENABLED`) mantiene la librería al
+día sin reenviar nada que ya esté:
+
+1. Pide al intermediary lo que hay en el sensor (`GET /fingerprint/as608/library`):
+   pares (user_id, hash) y el tamaño de plantilla del sensor.
+2. Lee de Mongo los (user_id, hash) de las plantillas de ese tamaño (las del
+   ZK9500 tienen otro formato y no se envían).
+3. Envía la diferencia por lotes de `AS608_SYNC_BATCH`: primero los hashes que
+   ya no están en Mongo y después las plantillas que faltan en el sensor.
+
+Se repite cada `AS608_SYNC_INTERVAL` segundos y, antes, cuando cambian las
+plantillas de un usuario (`request_sync()` tras registrar o borrar). Aplicar
+un lote es idempotente en el intermediary, así que varios workers del backend
+sincronizando a la vez no duplican plantillas.
+"""
+import asyncio
+import base64
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+from app.config import AS608_SYNC_BATCH, AS608_SYNC_ENABLED, AS608_SYNC_INTERVAL, INTERMEDIARY_URL
+from app.services.fingerprint_templates import FingerprintTemplateRepository
+from app.services.intermediary_client import (
+    BINARY_TRANSPORT,
+    CACHE_TIMEOUT,
+    MSGPACK_MEDIA_TYPE,
+    get_intermediary_client,
+    pack,
+    read_payload,
+    template_digest,
+)
+
+# Subir un lote al sensor: ~100 ms por plantilla a 115200 baudios, más margen
+SYNC_BATCH_TIMEOUT = httpx.Timeout(60, connect=CACHE_TIMEOUT.connect)
+
+
+def intermediary_url(path: str) -> str:
+    return f"{INTERMEDIARY_URL.rstrip('/')}{path}"
+
+
+def diff_library(sensor: set[tuple[str, str]], store: set[tuple[str, str]]) -> tuple[list[str], list[str]]:
+    """(hashes a borrar del sensor, hashes a subir) para que el sensor tenga lo mismo que Mongo."""
+    deletes = sorted({digest for _, digest in sensor - store})
+    uploads = sorted({digest for _, digest in store - sensor})
+    return deletes, uploads
+
+
+class PeriodicSync:
+    """
+    Tarea en segundo plano que llama a `sync_once` cada `interval` segundos,
+    o antes si se pide con `request_sync()`. Los fallos se registran y se
+    reintenta en la siguiente pasada.
+    """
+
+    name = "sync"
+    label = "[SYNC]"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.runs = 0
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def request_sync(self) -> None:
+        """Adelanta la siguiente sincronización (p.ej. tras cambiar las plantillas de un usuario)."""
+        self._wakeup.set()
+
+    async def sync_once(self) -> dict:
+        raise NotImplementedError
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync_once()
+                self.runs += 1
+                self.last_error = None
+            except Exception as exc:  # noqa: BLE001 - intermediary o Mongo caídos: se reintenta en la siguiente
+                self.last_error = str(exc)
+                logger.warning(f"{self.label} Sincronización fallida: {exc}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+class SensorLibrarySync(PeriodicSync):
+    name = "as608-sync"
+    label = "[AS608]"
+
+    def __init__(self, interval: float = AS608_SYNC_INTERVAL, batch_size: int = AS608_SYNC_BATCH):
+        super().__init__(interval)
+        self.batch_size = batch_size
+        self.uploaded = 0
+        self.deleted = 0
+
+    async def _post_batch(self, upserts: list[tuple[str, bytes]], deletes: list[str]) -> dict:
+        if BINARY_TRANSPORT:
+            body = {"upserts": [{"user_id": u, "template": t} for u, t in upserts], "deletes": deletes}
+            kwargs = {"content": pack(body), "headers": {"Content-Type": MSGPACK_MEDIA_TYPE}}
+        else:
+            kwargs = {"json": {
+                "upserts": [{"user_id": u, "template_base64": base64.b64encode(t).decode("ascii")}
+                            for u, t in upserts],
+                "deletes": deletes,
+            }}
+        resp = await get_intermediary_client().post(
+            intermediary_url("/fingerprint/as608/library/sync"), timeout=SYNC_BATCH_TIMEOUT, **kwargs)
+        if resp.status_code != 200:
+            raise RuntimeError(f"intermediary-app retornó {resp.status_code}: {resp.text}")
+        return read_payload(resp)
+
+    async def sync_once(self) -> dict:
+        """Una pasada completa: diferencia entre Mongo y el sensor, enviada por lotes."""
+        resp = await get_intermediary_client().get(
+            intermediary_url("/fingerprint/as608/library"), timeout=CACHE_TIMEOUT)
+        if resp.status_code != 200:
+            raise RuntimeError(f"intermediary-app retornó {resp.status_code}: {resp.text}")
+        library = read_payload(resp)
+        sensor = {(e["user_id"], e["template_hash"]) for e in library["entries"]}
+        store = set(await FingerprintTemplateRepository.manifest(library["template_bytes"]))
+        deletes, uploads = diff_library(sensor, store)
+
+        uploaded = deleted = 0
+        for start in range(0, len(deletes), self.batch_size):
+            deleted += (await self._post_batch([], deletes[start:start + self.batch_size]))["deleted"]
+        wanted = {digest: user_id for user_id, digest in store}
+        for start in range(0, len(uploads), self.batch_size):
+            batch = await FingerprintTemplateRepository.load_by_hashes(uploads[start:start + self.batch_size])
+            # Solo el dueño que está en Mongo para ese hash (dos usuarios con la misma plantilla son improbables)
+            batch = [(user_id, template) for user_id, template in batch
+                     if wanted.get(template_digest(template)) == user_id]
+            if batch:
+                uploaded += (await self._post_batch(batch, []))["uploaded"]
+
+        self.uploaded += uploaded
+        self.deleted += deleted
+        if uploaded or deleted:
+            logger.info(f"[AS608] Sensor sincronizado: {uploaded} plantilla(s) subidas, {deleted} borradas")
+        return {"uploaded": uploaded, "deleted": deleted, "templates": len(store)}
+
+
+_sync: Optional[SensorLibrarySync] = None
+
+
+def get_sensor_sync() -> Optional[SensorLibrarySync]:
+    """La sincronización del proceso, o None si `AS608_SYNC_ENABLED` está desactivado."""
+    global _sync
+    if AS608_SYNC_ENABLED and _sync is None:
+        _sync = SensorLibrarySync()
+    return _sync
+
+
+def request_sensor_sync() -> None:
+    sync = get_sensor_sync()
+    if sync is not None:
+        sync.request_sync()
@@ -0,0 +1,95 @@
+"""
+Caché 1:N del ZK9500 en el intermediary-app al día con Mongo.
+
+`POST /fingerprint/zk9500/identify` busca entre las plantillas cacheadas en el
+intermediary (DB cache del SDK o su equivalente en Python), que viven en
+memoria: tras reiniciar el intermediary la caché está vacía. Una tarea en
+segundo plano (activada con `ZK_CACHE_SYNC_ENABLED`) la rellena y la mantiene:
+
+1. Pide al intermediary lo que tiene (`GET /fingerprint/zk9500/templates`):
+   pares (user_id, hash).
+2. Lee de Mongo los (user_id, hash) de las plantillas del ZK9500.
+3. Para cada usuario cuyas plantillas difieren, envía las de Mongo
+   (`PUT /fingerprint/zk9500/templates/{user_id}`; el intermediary solo
+   añade o borra lo que cambió) y quita los usuarios que ya no están (`DELETE`).
+
+Se repite cada `ZK_CACHE_SYNC_INTERVAL` segundos y, antes, cuando cambian las
+plantillas de un usuario (`request_template_cache_sync()`).
+"""
+import base64
+from collections import defaultdict
+from typing import Optional
+
+from loguru import logger
+
+from app.config import ZK_CACHE_SYNC_ENABLED, ZK_CACHE_SYNC_INTERVAL
+from app.services.fingerprint_templates import DEFAULT_SENSOR, FingerprintTemplateRepository
+from app.services.intermediary_client import CACHE_TIMEOUT, get_intermediary_client, read_payload
+from app.services.sensor_sync import PeriodicSync, intermediary_url
+
+
+def _by_user(entries) -> dict[str, set[str]]:
+    users: dict[str, set[str]] = defaultdict(set)
+    for user_id, digest in entries:
+        users[user_id].add(digest)
+    return users
+
+
+class TemplateCacheSync(PeriodicSync):
+    name = "zk9500-cache-sync"
+    label = "[ZK9500]"
+
+    def __init__(self, interval: float = ZK_CACHE_SYNC_INTERVAL):
+        super().__init__(interval)
+        self.pushed = 0
+        self.removed = 0
+
+    async def sync_once(self) -> dict:
+        """Una pasada completa: usuarios cuyas plantillas en la caché no coinciden con Mongo."""
+        client = get_intermediary_client()
+        resp = await client.get(intermediary_url("/fingerprint/zk9500/templates"), timeout=CACHE_TIMEOUT)
+        if resp.status_code != 200:
+            raise RuntimeError(f"intermediary-app retornó {resp.status_code}: {resp.text}")
+        cached = _by_user((e["user_id"], e["template_hash"]) for e in read_payload(resp)["entries"])
+        store = _by_user(await FingerprintTemplateRepository.sensor_manifest(DEFAULT_SENSOR))
+
+        pushed = removed = 0
+        for user_id in sorted(set(cached) - set(store)):
+            resp = await client.delete(
+                intermediary_url(f"/fingerprint/zk9500/templates/{user_id}"), timeout=CACHE_TIMEOUT)
+            if resp.status_code != 200:
+                raise RuntimeError(f"intermediary-app retornó {resp.status_code}: {resp.text}")
+            removed += 1
+        for user_id in sorted(u for u, digests in store.items() if cached.get(u) != digests):
+            templates = await FingerprintTemplateRepository.load(user_id)
+            if not templates:
+                continue  # borradas entretanto
+            resp = await client.put(
+                intermediary_url(f"/fingerprint/zk9500/templates/{user_id}"), timeout=CACHE_TIMEOUT,
+                json={"templates_base64": [base64.b64encode(t).decode("ascii") for t in templates]})
+            if resp.status_code != 200:
+                raise RuntimeError(f"intermediary-app retornó {resp.status_code}: {resp.text}")
+            pushed += 1
+
+        self.pushed += pushed
+        self.removed += removed
+        if pushed or removed:
+            logger.info(f"[ZK9500] Caché 1:N sincronizada: {pushed} usuario(s) enviados, {removed} quitados")
+        return {"pushed": pushed, "removed": removed, "users": len(store)}
+
+
+_sync: Optional[TemplateCacheSync] = None
+
+
+def get_template_cache_sync() -> Optional[TemplateCacheSync]:
+    """La sincronización del proceso, o None si `ZK_CACHE_SYNC_ENABLED` está desactivado."""
+    global _sync
+    if ZK_CACHE_SYNC_ENABLED and _sync is None:
+        _sync = TemplateCacheSync()
+    return _sync
+
+
+def request_template_cache_sync() -> None:
+    sync = get_template_cache_sync()
+    if sync is not None:
+        sync.request_sync()
@@ -6,7 +6,7 @@ import pyotp
 import qrcode
 from fastapi import HTTPException, status
 
-from app.mongo import db
+from app.mongo import USER_PROJECTION, db
 
 
 class TwoFactorService:
@@ -19,7 +19,7 @@ class TwoFactorService:
 
     @staticmethod
     async def _get_user(user_id: str) -> dict:
-        user = await db["users"].find_one({"user_id": user_id})
+        user = await db["users"].find_one({"user_id": user_id}, USER_PROJECTION)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
@@ -1,5 +1,5 @@
 from fastapi import HTTPException, status
-from app.mongo import db
+from app.mongo import USER_PROJECTION, db
 from app.core.security import hash_password
 
 
@@ -14,7 +14,7 @@ class UserService:
         """
         Obtiene un usuario por su ID
         """
-        user_data = await db["users"].find_one({"_id": user_id})
+        user_data = await db["users"].find_one({"_id": user_id}, USER_PROJECTION)
 
         if not user_data:
             raise HTTPException(
@@ -55,7 +55,7 @@ class UserService:
             {"$set": update_data}
         )
 
-        updated_user = await db["users"].find_one({"_id": user_id})
+        updated_user = await db["users"].find_one({"_id": user_id}, USER_PROJECTION)
         if not updated_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
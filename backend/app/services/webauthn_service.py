@@ -2,7 +2,7 @@ import os
 import base64
 from datetime import datetime, timezone
 from fastapi import HTTPException, status
-from app.mongo import db
+from app.mongo import USER_PROJECTION, db
 
 from webauthn import (
     generate_registration_options,
@@ -53,7 +53,7 @@ class WebAuthnService:
 
     async def generate_registration_options(self, user_id: str, email: str, username: str):
         try:
-            user = await db["users"].find_one({"user_id": user_id})
+            user = await db["users"].find_one({"user_id": user_id}, USER_PROJECTION)
             if not user:
                 raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
@@ -104,7 +104,7 @@ class WebAuthnService:
 
     async def verify_registration_response(self, user_id: str, credential: dict):
         try:
-            user = await db["users"].find_one({"user_id": user_id})
+            user = await db["users"].find_one({"user_id": user_id}, USER_PROJECTION)
             if not user:
                 raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
@@ -150,7 +150,7 @@ class WebAuthnService:
 
     async def generate_authentication_options(self, user_id: str):
         try:
-            user = await db["users"].find_one({"user_id": user_id})
+            user = await db["users"].find_one({"user_id": user_id}, USER_PROJECTION)
             if not user:
                 raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
@@ -190,7 +190,7 @@ class WebAuthnService:
 
     async def verify_authentication_response(self, user_id: str, credential: dict):
         try:
-            user = await db["users"].find_one({"user_id": user_id})
+            user = await db["users"].find_one({"user_id": user_id}, USER_PROJECTION)
             if not user:
                 raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
@@ -0,0 +1,76 @@
+"""
+Lanzamiento multi-worker con los modelos faciales cargados en el master.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+El master importa la pila de visión y construye `FacialRecognitionService`
+antes de hacer fork; los workers heredan el singleton y comparten las páginas
+de pesos (YOLO, dlib, MediaPipe) copy-on-write en lugar de cargar una copia
+cada uno. La app en sí (y su cliente Mongo) se importa en cada worker después
+del fork.
+
+Variables:
+- WEB_CONCURRENCY: número de workers (4).
+- GUNICORN_BIND: dirección de escucha (0.0.0.0:8000).
+- PRELOAD_FACIAL_MODELS: True carga en el master; False carga en cada worker al arrancar.
+- TORCH_THREADS_PER_WORKER: hilos de torch/OpenMP/OpenCV por worker (CPUs / workers).
+"""
+import gc
+import os
+import sys
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# Solo los modelos se precargan (on_starting); preload_app importaría también Motor antes del fork
+preload_app = False
+
+preload_facial_models = os.getenv("PRELOAD_FACIAL_MODELS", "True") == "True"
+threads_per_worker = int(os.getenv("TORCH_THREADS_PER_WORKER",
+                         str(max(1, (os.cpu_count() or 1) // max(1, workers)))))
+
+# Los pools de OpenMP/BLAS leen estas variables al inicializarse: fijarlas antes
+# de importar torch evita que N workers lancen cada uno un hilo por CPU.
+for _var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(_var, str(threads_per_worker))
+
+
+def _facial_models_enabled() -> bool:
+    from app.config import AUTH_ONLY_MODE, FACIAL_INFERENCE_MODE
+    return not AUTH_ONLY_MODE and FACIAL_INFERENCE_MODE == "inline"
+
+
+def _load_facial_models() -> None:
+    from app.services.facial_recognition_service import get_facial_service
+    get_facial_service()
+
+
+def _pin_threads() -> None:
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        torch.set_num_threads(threads_per_worker)
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(threads_per_worker)
+
+
+def on_starting(server):
+    if not preload_facial_models or not _facial_models_enabled():
+        return
+    server.log.info("Cargando modelos faciales en el master antes del fork...")
+    _load_facial_models()
+    # Mueve los objetos ya creados a la generación permanente: el GC de cada
+    # worker no vuelve a escribir en sus cabeceras y las páginas siguen compartidas.
+    gc.freeze()
+    server.log.info(f"Modelos precargados; {threads_per_worker} hilo(s) de inferencia por worker")
+
+
+def post_fork(server, worker):
+    _pin_threads()
+
+
+def post_worker_init(worker):
+    if preload_facial_models or not _facial_models_enabled():
+        return
+    _load_facial_models()
+    _pin_threads()
@@ -0,0 +1,425 @@
+"""Benchmarks del matcher de huellas del intermediary-app (`ZK9500Driver`) y de la llamada backend → intermediary."""
+import asyncio
+import base64
+import contextlib
+import ctypes
+import ctypes.util
+import random
+import threading
+import time
+import types
+
+from benchmarks import fixtures
+from benchmarks.harness import Metrics, SkipBenchmark, benchmark
+
+
+class _OfflineDevice:
+    """
+    Sustituto del objeto pyzkfp para poder medir `match`/`identify` sin lector:
+    no expone métodos de matching, así que el driver usa su comparación propia.
+    """
+
+
+class _SlowCaptureDevice(_OfflineDevice):
+    """Lector simulado: cada `AcquireFingerprint` ocupa el sensor `CAPTURE_SECONDS`."""
+
+    CAPTURE_SECONDS = 0.5
+
+    def __init__(self, template: bytes):
+        self._template = template
+        # Activo mientras hay una captura en curso
+        self.capturing = threading.Event()
+
+    def AcquireFingerprint(self, timeout_ms):  # noqa: N802 - nombre del SDK
+        self.capturing.set()
+        try:
+            time.sleep(self.CAPTURE_SECONDS)
+        finally:
+            self.capturing.clear()
+        return 0, b"image", self._template, None
+
+
+def _driver():
+    try:
+        from zk9500_driver import ZK9500Driver
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencias del intermediary-app no instaladas: {exc}") from exc
+    driver = ZK9500Driver()
+    driver._device = _OfflineDevice()
+    return driver
+
+
+@benchmark("fingerprint.match[{kind}]", params=[{"kind": "genuine"}, {"kind": "impostor"}], repeat=20)
+def bench_match(kind):
+    driver = _driver()
+    probe = fixtures.random_template(seed=1)
+    if kind == "genuine":
+        candidate = fixtures.similar_template(probe, flip_ratio=0.1)
+    else:
+        candidate = fixtures.random_template(seed=2)
+    yield lambda: driver.match(probe, candidate)
+
+
+def _bitloop_score(template_a: bytes, template_b: bytes) -> int:
+    """Comparación byte a byte original de `match`, como referencia de velocidad y resultado."""
+    biom_a = template_a[fixtures.BIOMETRIC_OFFSET:]
+    biom_b = template_b[fixtures.BIOMETRIC_OFFSET:]
+    matching_bits = 0
+    for byte_a, byte_b in zip(biom_a, biom_b):
+        matching_bits += 8 - bin(byte_a ^ byte_b).count('1')
+    similarity_pct = (matching_bits * 100) // (len(biom_a) * 8)
+    return similarity_pct if similarity_pct > 60 else 0
+
+
+@benchmark("fingerprint.match_bitloop[{kind}]", params=[{"kind": "genuine"}, {"kind": "impostor"}], repeat=20)
+def bench_match_bitloop(kind):
+    driver = _driver()
+    probe = fixtures.random_template(seed=1)
+    if kind == "genuine":
+        candidate = fixtures.similar_template(probe, flip_ratio=0.1)
+    else:
+        candidate = fixtures.random_template(seed=2)
+    expected = _bitloop_score(probe, candidate)
+    if driver.match(probe, candidate) != expected:
+        raise AssertionError("El matcher vectorizado no da el mismo score que la referencia")
+    yield lambda: _bitloop_score(probe, candidate)
+
+
+@benchmark("fingerprint.identify[candidates={n}]", params=[{"n": 3}, {"n": 20}, {"n": 100}, {"n": 500}],
+           repeat=lambda p: 10 if p["n"] <= 20 else 5)
+def bench_identify(n):
+    driver = _driver()
+    probe = fixtures.random_template(seed=1)
+    candidates = [fixtures.random_template(seed=100 + i) for i in range(n - 1)]
+    candidates.append(fixtures.similar_template(probe, flip_ratio=0.1))
+    yield lambda: driver.identify(probe, candidates)
+
+
+@benchmark("fingerprint.identify_early_accept[candidates={n},hint={hint}]",
+           params=[{"n": n, "hint": hint} for n in (20, 500) for hint in ("none", "last_match", "full_scan")],
+           repeat=lambda p: 10 if p["n"] <= 20 else 5)
+def bench_identify_early_accept(n, hint):
+    """
+    `identify` con `accept_score`: la plantilla que coincide está en medio de
+    la lista. Sin pista se puntúan bloques de 1, 4, 16... hasta llegar a ella;
+    con la pista de la última coincidencia basta con un candidato. `full_scan`
+    es la referencia sin parada temprana (mismo resultado, todos puntuados).
+    """
+    driver = _driver()
+    probe = fixtures.random_template(seed=1)
+    candidates = [fixtures.random_template(seed=100 + i) for i in range(n - 1)]
+    genuine_idx = n // 2
+    candidates.insert(genuine_idx, fixtures.similar_template(probe, flip_ratio=0.1))
+    expected = driver.identify(probe, candidates)[:2]
+    order = [genuine_idx] if hint == "last_match" else None
+    accept_score = None if hint == "full_scan" else 80
+
+    def identify():
+        best_idx, best_score, scores = driver.identify(probe, candidates, accept_score=accept_score, order=order)
+        if (best_idx, best_score) != expected:
+            raise AssertionError("La parada temprana no devuelve el mismo candidato que la búsqueda completa")
+        return Metrics(best_index=best_idx, best_score=best_score,
+                       scored=sum(score is not None for score in scores))
+
+    yield identify
+
+
+@benchmark("fingerprint.enroll_selection[captures={n}]", params=[{"n": 3}, {"n": 10}], repeat=20)
+def bench_enroll_selection(n):
+    """
+    Selección de capturas de registro (similitud de todos los pares, descarte
+    de la captura de otro dedo y orden por calidad) y fusión por mayoría de las
+    3 mejores. Las métricas comparan el score medio de capturas nuevas del mismo
+    dedo contra la plantilla fusionada y contra la mejor captura suelta.
+    """
+    try:
+        from zk9500_driver import fuse_templates
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencias del intermediary-app no instaladas: {exc}") from exc
+
+    driver = _driver()
+    finger = fixtures.random_template(seed=1)
+    captures = [fixtures.similar_template(finger, flip_ratio=0.1, seed=i) for i in range(n - 1)]
+    captures.append(fixtures.random_template(seed=2))  # otro dedo, con la mejor calidad
+    qualities = [60 + 3 * i for i in range(n)]
+    probes = [fixtures.similar_template(finger, flip_ratio=0.1, seed=100 + i) for i in range(10)]
+
+    def select_and_fuse():
+        ranked = driver.select_enrollment(captures, qualities)
+        best = [captures[i] for i in ranked[:3]]
+        fused = fuse_templates(best) if len(best) == 3 else best[0]
+        return Metrics(
+            kept=len(ranked), outlier_discarded=(n - 1) not in ranked,
+            fused_score=sum(driver.match(p, fused) for p in probes) / len(probes),
+            single_score=sum(driver.match(p, best[0]) for p in probes) / len(probes))
+
+    yield select_and_fuse
+
+
+# Con el matching fuera del lock de captura, identify+match sobre 100 candidatos tarda ~1 ms;
+# esperando a la captura tardaría hasta `CAPTURE_SECONDS`
+BLOCKED_BOUND_SECONDS = _SlowCaptureDevice.CAPTURE_SECONDS / 5
+
+
+@benchmark("fingerprint.identify_during_capture[candidates={n}]", params=[{"n": 100}], repeat=10)
+def bench_identify_during_capture(n):
+    """
+    `identify` y `match` mientras otro hilo mantiene el lector ocupado
+    capturando en bucle. Si el matching esperase al lock de captura, cada
+    medición rondaría `CAPTURE_SECONDS`; sin lock debe quedarse en lo mismo
+    que `identify` solo. Si tarda más de `BLOCKED_BOUND_SECONDS` con una
+    captura en curso, el benchmark falla.
+    """
+    driver = _driver()
+    probe = fixtures.random_template(seed=1)
+    candidates = [fixtures.random_template(seed=100 + i) for i in range(n - 1)]
+    candidates.append(fixtures.similar_template(probe, flip_ratio=0.1))
+    device = _SlowCaptureDevice(probe)
+    driver._device = device
+
+    stop = threading.Event()
+    captures = []
+
+    def capture_loop():
+        while not stop.is_set():
+            captures.append(driver.capture(timeout_ms=100, retries=1))
+
+    worker = threading.Thread(target=capture_loop, daemon=True)
+    worker.start()
+    if not device.capturing.wait(timeout=5):
+        raise AssertionError("La captura de fondo no llegó a empezar")
+
+    def identify_while_capturing():
+        device.capturing.wait(timeout=_SlowCaptureDevice.CAPTURE_SECONDS)
+        start = time.perf_counter()
+        best_idx, best_score, _ = driver.identify(probe, candidates)
+        match_score = driver.match(probe, candidates[-1])
+        elapsed = time.perf_counter() - start
+        if elapsed > BLOCKED_BOUND_SECONDS:
+            raise AssertionError(
+                f"identify/match tardaron {elapsed * 1000:.0f} ms con una captura en curso "
+                f"(límite {BLOCKED_BOUND_SECONDS * 1000:.0f} ms): el matching espera al lock de captura")
+        return Metrics(best_index=best_idx, best_score=best_score, match_score=match_score,
+                       capture_seconds=_SlowCaptureDevice.CAPTURE_SECONDS,
+                       captures_completed=len(captures))
+
+    yield identify_while_capturing
+    stop.set()
+    worker.join()
+
+
+@benchmark("fingerprint.verify_roundtrip[client={client}]",
+           params=[{"client": "per_request"}, {"client": "pooled"}], repeat=50, warmup=3)
+def bench_verify_roundtrip(client):
+    """
+    Petición `verify` del backend al intermediary (stand-in sin latencia de
+    captura, 3 plantillas en el body). `per_request` crea un `AsyncClient` por
+    llamada, como antes; `pooled` usa el cliente compartido del backend, que
+    reutiliza la conexión keep-alive.
+    """
+    try:
+        import httpx
+        from app.services.intermediary_client import (
+            CAPTURE_TIMEOUT, close_intermediary_client, get_intermediary_client)
+        from benchmarks.loadtest.fake_intermediary import FakeIntermediaryServer
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencias del backend no instaladas: {exc}") from exc
+
+    payload = {
+        "candidates": [
+            {"user_id": "bench-user", "template_base64": base64.b64encode(fixtures.random_template(seed=i)).decode()}
+            for i in range(3)
+        ],
+        "score_threshold": 60,
+    }
+    loop = asyncio.new_event_loop()
+    with FakeIntermediaryServer(capture_latency=0) as server:
+        url = f"{server.url}/fingerprint/zk9500/verify"
+
+        async def per_request():
+            async with httpx.AsyncClient(timeout=CAPTURE_TIMEOUT) as http:
+                return await http.post(url, json=payload)
+
+        async def pooled():
+            return await get_intermediary_client().post(url, json=payload, timeout=CAPTURE_TIMEOUT)
+
+        call = per_request if client == "per_request" else pooled
+
+        def roundtrip():
+            resp = loop.run_until_complete(call())
+            resp.raise_for_status()
+
+        yield roundtrip
+        loop.run_until_complete(close_intermediary_client())
+    loop.close()
+
+
+@benchmark("fingerprint.verify_payload[transport={transport},templates={n}]",
+           params=[{"transport": t, "n": n} for n in (3, 20) for t in ("json", "msgpack", "hashes")], repeat=30)
+def bench_verify_payload(transport, n):
+    """
+    CPU de serializar el body de `verify` en el backend (desde las plantillas
+    base64 de Mongo) y leerlo en el intermediary hasta tener los bytes de cada
+    candidato. `hashes` es un usuario repetido: solo viajan los hashes y las
+    plantillas salen de la caché del intermediary. `metrics.payload_bytes` es
+    el tamaño del body.
+    """
+    try:
+        import hashlib
+        import json
+        import msgpack
+        from models import ZKVerifyBinaryRequest, ZKVerifyRequest
+        from template_cache import TemplateStore
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencias del intermediary-app no instaladas: {exc}") from exc
+
+    stored = [base64.b64encode(fixtures.random_template(seed=i)).decode("ascii") for i in range(n)]
+
+    def json_roundtrip():
+        body = json.dumps({"candidates": [{"user_id": "bench-user", "template_base64": t} for t in stored],
+                           "score_threshold": 60}).encode()
+        payload = ZKVerifyRequest.model_validate_json(body)
+        templates = [base64.b64decode(c.template_base64) for c in payload.candidates]
+        return Metrics(payload_bytes=len(body), templates=len(templates))
+
+    def msgpack_roundtrip():
+        body = msgpack.packb({"candidates": [{"user_id": "bench-user", "template": base64.b64decode(t)} for t in stored],
+                              "score_threshold": 60}, use_bin_type=True)
+        payload = ZKVerifyBinaryRequest.model_validate(msgpack.unpackb(body, raw=False))
+        templates = [c.template for c in payload.candidates]
+        return Metrics(payload_bytes=len(body), templates=len(templates))
+
+    store = TemplateStore(max_bytes=64 * 1024 * 1024)
+    hashes = [store.put("bench-user", base64.b64decode(t)) for t in stored]
+    assert hashes == [hashlib.sha1(base64.b64decode(t)).hexdigest() for t in stored]
+
+    def hashes_roundtrip():
+        body = msgpack.packb({"candidates": [{"user_id": "bench-user", "template_hash": h} for h in hashes],
+                              "score_threshold": 60}, use_bin_type=True)
+        payload = ZKVerifyBinaryRequest.model_validate(msgpack.unpackb(body, raw=False))
+        templates = [store.get(c.user_id, c.template_hash) for c in payload.candidates]
+        return Metrics(payload_bytes=len(body), templates=sum(t is not None for t in templates))
+
+    yield {"json": json_roundtrip, "msgpack": msgpack_roundtrip, "hashes": hashes_roundtrip}[transport]
+
+
+@benchmark("fingerprint.cache_identify[templates={n},prefilter={prefilter}]",
+           params=[{"n": n, "prefilter": p} for n in (1000, 10000) for p in ("off", "on")],
+           repeat=lambda p: 20 if p["n"] <= 1000 else 10)
+def bench_cache_identify(n, prefilter):
+    """
+    Identificación 1:N sobre la caché en Python con `n` plantillas. Con
+    `prefilter=on` se comparan primero las firmas de 256 bytes y solo las
+    supervivientes pasan al matcher completo. `recall` es la fracción de
+    probes genuinas (ruido del 10 al 35 %) que devuelven la misma plantilla
+    que la búsqueda completa.
+    """
+    try:
+        from template_cache import PythonTemplateCache
+        from zk9500_driver import prefilter_signatures, template_signature
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencias del intermediary-app no instaladas: {exc}") from exc
+
+    driver = _driver()
+    if prefilter == "on":
+        cache = PythonTemplateCache(driver.score_candidates, signature=template_signature,
+                                    prefilter=prefilter_signatures)
+    else:
+        cache = PythonTemplateCache(driver.score_candidates)
+    exhaustive = PythonTemplateCache(driver.score_candidates)
+    templates = [fixtures.random_template(seed=i) for i in range(n)]
+    for idx, template in enumerate(templates):
+        cache.set_user_templates(f"user-{idx}", [template])
+        exhaustive.set_user_templates(f"user-{idx}", [template])
+
+    probes = [fixtures.similar_template(templates[(idx * 7919) % n], flip_ratio=0.10 + 0.05 * (idx % 6), seed=idx)
+              for idx in range(30)]
+    expected = [exhaustive.identify(probe) for probe in probes]
+    found = [cache.identify(probe) for probe in probes]
+    genuine = [idx for idx, hit in enumerate(expected) if hit is not None]
+    recall = sum(found[idx] == expected[idx] for idx in genuine) / len(genuine)
+    del exhaustive
+
+    rounds = iter(range(1 << 30))
+
+    def identify():
+        hit = cache.identify(probes[next(rounds) % len(probes)])
+        return Metrics(recall=recall, genuine_probes=len(genuine), matched=hit is not None)
+
+    yield identify
+
+
+@contextlib.contextmanager
+def _standin_sdk(template_bytes: int):
+    """
+    `ZKFingerStandard` sobre una DLL sustituta cuando `libzkfp` no está (Linux,
+    CI): `ZKFPM_MatchFinger` pasa a ser `memcmp` de libc con el mismo
+    prototipo. Los tres primeros argumentos coinciden (handle, plantilla,
+    longitud; el resto se ignora), el handle apunta a un buffer de 0xFF y las
+    plantillas empiezan por 0x00, así que `memcmp` devuelve un score positivo
+    en el primer byte. Se mide el coste de la llamada ctypes por candidato,
+    no el del matching del SDK.
+    """
+    try:
+        import zkfinger_standard
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencias del intermediary-app no instaladas: {exc}") from exc
+    libc_path = ctypes.util.find_library("c")
+    if libc_path is None:
+        raise SkipBenchmark("libc no encontrada para sustituir a libzkfp")
+    match = ctypes.CDLL(libc_path).memcmp
+    match.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_uint, ctypes.c_char_p, ctypes.c_uint]
+    match.restype = ctypes.c_int
+
+    saved = zkfinger_standard._libzkfp, zkfinger_standard.SDK_AVAILABLE
+    zkfinger_standard._libzkfp = types.SimpleNamespace(ZKFPM_MatchFinger=match)
+    zkfinger_standard.SDK_AVAILABLE = True
+    try:
+        sdk = zkfinger_standard.ZKFingerStandard()
+        handle = ctypes.create_string_buffer(b"\xff" * template_bytes, template_bytes)
+        sdk._is_initialized = True
+        sdk._hdb_cache = ctypes.addressof(handle)
+        sdk._hdb_arg = ctypes.c_void_p(sdk._hdb_cache)
+        yield sdk, match
+    finally:
+        zkfinger_standard._libzkfp, zkfinger_standard.SDK_AVAILABLE = saved
+
+
+def _per_call_identify(match, hdb_cache, probe: bytes, candidates: list[bytes]) -> int:
+    """Bucle anterior de `identify`: argumentos de ctypes nuevos por candidato, como referencia."""
+    best = 0
+    for cand in candidates:
+        score = match(hdb_cache, ctypes.c_char_p(probe), ctypes.c_uint(len(probe)),
+                      ctypes.c_char_p(cand), ctypes.c_uint(len(cand)))
+        best = max(best, min(100, score))
+    return best
+
+
+@benchmark("fingerprint.sdk_identify[candidates={n},buffers={buffers}]",
+           params=[{"n": n, "buffers": b} for n in (100, 1000) for b in ("per_call", "reused")], repeat=20)
+def bench_sdk_identify(n, buffers):
+    """
+    `ZKFingerStandard.identify` con `n` plantillas del tamaño del SDK (~2 KB).
+    `per_call` reconstruye los argumentos de ctypes de cada candidato en cada
+    llamada (comportamiento anterior); `reused` usa las preparaciones cacheadas
+    por candidato (la probe se prepara en cada llamada, sin guardarla). `calls_per_s` son comparaciones por segundo.
+    """
+    template_bytes = 2048
+    rng = random.Random(0)
+    candidates = [b"\x00" + rng.randbytes(template_bytes - 1) for _ in range(n)]
+    probe = b"\x00" + rng.randbytes(template_bytes - 1)
+    with _standin_sdk(template_bytes) as (sdk, match):
+        if buffers == "reused":
+            sdk.identify(probe, candidates)  # primera pasada: prepara las plantillas
+
+            def run():
+                start = time.perf_counter()
+                sdk.identify(probe, candidates)
+                return Metrics(calls_per_s=round(n / (time.perf_counter() - start)))
+        else:
+            def run():
+                start = time.perf_counter()
+                _per_call_identify(match, sdk._hdb_cache, probe, candidates)
+                return Metrics(calls_per_s=round(n / (time.perf_counter() - start)))
+
+        yield run
@@ -0,0 +1,101 @@
+"""
+Memoria del backend multi-worker: arranca Gunicorn con `backend/gunicorn.conf.py`
+y 1/4/8 workers, con los modelos faciales precargados en el master
+(`PRELOAD_FACIAL_MODELS=True`) o cargados por cada worker (`False`), y mide la
+memoria total del árbol de procesos una vez estabilizada.
+
+`rss_total_mb` cuenta varias veces las páginas compartidas; `pss_total_mb`
+(Linux) las reparte entre los procesos que las comparten y es la cifra que
+refleja el ahorro copy-on-write.
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import BACKEND_DIR, Metrics, SkipBenchmark, benchmark
+
+STARTUP_TIMEOUT = 300
+STABLE_SAMPLES = 3
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _tree_memory(psutil, root) -> tuple[int, dict]:
+    procs = [root] + root.children(recursive=True)
+    totals = {"rss": 0, "pss": 0, "uss": 0}
+    for proc in procs:
+        try:
+            info = proc.memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        totals["rss"] += info.rss
+        totals["pss"] += getattr(info, "pss", 0)
+        totals["uss"] += getattr(info, "uss", 0)
+    return len(procs), totals
+
+
+def _measure(workers: int, preload: bool) -> Metrics:
+    try:
+        import psutil
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencia no instalada: {exc.name}") from exc
+
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_BIND": f"127.0.0.1:{_free_port()}",
+        "PRELOAD_FACIAL_MODELS": "True" if preload else "False",
+        "AUTH_ONLY_MODE": "False",
+        "FACIAL_INFERENCE_MODE": "inline",
+    }
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        root = psutil.Process(proc.pid)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        history = []
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                last_line = (proc.stderr.read().decode(errors="replace").strip().splitlines() or ["?"])[-1]
+                raise SkipBenchmark(f"Gunicorn no arrancó en este entorno: {last_line}")
+            n_procs, totals = _tree_memory(psutil, root)
+            # Estable: todos los workers vivos y la RSS total sin variar más de un 1 %
+            if n_procs == workers + 1:
+                history.append(totals)
+                recent = history[-STABLE_SAMPLES:]
+                rss = [t["rss"] for t in recent]
+                if len(recent) == STABLE_SAMPLES and max(rss) - min(rss) <= 0.01 * max(rss):
+                    break
+            time.sleep(1.0)
+        else:
+            raise SkipBenchmark("Gunicorn no se estabilizó a tiempo")
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+    mb = 1024 * 1024
+    return Metrics(
+        processes=n_procs,
+        rss_total_mb=round(totals["rss"] / mb, 1),
+        pss_total_mb=round(totals["pss"] / mb, 1),
+        uss_total_mb=round(totals["uss"] / mb, 1),
+        pss_per_worker_mb=round(totals["pss"] / mb / workers, 1),
+    )
+
+
+@benchmark("memory.gunicorn[workers={workers},preload={preload}]",
+           params=[{"workers": w, "preload": p} for p in (True, False) for w in (1, 4, 8)],
+           repeat=1, warmup=0)
+def bench_gunicorn_memory(workers, preload):
+    yield lambda: _measure(workers, preload)
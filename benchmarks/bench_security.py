@@ -0,0 +1,38 @@
+"""Benchmarks de contraseñas (argon2) y tokens JWT del backend."""
+from benchmarks.harness import SkipBenchmark, benchmark
+
+
+def _security():
+    try:
+        from app.core import security
+    except ImportError as exc:
+        raise SkipBenchmark(f"Dependencias del backend no instaladas: {exc}") from exc
+    return security
+
+
+@benchmark("security.hash_password", repeat=10)
+def bench_hash_password():
+    security = _security()
+    yield lambda: security.hash_password("Password123!")
+
+
+@benchmark("security.verify_password", repeat=10)
+def bench_verify_password():
+    security = _security()
+    hashed = security.hash_password("Password123!")
+    yield lambda: security.verify_password("Password123!", hashed)
+
+
+@benchmark("security.create_access_token", repeat=200)
+def bench_create_access_token():
+    security = _security()
+    data = {"sub": "bench-user", "email": "bench@example.com"}
+    yield lambda: security.create_access_token(data)
+
+
+@benchmark("security.verify_token", repeat=200)
+def bench_verify_token():
+    security = _security()
+    token = security.create_access_token(
+        {"sub": "bench-user", "email": "bench@example.com"})
+    yield lambda: security.verify_token(token)
@@ -0,0 +1,57 @@
+"""
+Tiempo de arranque del backend: `import app.main` en un intérprete limpio,
+medido con `python -X importtime`, en modo completo y en modo auth-only, más
+el coste diferido de cargar la pila de visión en el primer uso facial.
+"""
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import BACKEND_DIR, Metrics, SkipBenchmark, benchmark
+
+HEAVY_MODULES = ("cv2", "mediapipe", "face_recognition", "dlib", "ultralytics", "torch")
+
+
+def _parse_importtime(stderr: str) -> dict[str, int]:
+    """Devuelve {módulo: microsegundos acumulados} a partir de la salida de -X importtime."""
+    cumulative: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative[parts[2].strip()] = int(parts[1].strip())
+    return cumulative
+
+
+def _import_in_subprocess(code: str, env_overrides: dict) -> Metrics:
+    env = {**os.environ, **env_overrides}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR,
+                          env=env, capture_output=True, text=True, timeout=600)
+    if proc.returncode != 0:
+        last_line = (proc.stderr.strip().splitlines() or ["?"])[-1]
+        raise SkipBenchmark(f"El import falla en este entorno: {last_line}")
+    cumulative = _parse_importtime(proc.stderr)
+    top_level = sorted(((name, us) for name, us in cumulative.items() if "." not in name),
+                       key=lambda item: item[1], reverse=True)
+    return Metrics(
+        app_main_import_ms=round(cumulative.get("app.main", 0) / 1000, 2),
+        heavy_modules_loaded=[m for m in HEAVY_MODULES if m in cumulative],
+        slowest_top_level=[{"module": n, "ms": round(us / 1000, 2)} for n, us in top_level[:8]],
+    )
+
+
+@benchmark("startup.import_app_main[mode={mode}]",
+           params=[{"mode": "full"}, {"mode": "auth_only"}], repeat=3, warmup=1)
+def bench_import_app_main(mode):
+    env = {"AUTH_ONLY_MODE": "True" if mode == "auth_only" else "False"}
+    yield lambda: _import_in_subprocess("import app.main", env)
+
+
+@benchmark("startup.first_facial_use", repeat=3, warmup=1)
+def bench_first_facial_use():
+    code = ("import app.main\n"
+            "from app.services.facial_recognition_service import get_facial_service\n"
+            "get_facial_service()")
+    yield lambda: _import_in_subprocess(code, {"AUTH_ONLY_MODE": "False"})
@@ -0,0 +1,53 @@
+"""
+Compara dos ficheros de resultados de `benchmarks.run`.
+
+    python -m benchmarks.compare benchmarks/results/abc123.json benchmarks/results/def456.json
+
+Marca como regresión cualquier caso cuya mediana empeore más que `--threshold`
+(por defecto 10 %) y termina con código 1 si hay alguna.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _load(path: Path) -> tuple[dict, dict]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    return data.get("meta", {}), {r["name"]: r for r in data.get("results", [])}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Diferencia entre dos ejecuciones de benchmarks")
+    parser.add_argument("base", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Empeoramiento relativo de la mediana considerado regresión")
+    args = parser.parse_args(argv)
+
+    base_meta, base = _load(args.base)
+    new_meta, new = _load(args.new)
+    print(f"base: {base_meta.get('commit')}  ->  new: {new_meta.get('commit')}\n")
+
+    regressions = 0
+    for name in sorted(set(base) | set(new)):
+        old_r, new_r = base.get(name), new.get(name)
+        if not old_r or not new_r or "median_ms" not in old_r or "median_ms" not in new_r:
+            status = "sin datos" if not (old_r and new_r) else "omitido/error"
+            print(f"{name:<55} {status}")
+            continue
+        old_ms, new_ms = old_r["median_ms"], new_r["median_ms"]
+        delta = (new_ms - old_ms) / old_ms if old_ms else 0.0
+        flag = ""
+        if delta > args.threshold:
+            flag = "  << REGRESIÓN"
+            regressions += 1
+        elif delta < -args.threshold:
+            flag = "  mejora"
+        print(f"{name:<55} {old_ms:>10.3f} -> {new_ms:>10.3f} ms  ({delta:+.1%}){flag}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
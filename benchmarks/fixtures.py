@@ -0,0 +1,120 @@
+"""
+Fixtures sintéticas y deterministas para los benchmarks.
+
+- Rostros: dibujados con OpenCV (óvalo, ojos, cejas, nariz y boca) y
+  codificados en JPEG. Si se define `BENCH_FACES_DIR` con fotos reales
+  (`*.jpg`/`*.png`) se usan esas en su lugar, lo que da tiempos más
+  representativos para MediaPipe/dlib.
+- Plantillas de huella: bytes pseudoaleatorios con el mismo formato que
+  entrega el ZK9500 (imagen + datos biométricos a partir de `BIOMETRIC_OFFSET`)
+  y con similitud controlable entre probe y candidato.
+"""
+import os
+import random
+import shutil
+from pathlib import Path
+
+from benchmarks.harness import SkipBenchmark
+
+BIOMETRIC_OFFSET = 50000
+TEMPLATE_SIZE = BIOMETRIC_OFFSET + 2048
+
+
+def _require_cv():
+    try:
+        import cv2
+        import numpy as np
+    except ImportError as exc:
+        raise SkipBenchmark(f"OpenCV/NumPy no instalados: {exc}") from exc
+    return cv2, np
+
+
+def synthetic_face_jpeg(seed: int = 0, width: int = 640, height: int = 480) -> bytes:
+    cv2, np = _require_cv()
+    rng = random.Random(seed)
+    image = np.full((height, width, 3), (rng.randint(160, 220),
+                    rng.randint(160, 220), rng.randint(160, 220)), dtype=np.uint8)
+
+    cx = width // 2 + rng.randint(-20, 20)
+    cy = height // 2 + rng.randint(-10, 10)
+    face_w, face_h = rng.randint(110, 130), rng.randint(145, 165)
+    skin = (rng.randint(120, 160), rng.randint(150, 185), rng.randint(190, 230))
+    cv2.ellipse(image, (cx, cy), (face_w, face_h), 0, 0, 360, skin, -1)
+
+    eye_dx, eye_y = rng.randint(40, 50), cy - rng.randint(30, 45)
+    for side in (-1, 1):
+        ex = cx + side * eye_dx
+        cv2.ellipse(image, (ex, eye_y), (22, 11), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(image, (ex, eye_y), 8, (60, 40, 30), -1)
+        cv2.circle(image, (ex, eye_y), 3, (10, 10, 10), -1)
+        cv2.line(image, (ex - 24, eye_y - 24), (ex + 24, eye_y - 28), (40, 30, 30), 5)
+
+    cv2.line(image, (cx, cy - 15), (cx - 10, cy + 30), (90, 110, 150), 3)
+    cv2.line(image, (cx - 10, cy + 30), (cx + 8, cy + 32), (90, 110, 150), 3)
+    cv2.ellipse(image, (cx, cy + 75), (40, 15), 0, 0, 180, (60, 60, 170), 4)
+
+    noise = np.random.default_rng(seed).integers(-6, 7, image.shape, dtype=np.int16)
+    image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("No se pudo codificar el rostro sintético")
+    return encoded.tobytes()
+
+
+def face_images(count: int) -> list[bytes]:
+    """Devuelve `count` imágenes de rostro (reales si hay `BENCH_FACES_DIR`)."""
+    faces_dir = os.getenv("BENCH_FACES_DIR")
+    if faces_dir:
+        files = sorted(p for p in Path(faces_dir).iterdir()
+                       if p.suffix.lower() in (".jpg", ".jpeg", ".png"))
+        if files:
+            return [files[i % len(files)].read_bytes() for i in range(count)]
+    return [synthetic_face_jpeg(seed=i) for i in range(count)]
+
+
+def write_enrolled_images(directory: Path, images: list[bytes]) -> list[str]:
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for idx, data in enumerate(images):
+        path = directory / f"face_20240101_{idx:06d}.jpg"
+        path.write_bytes(data)
+        paths.append(str(path))
+    return paths
+
+
+def populate_facial_data_dir(root: Path, users: int, distinct_faces: int = 16) -> None:
+    """
+    Crea `users` carpetas de usuario con una imagen cada una, con la misma
+    estructura que `FacialRecognitionService.FACIAL_DATA_DIR`. Para que 10k
+    usuarios no ocupen cientos de MB se usan enlaces duros a unas pocas
+    imágenes fuente.
+    """
+    sources_dir = root.parent / f"{root.name}_sources"
+    sources = write_enrolled_images(
+        sources_dir, face_images(distinct_faces + 1)[1:])
+    root.mkdir(parents=True, exist_ok=True)
+    for idx in range(users):
+        user_dir = root / f"bench-user-{idx:06d}"
+        user_dir.mkdir(exist_ok=True)
+        target = user_dir / "face_20240101_000000.jpg"
+        source = sources[idx % len(sources)]
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+
+def random_template(seed: int, size: int = TEMPLATE_SIZE) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def similar_template(template: bytes, flip_ratio: float, seed: int = 0) -> bytes:
+    """Copia de `template` con ~`flip_ratio` de los bits biométricos invertidos."""
+    rng = random.Random(seed)
+    data = bytearray(template)
+    start = BIOMETRIC_OFFSET if len(data) > BIOMETRIC_OFFSET else 0
+    total_bits = (len(data) - start) * 8
+    for bit in rng.sample(range(total_bits), int(total_bits * flip_ratio)):
+        data[start + bit // 8] ^= 1 << (bit % 8)
+    return bytes(data)
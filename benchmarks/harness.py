@@ -0,0 +1,145 @@
+"""
+Utilidades mínimas para los benchmarks: registro de casos, medición y salida JSON.
+
+Cada benchmark es un generador que prepara sus datos, hace `yield` de una
+función sin argumentos (la que se mide) y, tras el `yield`, limpia lo que haya
+creado. Si una dependencia no está instalada se lanza `SkipBenchmark` y el caso
+queda marcado como omitido en el JSON en lugar de romper la ejecución.
+"""
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+INTERMEDIARY_DIR = ROOT_DIR / "intermediary-app"
+
+
+def setup_paths() -> None:
+    """Permite importar `app.*` (backend) y los módulos del intermediary-app."""
+    for path in (BACKEND_DIR, INTERMEDIARY_DIR):
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+
+
+class SkipBenchmark(Exception):
+    """El benchmark no puede ejecutarse en este entorno (dependencia ausente, etc.)."""
+
+
+class Metrics(dict):
+    """
+    Valor de retorno opcional de la función medida: lo que devuelva la última
+    repetición se guarda tal cual en el campo `metrics` del resultado.
+    """
+
+
+class Benchmark:
+    def __init__(self, name: str, factory: Callable[..., Iterator[Callable[[], object]]],
+                 params: dict, repeat: int, warmup: int):
+        self.name = name
+        self.factory = factory
+        self.params = params
+        self.repeat = repeat
+        self.warmup = warmup
+
+
+_REGISTRY: list[Benchmark] = []
+
+
+def benchmark(name: str, params: Optional[list[dict]] = None, repeat: int = 20, warmup: int = 1):
+    """
+    Registra un benchmark. `name` admite campos de formato con los `params`,
+    p.ej. ``"facial.compare_faces[n={n}]"``; se registra un caso por cada dict.
+    `repeat` puede ser un entero o una función ``params -> int``.
+    """
+    def decorator(func):
+        factory = contextlib.contextmanager(func)
+        for case in params or [{}]:
+            reps = repeat(case) if callable(repeat) else repeat
+            _REGISTRY.append(Benchmark(name.format(**case),
+                             factory, case, reps, warmup))
+        return func
+    return decorator
+
+
+def registered() -> list[Benchmark]:
+    return list(_REGISTRY)
+
+
+def _summarize(samples_ns: list[int]) -> dict:
+    samples_ms = sorted(s / 1e6 for s in samples_ns)
+    p95_idx = max(0, int(round(0.95 * len(samples_ms))) - 1)
+    return {
+        "repeat": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+        "median_ms": round(statistics.median(samples_ms), 4),
+        "min_ms": round(samples_ms[0], 4),
+        "max_ms": round(samples_ms[-1], 4),
+        "p95_ms": round(samples_ms[p95_idx], 4),
+        "stdev_ms": round(statistics.stdev(samples_ms), 4) if len(samples_ms) > 1 else 0.0,
+    }
+
+
+def run_benchmark(bench: Benchmark, repeat: Optional[int] = None) -> dict:
+    result: dict = {"name": bench.name, "params": bench.params}
+    try:
+        with bench.factory(**bench.params) as fn:
+            for _ in range(bench.warmup):
+                fn()
+            samples = []
+            last = None
+            gc_was_enabled = gc.isenabled()
+            gc.collect()
+            gc.disable()
+            try:
+                for _ in range(repeat or bench.repeat):
+                    start = time.perf_counter_ns()
+                    last = fn()
+                    samples.append(time.perf_counter_ns() - start)
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+        result.update(_summarize(samples))
+        if isinstance(last, Metrics):
+            result["metrics"] = dict(last)
+    except SkipBenchmark as exc:
+        result["skipped"] = str(exc)
+    except Exception as exc:  # noqa: BLE001
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def environment_metadata() -> dict:
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_results(path: Path, results: list[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"meta": environment_metadata(), "results": results}
+    path.write_text(json.dumps(payload, indent=2,
+                    ensure_ascii=False) + "\n", encoding="utf-8")
@@ -0,0 +1,130 @@
+"""
+Stand-in del intermediary-app para pruebas de carga sin lector ZK9500.
+
+Expone los mismos endpoints y modelos que `intermediary-app/main.py` (JSON
+o msgpack, como el real), con una latencia de captura configurable, y se
+sirve con Uvicorn en un hilo propio para que el backend lo llame por HTTP
+igual que en producción.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+
+import msgpack
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from benchmarks import fixtures
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def _reply(request: Request, content: dict):
+    if MSGPACK_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(msgpack.packb(content, use_bin_type=True), media_type=MSGPACK_MEDIA_TYPE)
+    return content
+
+
+def build_app(capture_latency: float = 0.05, match_score: int = 85) -> FastAPI:
+    app = FastAPI(title="Fake ZK9500 intermediary")
+    templates = [fixtures.random_template(seed=i) for i in range(3)]
+    templates_base64 = [base64.b64encode(t).decode("ascii") for t in templates]
+    # (user_id, sha1) de las plantillas ya recibidas, como la caché del intermediary real
+    known_hashes: set[tuple[str, str]] = set()
+
+    @app.get("/fingerprint/zk9500/status")
+    async def zk_status():
+        return {"ready": True}
+
+    @app.post("/fingerprint/zk9500/register")
+    async def zk_register(user_id: str, request: Request):
+        # Registro real: varias capturas secuenciales
+        await asyncio.sleep(capture_latency * 3)
+        if MSGPACK_MEDIA_TYPE in request.headers.get("accept", ""):
+            return _reply(request, {"user_id": user_id, "templates": templates, "qualities": [80, 80, 80]})
+        return {"user_id": user_id, "templates_base64": templates_base64, "qualities": [80, 80, 80]}
+
+    @app.post("/fingerprint/zk9500/verify")
+    async def zk_verify(request: Request):
+        await asyncio.sleep(capture_latency)
+        body = await request.body()
+        if request.headers.get("content-type", "").startswith(MSGPACK_MEDIA_TYPE):
+            payload = msgpack.unpackb(body, raw=False)
+        else:
+            payload = json.loads(body)
+            for cand in payload.get("candidates") or []:
+                if cand.get("template_base64") is not None:
+                    cand["template"] = base64.b64decode(cand["template_base64"])
+        candidates = payload.get("candidates") or []
+        missing = []
+        for cand in candidates:
+            if cand.get("template") is not None:
+                known_hashes.add((cand.get("user_id"), hashlib.sha1(cand["template"]).hexdigest()))
+            elif (cand.get("user_id"), cand.get("template_hash")) not in known_hashes:
+                missing.append(cand.get("template_hash"))
+        if missing:
+            return JSONResponse(status_code=409, content={"detail": "Plantillas no disponibles en caché",
+                                                          "missing_hashes": missing})
+        if not candidates:
+            return _reply(request, {"match": False, "user_id": None, "score": None, "quality": 80})
+        return _reply(request, {
+            "match": True,
+            "user_id": candidates[0].get("user_id"),
+            "score": match_score + random.randint(-3, 3),
+            "quality": 80,
+        })
+
+    @app.delete("/fingerprint/zk9500/templates/{user_id}")
+    async def zk_delete_templates(user_id: str):
+        for key in [k for k in known_hashes if k[0] == user_id]:
+            known_hashes.discard(key)
+        return {"user_id": user_id, "templates_count": 0}
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ThreadedServer:
+    """Sirve una app ASGI en 127.0.0.1 desde un hilo en segundo plano."""
+
+    def __init__(self, app):
+        self.port = _free_port()
+        config = uvicorn.Config(app, host="127.0.0.1",
+                                port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "ThreadedServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("El servidor en segundo plano no arrancó")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+class FakeIntermediaryServer(ThreadedServer):
+    """Sirve `build_app()` en 127.0.0.1 desde un hilo en segundo plano."""
+
+    def __init__(self, capture_latency: float = 0.05):
+        super().__init__(build_app(capture_latency))
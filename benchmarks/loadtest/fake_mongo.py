@@ -0,0 +1,195 @@
+"""
+Base de datos en memoria con la parte de la API de Motor que usa el backend.
+
+Cubre `find_one`, `find(...).to_list`, `insert_one`, `insert_many`,
+`update_one` (`$set`, `$unset`, `$inc`, `$push`, `$pull`, `upsert`),
+`delete_one`, `delete_many`, `count_documents` y `create_index`, con filtros
+por igualdad/`$in` y proyecciones simples. Cada operación cede el control al
+bucle de eventos para imitar el comportamiento asíncrono del driver real.
+"""
+import asyncio
+import copy
+import itertools
+from typing import Any, Optional
+
+try:
+    from pymongo.errors import DuplicateKeyError
+except ImportError:  # pragma: no cover - pymongo llega con motor
+    class DuplicateKeyError(Exception):
+        pass
+
+_MISSING = object()
+_id_counter = itertools.count(1)
+
+
+def _get(doc: dict, dotted: str) -> Any:
+    value: Any = doc
+    for part in dotted.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _matches(doc: dict, flt: Optional[dict]) -> bool:
+    for key, expected in (flt or {}).items():
+        actual = _get(doc, key)
+        if isinstance(expected, dict) and any(k.startswith("$") for k in expected):
+            for op, arg in expected.items():
+                if op == "$in" and actual not in arg:
+                    return False
+                if op == "$nin" and actual in arg:
+                    return False
+                if op == "$ne" and actual == arg:
+                    return False
+                if op == "$exists" and (actual is not _MISSING) != bool(arg):
+                    return False
+        elif isinstance(actual, list) and not isinstance(expected, list):
+            if expected not in actual:
+                return False
+        elif actual != expected:
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: doc[k] for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    for key, value in projection.items():
+        if not value:
+            doc.pop(key, None)
+    return doc
+
+
+def _apply_update(doc: dict, update: dict) -> None:
+    for key, value in update.get("$set", {}).items():
+        doc[key] = copy.deepcopy(value)
+    for key in update.get("$unset", {}):
+        doc.pop(key, None)
+    for key, value in update.get("$inc", {}).items():
+        doc[key] = doc.get(key, 0) + value
+    for key, value in update.get("$push", {}).items():
+        doc.setdefault(key, []).append(copy.deepcopy(value))
+    for key, value in update.get("$pull", {}).items():
+        if isinstance(doc.get(key), list):
+            doc[key] = [v for v in doc[key] if v != value]
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class FakeCursor:
+    def __init__(self, docs: list[dict]):
+        self._docs = docs
+
+    def sort(self, key: str, direction: int = 1) -> "FakeCursor":
+        self._docs.sort(key=lambda d: _get(d, key), reverse=direction < 0)
+        return self
+
+    def limit(self, count: int) -> "FakeCursor":
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> list[dict]:
+        await asyncio.sleep(0)
+        return self._docs[:length] if length else list(self._docs)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: dict[Any, dict] = {}
+
+    async def find_one(self, flt: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]:
+        await asyncio.sleep(0)
+        if flt and set(flt) == {"_id"} and not isinstance(flt["_id"], dict):
+            doc = self._docs.get(flt["_id"])
+            return _project(doc, projection) if doc else None
+        for doc in self._docs.values():
+            if _matches(doc, flt):
+                return _project(doc, projection)
+        return None
+
+    def find(self, flt: Optional[dict] = None, projection: Optional[dict] = None) -> FakeCursor:
+        return FakeCursor([_project(d, projection) for d in self._docs.values() if _matches(d, flt)])
+
+    async def insert_one(self, doc: dict) -> _Result:
+        await asyncio.sleep(0)
+        doc.setdefault("_id", f"fake-{next(_id_counter)}")
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key: {doc['_id']}")
+        self._docs[doc["_id"]] = copy.deepcopy(doc)
+        return _Result(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs: list[dict], ordered: bool = True) -> _Result:
+        ids = [(await self.insert_one(doc)).inserted_id for doc in docs]
+        return _Result(inserted_ids=ids)
+
+    async def update_one(self, flt: dict, update: dict, upsert: bool = False) -> _Result:
+        await asyncio.sleep(0)
+        for doc in self._docs.values():
+            if _matches(doc, flt):
+                _apply_update(doc, update)
+                return _Result(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = {k: v for k, v in flt.items() if not isinstance(v, dict)}
+            _apply_update(doc, update)
+            for key, value in update.get("$setOnInsert", {}).items():
+                doc.setdefault(key, value)
+            inserted = await self.insert_one(doc)
+            return _Result(matched_count=0, modified_count=0, upserted_id=inserted.inserted_id)
+        return _Result(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def delete_one(self, flt: dict) -> _Result:
+        await asyncio.sleep(0)
+        for key, doc in list(self._docs.items()):
+            if _matches(doc, flt):
+                del self._docs[key]
+                return _Result(deleted_count=1)
+        return _Result(deleted_count=0)
+
+    async def delete_many(self, flt: dict) -> _Result:
+        await asyncio.sleep(0)
+        keys = [k for k, d in self._docs.items() if _matches(d, flt)]
+        for key in keys:
+            del self._docs[key]
+        return _Result(deleted_count=len(keys))
+
+    async def count_documents(self, flt: dict) -> int:
+        await asyncio.sleep(0)
+        return sum(1 for d in self._docs.values() if _matches(d, flt))
+
+    async def create_index(self, keys, **kwargs) -> str:
+        await asyncio.sleep(0)
+        return str(keys)
+
+
+class FakeDatabase:
+    def __init__(self, name: str = "loadtest"):
+        self.name = name
+        self._collections: dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def get_collection(self, name: str) -> FakeCollection:
+        return self[name]
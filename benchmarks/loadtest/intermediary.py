@@ -0,0 +1,171 @@
+"""
+Prueba de carga del intermediary-app real con el lector simulado.
+
+Arranca `intermediary-app/main.py` con `ZK_DRIVER=simulated` (sin pyzkfp ni
+hardware) servido por Uvicorn en un hilo, y lanza N clientes concurrentes que
+mezclan registros, verificaciones contra `--candidates` plantillas y
+consultas de estado. Informa throughput y percentiles por endpoint con el
+mismo formato que `benchmarks.loadtest.run`.
+
+    python -m benchmarks.loadtest.intermediary --concurrency 50 --duration 20
+    python -m benchmarks.loadtest.intermediary --latency 0.05 --failure-rate 0.05 --mix verify=90,register=10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from benchmarks import harness
+
+DEFAULT_MIX = "verify=70,register=10,status=20"
+FLOWS = ("verify", "register", "status")
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prueba de carga del intermediary-app con lector simulado")
+    parser.add_argument("--concurrency", type=int, default=20, help="Clientes concurrentes")
+    parser.add_argument("--duration", type=float, default=20.0, help="Duración de la fase medida (s)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Pesos por flujo: verify, register, status")
+    parser.add_argument("--candidates", type=int, default=20, help="Plantillas candidatas por verify")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios con plantilla en el pool de candidatos")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latencia de cada captura simulada (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probabilidad de fallo por captura")
+    parser.add_argument("--noise", type=float, default=0.1, help="Fracción de bits distintos entre capturas")
+    parser.add_argument("--readers", type=int, default=1, help="Lectores simulados en el pool (ZK_DEVICES)")
+    parser.add_argument("--fingers", type=int, default=10, help="Dedos distintos en el pool de candidatos")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", type=Path, help="Guardar el resumen en JSON")
+    parser.add_argument("--verbose", action="store_true", help="No silenciar logs del intermediary")
+    return parser.parse_args(argv)
+
+
+def _parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in FLOWS:
+            raise ValueError(f"Flujo desconocido: {name}. Disponibles: {', '.join(FLOWS)}")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def _load_intermediary(args):
+    """Configura el lector simulado e importa la app; debe ocurrir antes de importar `main`."""
+    os.environ.update({
+        "ZK_DRIVER": "simulated",
+        "ZK_SIMULATED_LATENCY": str(args.latency),
+        "ZK_SIMULATED_FAILURE_RATE": str(args.failure_rate),
+        "ZK_SIMULATED_NOISE": str(args.noise),
+        "ZK_SIMULATED_FINGERS": str(args.fingers),
+        "ZK_SIMULATED_SEED": str(args.seed),
+        "ZK_DEVICES": ",".join(str(idx) for idx in range(max(1, args.readers))),
+    })
+    harness.setup_paths()
+    import main as intermediary_main
+
+    return intermediary_main
+
+
+def _candidate_pool(driver, users: int, rng: random.Random) -> list[dict]:
+    """Plantillas 'registradas': una lectura ruidosa de uno de los dedos del lector por usuario."""
+    pool = []
+    for idx in range(users):
+        template = driver.noisy_template(f"finger-{idx % driver.fingers}", rng)
+        pool.append({"user_id": f"user-{idx}", "template_base64": driver.to_base64(template)})
+    return pool
+
+
+async def _client(session, mix: dict, pool: list[dict], args, deadline: float, rng: random.Random) -> None:
+    from benchmarks.loadtest.scenarios import ScenarioError
+
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        try:
+            if name == "verify":
+                candidates = rng.sample(pool, min(args.candidates, len(pool)))
+                await session.request("POST /fingerprint/zk9500/verify", "POST", "/fingerprint/zk9500/verify",
+                                      json={"candidates": candidates, "score_threshold": 40})
+            elif name == "register":
+                await session.request("POST /fingerprint/zk9500/register", "POST", "/fingerprint/zk9500/register",
+                                      params={"user_id": f"load-{rng.getrandbits(32):08x}"})
+            else:
+                await session.request("GET /fingerprint/zk9500/status", "GET", "/fingerprint/zk9500/status")
+            session.stats.flows[name] += 1
+        except ScenarioError:
+            session.stats.failed_flows[name] += 1
+
+
+async def _run(args, base_url: str, mix: dict, pool: list[dict]) -> dict:
+    import httpx
+    from benchmarks.loadtest.scenarios import Session, Stats
+
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        session = Session(client=client, stats=stats)
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            _client(session, mix, pool, args, deadline, random.Random(args.seed + i))
+            for i in range(args.concurrency)
+        ))
+        return stats.summary(time.perf_counter() - start)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    mix = _parse_mix(args.mix)
+    json_path = args.json.resolve() if args.json else None
+
+    intermediary_main = _load_intermediary(args)
+    if not args.verbose:
+        from loguru import logger
+        logger.remove()
+
+    from benchmarks.loadtest.fake_intermediary import ThreadedServer
+    from benchmarks.loadtest.run import _print_report
+
+    driver = intermediary_main.zk_driver
+    readers = [slot.driver for slot in intermediary_main.device_pool.slots]
+    # Siempre el mismo dedo en cada lector: el registro descarta capturas de dedos distintos
+    for reader in readers:
+        reader.present_finger("finger-0")
+    pool = _candidate_pool(driver, args.users, random.Random(args.seed))
+    with ThreadedServer(intermediary_main.app) as server:
+        print(f"Intermediary en {server.url} | lectores simulados: {len(readers)}, latencia={args.latency}s, "
+              f"fallos={args.failure_rate:.0%} | mix: {mix}")
+        summary = asyncio.run(_run(args, server.url, mix, pool))
+
+    summary["device"] = {key: sum(reader.stats()[key] for reader in readers) for key in ("captures", "failures")}
+    summary["device"]["per_reader"] = [reader.stats()["captures"] for reader in readers]
+    summary["config"] = {
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": mix,
+        "candidates": args.candidates,
+        "users": args.users,
+        "latency_s": args.latency,
+        "failure_rate": args.failure_rate,
+        "noise": args.noise,
+        "fingers": args.fingers,
+        "readers": len(readers),
+    }
+    _print_report(summary)
+    print(f"Capturas simuladas: {summary['device']['captures']} ({summary['device']['failures']} fallidas)")
+    if json_path:
+        json_path.write_text(json.dumps({"meta": harness.environment_metadata(), **summary}, indent=2) + "\n",
+                             encoding="utf-8")
+        print(f"\nResumen guardado en {json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
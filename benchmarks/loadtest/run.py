@@ -0,0 +1,207 @@
+"""
+Prueba de carga end-to-end del backend.
+
+Levanta la app FastAPI del backend en proceso (transporte ASGI de httpx),
+contra Mongo en memoria o un `mongod` local, con un intermediary-app simulado
+servido por HTTP, y reproduce una mezcla de flujos (registro, login, 2FA,
+huella, rostro) con N usuarios virtuales concurrentes. Informa throughput y
+percentiles de latencia por endpoint.
+
+    python -m benchmarks.loadtest.run --concurrency 20 --duration 30
+    python -m benchmarks.loadtest.run --mongo-uri mongodb://localhost:27017 --mix login=70,login_2fa=30
+    python -m benchmarks.loadtest.run --intermediary-url http://localhost:9000 --json carga.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks import harness
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    from benchmarks.loadtest.scenarios import DEFAULT_MIX
+
+    parser = argparse.ArgumentParser(description="Prueba de carga del backend con Mongo e intermediary simulados")
+    parser.add_argument("--concurrency", type=int, default=10, help="Usuarios virtuales concurrentes")
+    parser.add_argument("--duration", type=float, default=20.0, help="Duración de la fase medida (s)")
+    parser.add_argument("--users", type=int, default=30, help="Usuarios precargados antes de medir")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Pesos por flujo, p.ej. 'login=70,login_2fa=30'")
+    parser.add_argument("--mongo-uri", help="Usar un mongod real (se crea y borra una BD temporal)")
+    parser.add_argument("--intermediary-url", help="Usar un intermediary-app real en lugar del simulado")
+    parser.add_argument("--capture-latency", type=float, default=0.05,
+                        help="Latencia de captura del intermediary simulado (s)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", type=Path, help="Guardar el resumen en JSON")
+    parser.add_argument("--verbose", action="store_true", help="No silenciar logs del backend")
+    return parser.parse_args(argv)
+
+
+def _quiet_logs() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    try:
+        from loguru import logger
+        logger.remove()
+        logger.add(sys.stderr, level="ERROR")
+    except ImportError:
+        pass
+
+
+def _load_backend(args, facial_dir: str):
+    """Configura el entorno e importa la app; debe ocurrir antes de importar `app.*`."""
+    os.environ["FACIAL_DATA_PATH"] = facial_dir
+    if args.mongo_uri:
+        os.environ["MONGODB_URI"] = args.mongo_uri
+        os.environ["MONGODB_DB"] = f"loadtest_{int(time.time())}"
+    harness.setup_paths()
+    os.chdir(harness.BACKEND_DIR)
+
+    import app.mongo
+    if not args.mongo_uri:
+        from benchmarks.loadtest.fake_mongo import FakeDatabase
+        app.mongo.db = FakeDatabase()
+
+    from app.main import app as backend_app
+    return backend_app, app.mongo
+
+
+def _print_report(summary: dict) -> None:
+    print(f"\nDuración: {summary['elapsed_s']} s  |  peticiones: {summary['total_requests']}  |  "
+          f"throughput: {summary['throughput_rps']} req/s")
+    print(f"Flujos completados: {summary['flows']}")
+    if summary["failed_flows"]:
+        print(f"Flujos fallidos:    {summary['failed_flows']}")
+    print(f"\n{'endpoint':<45}{'req':>7}{'err':>6}{'rps':>9}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, row in summary["endpoints"].items():
+        print(f"{name:<45}{row['requests']:>7}{row['errors']:>6}{row['rps']:>9}"
+              f"{row['p50_ms']:>10}{row['p90_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+    print("(latencias en ms)")
+
+
+async def _seed_users(session, count: int, concurrency: int, with_face: bool, rng: random.Random) -> None:
+    from benchmarks.loadtest import scenarios
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def seed_one(idx: int):
+        async with semaphore:
+            user = await scenarios.register_user(session, with_face=with_face and idx % 2 == 0)
+            token = await scenarios.login(session, user)
+            if idx % 2 == 0:
+                await scenarios.enable_two_factor(session, user)
+            if idx % 2 == 1 or count == 1:
+                await scenarios.enroll_fingerprint(session, user, token)
+            session.users.append(user)
+
+    await asyncio.gather(*(seed_one(i) for i in range(count)))
+
+
+async def _virtual_user(session, mix: dict, deadline: float, rng: random.Random, stats) -> None:
+    from benchmarks.loadtest.scenarios import FLOWS, ScenarioError
+
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        try:
+            await FLOWS[name](session, rng)
+            stats.flows[name] += 1
+        except ScenarioError:
+            stats.failed_flows[name] += 1
+
+
+async def _run(args, backend_app, mix: dict, face_b64) -> dict:
+    import httpx
+    from benchmarks.loadtest.scenarios import Session, Stats
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=backend_app)
+    async with backend_app.router.lifespan_context(backend_app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=120) as client:
+            setup = Session(client=client, stats=Stats(), face_image_b64=face_b64)
+            await _seed_users(setup, args.users, args.concurrency, "login_facial" in mix, rng)
+
+            stats = Stats()
+            session = Session(client=client, stats=stats, face_image_b64=face_b64, users=setup.users)
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(
+                _virtual_user(session, mix, deadline, random.Random(args.seed + i), stats)
+                for i in range(args.concurrency)
+            ))
+            return stats.summary(time.perf_counter() - start)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    from benchmarks.loadtest.scenarios import encode_face, parse_mix
+
+    mix = parse_mix(args.mix)
+    json_path = args.json.resolve() if args.json else None
+
+    face_b64 = None
+    if "login_facial" in mix:
+        try:
+            from benchmarks import fixtures
+            face_b64 = encode_face(fixtures.face_images(1)[0])
+        except harness.SkipBenchmark as exc:
+            print(f"[WARN] Flujo login_facial deshabilitado: {exc}")
+            mix.pop("login_facial")
+
+    with tempfile.TemporaryDirectory(prefix="loadtest_facial_") as facial_dir, contextlib.ExitStack() as stack:
+        if not args.intermediary_url:
+            from benchmarks.loadtest.fake_intermediary import FakeIntermediaryServer
+            server = stack.enter_context(FakeIntermediaryServer(args.capture_latency))
+            os.environ["INTERMEDIARY_URL"] = server.url
+        else:
+            os.environ["INTERMEDIARY_URL"] = args.intermediary_url
+
+        backend_app, mongo = _load_backend(args, facial_dir)
+        if not args.verbose:
+            _quiet_logs()
+        print(f"Backend en proceso | Mongo: {args.mongo_uri or 'memoria'} | "
+              f"intermediary: {os.environ['INTERMEDIARY_URL']} | mix: {mix}")
+
+        with contextlib.ExitStack() as quiet:
+            if not args.verbose:
+                devnull = quiet.enter_context(open(os.devnull, "w"))
+                quiet.enter_context(contextlib.redirect_stdout(devnull))
+            summary = asyncio.run(_run(args, backend_app, mix, face_b64))
+
+        if args.mongo_uri:
+            asyncio.run(_drop_database(mongo))
+
+    summary["config"] = {
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "seed_users": args.users,
+        "mix": mix,
+        "mongo": "mongod" if args.mongo_uri else "memory",
+        "intermediary": args.intermediary_url or f"simulated (capture_latency={args.capture_latency}s)",
+    }
+    _print_report(summary)
+    if json_path:
+        json_path.write_text(json.dumps({"meta": harness.environment_metadata(), **summary}, indent=2) + "\n",
+                             encoding="utf-8")
+        print(f"\nResumen guardado en {json_path}")
+    return 0
+
+
+async def _drop_database(mongo) -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(mongo.MONGODB_URI)
+    await client.drop_database(mongo.MONGODB_DB)
+    client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
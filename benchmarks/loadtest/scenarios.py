@@ -0,0 +1,208 @@
+"""
+Flujos de usuario que reproduce la prueba de carga y el registro de latencias.
+
+Cada petición se anota bajo el nombre de su ruta (`"POST /api/auth/login"`),
+no bajo la URL concreta, para poder agregar percentiles por endpoint.
+"""
+import base64
+import random
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pyotp
+
+PASSWORD = "LoadTest123!"
+
+
+@dataclass
+class VirtualUser:
+    user_id: str
+    email: str
+    totp_secret: Optional[str] = None
+    fingerprint: bool = False
+    facial: bool = False
+
+
+class ScenarioError(Exception):
+    pass
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.flows: dict[str, int] = defaultdict(int)
+        self.failed_flows: dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def _percentile(sorted_values: list[float], pct: float) -> float:
+        idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+        return sorted_values[idx]
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            endpoints[name] = {
+                "requests": len(ordered),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(self._percentile(ordered, 50) * 1000, 2),
+                "p90_ms": round(self._percentile(ordered, 90) * 1000, 2),
+                "p95_ms": round(self._percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(self._percentile(ordered, 99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "flows": dict(self.flows),
+            "failed_flows": dict(self.failed_flows),
+            "endpoints": endpoints,
+        }
+
+
+@dataclass
+class Session:
+    client: httpx.AsyncClient
+    stats: Stats
+    face_image_b64: Optional[str] = None
+    users: list[VirtualUser] = field(default_factory=list)
+
+    async def request(self, name: str, method: str, url: str, expected: int = 200, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            resp = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            self.stats.latencies[name].append(time.perf_counter() - start)
+            self.stats.errors[name] += 1
+            raise ScenarioError(f"{name}: {exc}") from exc
+        self.stats.latencies[name].append(time.perf_counter() - start)
+        if resp.status_code != expected:
+            self.stats.errors[name] += 1
+            raise ScenarioError(f"{name}: HTTP {resp.status_code} {resp.text[:200]}")
+        return resp
+
+
+# ---------- Pasos reutilizables ----------
+
+async def register_user(session: Session, with_face: bool = False) -> VirtualUser:
+    suffix = uuid.uuid4().hex[:12]
+    body = {
+        "email": f"lt_{suffix}@example.com",
+        "username": f"lt_{suffix}",
+        "password": PASSWORD,
+        "full_name": "Load Test",
+    }
+    if with_face and session.face_image_b64:
+        body["facial_image_base64"] = session.face_image_b64
+    resp = await session.request("POST /api/auth/register", "POST", "/api/auth/register",
+                                 expected=201, json=body)
+    data = resp.json()
+    return VirtualUser(user_id=data["user_id"], email=data["email"], facial=bool(body.get("facial_image_base64")))
+
+
+async def login(session: Session, user: VirtualUser) -> str:
+    resp = await session.request("POST /api/auth/login", "POST", "/api/auth/login",
+                                 json={"email": user.email, "password": PASSWORD})
+    return resp.json()["access_token"]
+
+
+async def enable_two_factor(session: Session, user: VirtualUser) -> None:
+    resp = await session.request("POST /api/auth/2fa/setup", "POST", "/api/auth/2fa/setup",
+                                 params={"user_id": user.user_id})
+    otpauth_url = resp.json()["otpauth_url"]
+    secret = parse_qs(urlparse(otpauth_url).query)["secret"][0]
+    await session.request("POST /api/auth/2fa/verify", "POST", "/api/auth/2fa/verify",
+                          params={"user_id": user.user_id}, json={"code": pyotp.TOTP(secret).now()})
+    user.totp_secret = secret
+
+
+async def enroll_fingerprint(session: Session, user: VirtualUser, token: str) -> None:
+    await session.request("POST /api/users/fingerprint/register", "POST", "/api/users/fingerprint/register",
+                          headers={"Authorization": f"Bearer {token}"})
+    user.fingerprint = True
+
+
+# ---------- Flujos medidos ----------
+
+async def flow_register(session: Session, rng: random.Random) -> None:
+    session.users.append(await register_user(session))
+
+
+async def flow_login(session: Session, rng: random.Random) -> None:
+    await login(session, rng.choice(session.users))
+
+
+async def flow_login_2fa(session: Session, rng: random.Random) -> None:
+    candidates = [u for u in session.users if u.totp_secret]
+    if not candidates:
+        raise ScenarioError("No hay usuarios con 2FA")
+    user = rng.choice(candidates)
+    await login(session, user)
+    await session.request("POST /api/auth/2fa/verify-login", "POST", "/api/auth/2fa/verify-login",
+                          params={"user_id": user.user_id}, json={"code": pyotp.TOTP(user.totp_secret).now()})
+
+
+async def flow_login_fingerprint(session: Session, rng: random.Random) -> None:
+    candidates = [u for u in session.users if u.fingerprint]
+    if not candidates:
+        raise ScenarioError("No hay usuarios con huella")
+    user = rng.choice(candidates)
+    await login(session, user)
+    resp = await session.request("POST /api/auth/fingerprint/verify-login", "POST",
+                                 "/api/auth/fingerprint/verify-login", params={"user_id": user.user_id})
+    if not resp.json().get("match"):
+        raise ScenarioError("Huella no coincidió")
+
+
+async def flow_login_facial(session: Session, rng: random.Random) -> None:
+    candidates = [u for u in session.users if u.facial]
+    if not candidates:
+        raise ScenarioError("No hay usuarios con rostro")
+    user = rng.choice(candidates)
+    await login(session, user)
+    await session.request("POST /api/auth/verify-facial-for-login", "POST", "/api/auth/verify-facial-for-login",
+                          params={"user_id": user.user_id}, json={"image_base64": session.face_image_b64})
+
+
+async def flow_enroll_fingerprint(session: Session, rng: random.Random) -> None:
+    user = rng.choice(session.users)
+    token = await login(session, user)
+    await enroll_fingerprint(session, user, token)
+
+
+FLOWS = {
+    "register": flow_register,
+    "login": flow_login,
+    "login_2fa": flow_login_2fa,
+    "login_fingerprint": flow_login_fingerprint,
+    "login_facial": flow_login_facial,
+    "enroll_fingerprint": flow_enroll_fingerprint,
+}
+
+DEFAULT_MIX = "login=40,login_2fa=20,login_fingerprint=20,register=10,enroll_fingerprint=5,login_facial=5"
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in FLOWS:
+            raise ValueError(f"Flujo desconocido: {name}. Disponibles: {', '.join(FLOWS)}")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def encode_face(image: bytes) -> str:
+    return base64.b64encode(image).decode("ascii")
@@ -0,0 +1,82 @@
+"""
+Ejecuta la suite de benchmarks y guarda los resultados en JSON.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.run                       # todo, salida en benchmarks/results/<commit>.json
+    python -m benchmarks.run -k fingerprint        # solo los que contienen "fingerprint"
+    python -m benchmarks.run -o base.json --repeat 5
+"""
+import argparse
+import contextlib
+import importlib
+import os
+import sys
+from pathlib import Path
+
+from benchmarks import harness
+
+BENCH_MODULES = (
+    "benchmarks.bench_security",
+    "benchmarks.bench_facial",
+    "benchmarks.bench_fingerprint",
+    "benchmarks.bench_startup",
+    "benchmarks.bench_memory",
+)
+
+
+def _silence_logs():
+    try:
+        from loguru import logger
+        logger.remove()
+    except ImportError:
+        pass
+
+
+def _format_row(result: dict) -> str:
+    if "skipped" in result:
+        return f"{result['name']:<55} SKIP  {result['skipped']}"
+    if "error" in result:
+        return f"{result['name']:<55} ERROR {result['error']}"
+    return (f"{result['name']:<55} median={result['median_ms']:>10.3f} ms  "
+            f"p95={result['p95_ms']:>10.3f} ms  n={result['repeat']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de los caminos críticos de autenticación")
+    parser.add_argument("-o", "--output", type=Path, help="Ruta del JSON de resultados")
+    parser.add_argument("-k", "--filter", default="", help="Solo benchmarks cuyo nombre contenga este texto")
+    parser.add_argument("--repeat", type=int, help="Fuerza el número de repeticiones de cada caso")
+    parser.add_argument("--verbose", action="store_true", help="No silenciar logs/prints del código medido")
+    args = parser.parse_args(argv)
+
+    output = (args.output or harness.ROOT_DIR / "benchmarks" / "results" /
+              f"{harness.environment_metadata()['commit'] or 'local'}.json").resolve()
+
+    harness.setup_paths()
+    # Ejecutar con el cwd del backend para que rutas relativas (yolov8n.pt, .env) resuelvan igual que en producción
+    os.chdir(harness.BACKEND_DIR)
+    if not args.verbose:
+        _silence_logs()
+    for module in BENCH_MODULES:
+        importlib.import_module(module)
+
+    results = []
+    for bench in harness.registered():
+        if args.filter and args.filter not in bench.name:
+            continue
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                devnull = stack.enter_context(open(os.devnull, "w"))
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            result = harness.run_benchmark(bench, repeat=args.repeat)
+        results.append(result)
+        print(_format_row(result), flush=True)
+
+    harness.write_results(output, results)
+    print(f"\nResultados guardados en {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
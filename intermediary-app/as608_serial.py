@@ -0,0 +1,377 @@
+"""
+E/S serie asíncrona con el sensor de huella AS608 (y compatibles R307/ZFM-20).
+
+Implementa el protocolo de paquetes del sensor directamente sobre un par
+`asyncio.StreamReader`/`StreamWriter` abierto con pyserial-asyncio, en lugar
+de una llamada bloqueante por comando:
+
+    EF01 | dirección (4) | PID (1) | longitud (2) | contenido | checksum (2)
+
+- `AsyncAS608` expone los comandos usados por `FingerprintDevice` (captura,
+  conversión, modelo, almacenamiento, búsqueda y borrado) como corrutinas.
+- `set_baudrate` sube la velocidad del enlace (57600 → 115200 por defecto en
+  `open_as608`), que el sensor guarda en su flash.
+- `download_templates` / `upload_templates` transfieren plantillas de la
+  librería del sensor en bloque, como flujo: cada plantilla se entrega (o se
+  guarda) en cuanto termina su transferencia, para sincronizar con Mongo sin
+  esperar a la librería entera.
+- `wait_for_finger` sondea con intervalo adaptativo: rápido justo después de
+  pedir el dedo y cada vez más espaciado si no llega.
+
+La conexión admite cualquier URL de pyserial (`COM3`, `/dev/ttyUSB0`,
+`socket://host:puerto` para un puente serie-TCP).
+"""
+import asyncio
+import struct
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+try:
+    import serial_asyncio  # type: ignore
+except ImportError:  # pragma: no cover - depende del entorno
+    serial_asyncio = None
+
+HEADER = b"\xef\x01"
+DEFAULT_ADDRESS = 0xFFFFFFFF
+
+# Identificadores de paquete
+PID_COMMAND = 0x01
+PID_DATA = 0x02
+PID_ACK = 0x07
+PID_END_DATA = 0x08
+
+# Instrucciones
+CMD_GEN_IMAGE = 0x01
+CMD_IMAGE_TO_TZ = 0x02
+CMD_SEARCH = 0x04
+CMD_REG_MODEL = 0x05
+CMD_STORE = 0x06
+CMD_LOAD_CHAR = 0x07
+CMD_UP_CHAR = 0x08
+CMD_DOWN_CHAR = 0x09
+CMD_DELETE = 0x0C
+CMD_SET_SYS_PARA = 0x0E
+CMD_READ_SYS_PARA = 0x0F
+CMD_VERIFY_PASSWORD = 0x13
+CMD_TEMPLATE_COUNT = 0x1D
+CMD_READ_INDEX_TABLE = 0x1F
+
+# Códigos de confirmación
+OK = 0x00
+NO_FINGER = 0x02
+NOT_FOUND = 0x09
+
+# Parámetros de SetSysPara
+PARAM_BAUDRATE = 4
+
+# Tamaño del contenido de los paquetes de datos según el parámetro del sensor (0..3)
+PACKET_SIZES = (32, 64, 128, 256)
+
+# Espera máxima por la respuesta a un comando (la búsqueda en librerías grandes tarda ~1 s)
+RESPONSE_TIMEOUT = 3.0
+
+
+class AS608Error(RuntimeError):
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message if code is None else f"{message} (código 0x{code:02x})")
+        self.code = code
+
+
+def checksum(pid: int, length: bytes, content: bytes) -> int:
+    return (pid + sum(length) + sum(content)) & 0xFFFF
+
+
+def encode_packet(pid: int, content: bytes, address: int = DEFAULT_ADDRESS) -> bytes:
+    length = struct.pack(">H", len(content) + 2)
+    return HEADER + struct.pack(">I", address) + bytes([pid]) + length + content + \
+        struct.pack(">H", checksum(pid, length, content))
+
+
+class AsyncAS608:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 address: int = DEFAULT_ADDRESS, password: int = 0):
+        self._reader = reader
+        self._writer = writer
+        self.address = address
+        self.password = password
+        self.library_size = 0
+        self.packet_size = 128
+        # Un comando (y sus paquetes de datos) cada vez
+        self._lock = asyncio.Lock()
+        # Tras un error de protocolo (timeout a mitad de paquete, cabecera o checksum
+        # inválidos) el flujo queda desalineado: se cierra y hay que reabrir
+        self.broken = False
+
+    # --- paquetes ---
+
+    async def _send(self, pid: int, content: bytes) -> None:
+        self._writer.write(encode_packet(pid, content, self.address))
+        await self._writer.drain()
+
+    def _discard(self) -> None:
+        """Marca la conexión como inservible y cierra el puerto (sin esperar)."""
+        if not self.broken:
+            self.broken = True
+            logger.warning("AS608: respuesta incompleta o inválida; se cierra la conexión para resincronizar")
+            self._writer.close()
+
+    async def _receive(self) -> Tuple[int, bytes]:
+        try:
+            return await self._receive_packet()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, AS608Error):
+            # Lo que quede del paquete en el StreamReader desalinearía la respuesta siguiente
+            self._discard()
+            raise
+
+    async def _receive_packet(self) -> Tuple[int, bytes]:
+        async def read() -> Tuple[int, bytes]:
+            head = await self._reader.readexactly(9)
+            if head[:2] != HEADER:
+                raise AS608Error(f"Cabecera inesperada: {head[:2].hex()}")
+            pid = head[6]
+            length = head[7:9]
+            body = await self._reader.readexactly(struct.unpack(">H", length)[0])
+            content, received = body[:-2], struct.unpack(">H", body[-2:])[0]
+            if received != checksum(pid, length, content):
+                raise AS608Error("Checksum inválido en la respuesta del sensor")
+            return pid, content
+
+        return await asyncio.wait_for(read(), timeout=RESPONSE_TIMEOUT)
+
+    async def _command_unlocked(self, instruction: int, params: bytes = b"") -> Tuple[int, bytes]:
+        await self._send(PID_COMMAND, bytes([instruction]) + params)
+        pid, content = await self._receive()
+        if pid != PID_ACK or not content:
+            self._discard()
+            raise AS608Error(f"Respuesta inesperada a la instrucción 0x{instruction:02x} (PID 0x{pid:02x})")
+        return content[0], content[1:]
+
+    async def command(self, instruction: int, params: bytes = b"") -> Tuple[int, bytes]:
+        """Envía una instrucción y devuelve (código de confirmación, datos de la respuesta)."""
+        async with self._lock:
+            return await self._command_unlocked(instruction, params)
+
+    async def _expect_ok(self, instruction: int, params: bytes = b"", what: str = "") -> bytes:
+        code, data = await self.command(instruction, params)
+        if code != OK:
+            raise AS608Error(what or f"Instrucción 0x{instruction:02x} fallida", code)
+        return data
+
+    # --- sistema ---
+
+    async def verify_password(self) -> bool:
+        code, _ = await self.command(CMD_VERIFY_PASSWORD, struct.pack(">I", self.password))
+        return code == OK
+
+    async def read_system_parameters(self) -> dict:
+        data = await self._expect_ok(CMD_READ_SYS_PARA, what="No se pudieron leer los parámetros del sensor")
+        status, system_id, library_size, security, address, packet_param, baud_factor = \
+            struct.unpack(">HHHHIHH", data[:16])
+        self.library_size = library_size
+        self.packet_size = PACKET_SIZES[packet_param & 0x03]
+        return {"library_size": library_size, "security_level": security,
+                "packet_size": self.packet_size, "baudrate": baud_factor * 9600}
+
+    async def set_baudrate(self, baudrate: int) -> None:
+        """Cambia la velocidad del sensor (múltiplo de 9600, hasta 115200); hay que reabrir el puerto después."""
+        if baudrate % 9600 or not 1 <= baudrate // 9600 <= 12:
+            raise ValueError(f"Baudrate no soportado por el AS608: {baudrate}")
+        await self._expect_ok(CMD_SET_SYS_PARA, bytes([PARAM_BAUDRATE, baudrate // 9600]),
+                              what="No se pudo cambiar el baudrate")
+
+    async def template_count(self) -> int:
+        data = await self._expect_ok(CMD_TEMPLATE_COUNT, what="No se pudo leer el número de plantillas")
+        return struct.unpack(">H", data[:2])[0]
+
+    async def used_slots(self) -> List[int]:
+        """Posiciones ocupadas de la librería, leyendo la tabla de índices (256 posiciones por página)."""
+        pages = max(1, -(-self.library_size // 256)) if self.library_size else 4
+        used = []
+        for page in range(pages):
+            table = await self._expect_ok(CMD_READ_INDEX_TABLE, bytes([page]),
+                                          what="No se pudo leer la tabla de índices")
+            for byte_idx, byte in enumerate(table[:32]):
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        used.append(page * 256 + byte_idx * 8 + bit)
+        return [slot for slot in used if not self.library_size or slot < self.library_size]
+
+    async def first_free_slot(self) -> int:
+        used = set(await self.used_slots())
+        limit = self.library_size or (max(used, default=-1) + 2)
+        for slot in range(limit):
+            if slot not in used:
+                return slot
+        raise AS608Error("La librería del sensor está llena")
+
+    # --- captura y modelos ---
+
+    async def get_image(self) -> int:
+        code, _ = await self.command(CMD_GEN_IMAGE)
+        return code
+
+    async def wait_for_finger(self, timeout: float = 10.0, min_interval: float = 0.02,
+                              max_interval: float = 0.2) -> bool:
+        """
+        Sondea `GenImg` hasta que hay dedo (la imagen queda en el sensor). El
+        intervalo empieza en `min_interval` y crece ×1.5 hasta `max_interval`
+        mientras no llega el dedo.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = min_interval
+        while loop.time() < deadline:
+            code = await self.get_image()
+            if code == OK:
+                return True
+            if code != NO_FINGER:
+                logger.debug(f"GenImg devolvió 0x{code:02x}")
+            await asyncio.sleep(interval)
+            interval = min(max_interval, interval * 1.5)
+        return False
+
+    async def wait_for_removal(self, timeout: float = 5.0, interval: float = 0.1) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if await self.get_image() == NO_FINGER:
+                return True
+            await asyncio.sleep(interval)
+        return False
+
+    async def image_to_tz(self, buffer_id: int = 1) -> int:
+        code, _ = await self.command(CMD_IMAGE_TO_TZ, bytes([buffer_id]))
+        return code
+
+    async def create_model(self) -> int:
+        code, _ = await self.command(CMD_REG_MODEL)
+        return code
+
+    async def store_model(self, slot: int, buffer_id: int = 1) -> int:
+        code, _ = await self.command(CMD_STORE, bytes([buffer_id]) + struct.pack(">H", slot))
+        return code
+
+    async def load_model(self, slot: int, buffer_id: int = 1) -> int:
+        code, _ = await self.command(CMD_LOAD_CHAR, bytes([buffer_id]) + struct.pack(">H", slot))
+        return code
+
+    async def delete_model(self, slot: int, count: int = 1) -> int:
+        code, _ = await self.command(CMD_DELETE, struct.pack(">HH", slot, count))
+        return code
+
+    async def search(self, buffer_id: int = 1, start: int = 0,
+                     count: Optional[int] = None) -> Tuple[int, Optional[int], Optional[int]]:
+        """Busca el buffer en la librería del sensor: (código, posición, score)."""
+        count = count if count is not None else (self.library_size or 1000) - start
+        code, data = await self.command(CMD_SEARCH, bytes([buffer_id]) + struct.pack(">HH", start, count))
+        if code != OK:
+            return code, None, None
+        slot, score = struct.unpack(">HH", data[:4])
+        return code, slot, score
+
+    # --- transferencia de plantillas ---
+
+    async def _read_data(self) -> bytes:
+        chunks = []
+        while True:
+            pid, content = await self._receive()
+            if pid not in (PID_DATA, PID_END_DATA):
+                self._discard()
+                raise AS608Error(f"Paquete de datos inesperado (PID 0x{pid:02x})")
+            chunks.append(content)
+            if pid == PID_END_DATA:
+                return b"".join(chunks)
+
+    async def _write_data(self, data: bytes) -> None:
+        size = self.packet_size
+        for offset in range(0, len(data), size):
+            last = offset + size >= len(data)
+            self._writer.write(encode_packet(PID_END_DATA if last else PID_DATA,
+                                             data[offset:offset + size], self.address))
+        await self._writer.drain()
+
+    async def download_model(self, buffer_id: int = 1) -> bytes:
+        """Plantilla del buffer (`UpChar`), reensamblada de sus paquetes de datos."""
+        async with self._lock:
+            code, _ = await self._command_unlocked(CMD_UP_CHAR, bytes([buffer_id]))
+            if code != OK:
+                raise AS608Error("El sensor rechazó la descarga de la plantilla", code)
+            return await self._read_data()
+
+    async def upload_model(self, template: bytes, buffer_id: int = 1) -> None:
+        """Carga `template` en el buffer (`DownChar`) para guardarla o compararla."""
+        async with self._lock:
+            code, _ = await self._command_unlocked(CMD_DOWN_CHAR, bytes([buffer_id]))
+            if code != OK:
+                raise AS608Error("El sensor rechazó la carga de la plantilla", code)
+            await self._write_data(template)
+
+    async def download_templates(self, slots: Optional[Iterable[int]] = None) -> AsyncIterator[Tuple[int, bytes]]:
+        """(posición, plantilla) de cada posición ocupada (o de `slots`), según van llegando."""
+        for slot in (await self.used_slots() if slots is None else slots):
+            code = await self.load_model(slot)
+            if code != OK:
+                raise AS608Error(f"No se pudo leer la posición {slot}", code)
+            yield slot, await self.download_model()
+
+    async def upload_templates(self, items: Iterable[Tuple[int, bytes]]) -> AsyncIterator[int]:
+        """Guarda cada (posición, plantilla) en la librería; devuelve las posiciones según quedan guardadas."""
+        for slot, template in items:
+            await self.upload_model(template)
+            code = await self.store_model(slot)
+            if code != OK:
+                raise AS608Error(f"No se pudo guardar la plantilla en la posición {slot}", code)
+            yield slot
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except Exception:  # noqa: BLE001
+            pass
+
+
+async def open_as608(url: str, baudrate: int = 57600, address: int = DEFAULT_ADDRESS, password: int = 0,
+                     target_baudrate: Optional[int] = None) -> AsyncAS608:
+    """
+    Abre el sensor, verifica la contraseña y lee sus parámetros. Con
+    `target_baudrate` distinto de `baudrate`, primero prueba a abrir ya a
+    `target_baudrate` (el sensor guarda el cambio en flash); si no responde,
+    abre a `baudrate`, cambia la velocidad del sensor y reabre. Sin
+    `target_baudrate` (por defecto) no se envía el cambio de velocidad.
+    """
+    if serial_asyncio is None:
+        raise RuntimeError("pyserial-asyncio no instalado (`pip install pyserial-asyncio`)")
+
+    async def connect(rate: int) -> Optional[AsyncAS608]:
+        """Sensor abierto a `rate`, o None si no contesta a esa velocidad."""
+        reader, writer = await serial_asyncio.open_serial_connection(url=url, baudrate=rate)
+        sensor = AsyncAS608(reader, writer, address=address, password=password)
+        try:
+            verified = await sensor.verify_password()
+        except (asyncio.TimeoutError, AS608Error):
+            await sensor.close()
+            return None
+        if not verified:
+            await sensor.close()
+            raise AS608Error("Contraseña del AS608 incorrecta")
+        return sensor
+
+    rates = [target_baudrate, baudrate] if target_baudrate and target_baudrate != baudrate else [baudrate]
+    for rate in rates:
+        sensor = await connect(rate)
+        if sensor is None:
+            continue
+        if target_baudrate and rate != target_baudrate:
+            logger.warning(f"AS608: cambiando baudrate {rate} -> {target_baudrate} (se guarda en la flash del sensor)")
+            await sensor.set_baudrate(target_baudrate)
+            await sensor.close()
+            sensor = await connect(target_baudrate)
+            if sensor is None:
+                raise AS608Error(f"El AS608 no responde a {target_baudrate} baudios tras el cambio")
+            rate = target_baudrate
+        params = await sensor.read_system_parameters()
+        logger.info(f"AS608 conectado en {url} a {rate} baudios: {params}")
+        return sensor
+    raise AS608Error(f"El AS608 no responde en {url} ({', '.join(str(r) for r in rates)} baudios)")
@@ -0,0 +1,139 @@
+"""
+Pool de lectores ZK9500 conectados al mismo equipo (varios puestos de recepción).
+
+Cada lector tiene su propio driver (índice de dispositivo del SDK), su propio
+hilo con cola de trabajos (`DeviceWorker`) y su propio supervisor de conexión,
+así que las capturas en lectores distintos avanzan en paralelo y solo se
+serializan las de un mismo lector.
+
+`ZK_DEVICES` define los lectores:
+
+    ZK_DEVICES=0                  # un lector (por defecto)
+    ZK_DEVICES=0,1                # dos lectores; id = índice
+    ZK_DEVICES=recepcion=0,caja=1 # id de puesto -> índice
+
+Las peticiones eligen lector con `device_id` (id de puesto o índice); sin él
+se usa el menos ocupado de los conectados.
+"""
+import asyncio
+import contextlib
+import os
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from device_supervisor import DeviceSupervisor
+from device_worker import DeviceWorker
+from zk9500_driver import ZK9500Driver, build_driver
+
+
+class UnknownDeviceError(LookupError):
+    """`device_id` no corresponde a ningún lector del pool."""
+
+
+class DeviceSlot:
+    def __init__(self, device_id: str, driver: ZK9500Driver, probe_interval: float = 30.0,
+                 backoff_max: float = 30.0):
+        self.device_id = device_id
+        self.driver = driver
+        self.worker = DeviceWorker(name=f"zk9500-{device_id}")
+        self.supervisor = DeviceSupervisor(driver, self.worker, probe_interval=probe_interval,
+                                           backoff_max=backoff_max)
+        # Peticiones que están usando este lector (capturando o esperando turno)
+        self.active = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.supervisor.connected and self.driver.connected
+
+    @contextlib.contextmanager
+    def reserve(self) -> Iterator["DeviceSlot"]:
+        """Cuenta el lector como ocupado mientras dura el bloque (p.ej. todas las capturas de un registro)."""
+        self.active += 1
+        try:
+            yield self
+        finally:
+            self.active -= 1
+
+    async def capture(self, request=None, **capture_kwargs):
+        with self.reserve():
+            return await self.worker.capture(self.driver, request, **capture_kwargs)
+
+    def status(self) -> dict:
+        return {
+            "device_id": self.device_id,
+            "device_index": self.driver.device_index,
+            "ready": self.ready,
+            "active_requests": self.active,
+            **self.worker.status(),
+            "connection": self.supervisor.status(),
+        }
+
+
+class DevicePool:
+    def __init__(self, slots: List[DeviceSlot]):
+        if not slots:
+            raise ValueError("El pool necesita al menos un lector")
+        self.slots = slots
+        self._by_id = {slot.device_id: slot for slot in slots}
+        for slot in slots:
+            self._by_id.setdefault(str(slot.driver.device_index), slot)
+
+    @property
+    def default(self) -> DeviceSlot:
+        return self.slots[0]
+
+    @property
+    def ready(self) -> bool:
+        return any(slot.ready for slot in self.slots)
+
+    def get(self, device_id: Optional[str] = None) -> DeviceSlot:
+        """Lector `device_id` o, sin él, el conectado con menos peticiones en curso (empate: el primero)."""
+        if device_id is not None:
+            slot = self._by_id.get(device_id)
+            if slot is None:
+                raise UnknownDeviceError(
+                    f"Lector desconocido: {device_id}. Disponibles: {', '.join(s.device_id for s in self.slots)}")
+            return slot
+        candidates = [slot for slot in self.slots if slot.ready] or self.slots
+        return min(candidates, key=lambda slot: slot.active)
+
+    def start(self) -> None:
+        for slot in self.slots:
+            slot.worker.start()
+            slot.supervisor.start()
+
+    async def stop(self) -> None:
+        for slot in self.slots:
+            await slot.supervisor.stop()
+        for slot in self.slots:
+            await asyncio.to_thread(slot.worker.stop)
+
+    def status(self) -> List[dict]:
+        return [slot.status() for slot in self.slots]
+
+
+def parse_devices(spec: str) -> List[Tuple[str, int]]:
+    """`"0,1"` -> [("0", 0), ("1", 1)]; `"recepcion=0,caja=1"` -> [("recepcion", 0), ("caja", 1)]."""
+    devices = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        device_id, sep, index = part.partition("=")
+        if not sep:
+            device_id, index = part, part
+        try:
+            devices.append((device_id.strip(), int(index)))
+        except ValueError:
+            raise ValueError(f"ZK_DEVICES inválido: '{part}' (se espera 'índice' o 'id=índice')") from None
+    if len({device_id for device_id, _ in devices}) != len(devices):
+        raise ValueError(f"ZK_DEVICES tiene ids repetidos: {spec}")
+    return devices
+
+
+def build_device_pool(driver_factory: Callable[[int], ZK9500Driver] = build_driver) -> DevicePool:
+    probe_interval = float(os.getenv("ZK_HEALTH_INTERVAL", "30"))
+    backoff_max = float(os.getenv("ZK_RECONNECT_BACKOFF_MAX", "30"))
+    return DevicePool([
+        DeviceSlot(device_id, driver_factory(index), probe_interval=probe_interval, backoff_max=backoff_max)
+        for device_id, index in parse_devices(os.getenv("ZK_DEVICES", "0")) or [("0", 0)]
+    ])
@@ -0,0 +1,144 @@
+"""
+Supervisor de la conexión con el lector ZK9500.
+
+Una tarea de asyncio mantiene la sesión con el SDK abierta en segundo plano:
+
+- Al arrancar (y cada vez que se pierde) conecta con reintentos y espera
+  exponencial (`backoff_base`·2ⁿ hasta `backoff_max`), sin límite de intentos.
+- Con el lector conectado, cada `probe_interval` segundos comprueba que sigue
+  respondiendo (`driver.probe()`). Si falla, cierra la sesión y vuelve a
+  conectar. La comprobación se salta mientras haya capturas en curso o en cola.
+
+Conexión, comprobación y cierre van como trabajos del `DeviceWorker`, igual
+que las capturas: nunca se toca el SDK desde dos hilos y las peticiones no
+esperan a una reconexión lenta más de lo que ya esperarían a otra captura. El
+estado y los contadores se exponen en `/fingerprint/zk9500/status`.
+"""
+import asyncio
+import random
+import time
+from typing import Optional
+
+from loguru import logger
+
+from device_worker import DeviceWorker
+
+# Tiempo máximo de espera por un trabajo de conexión o comprobación
+SUPERVISOR_JOB_TIMEOUT = 15.0
+
+
+class DeviceSupervisor:
+    def __init__(self, driver, worker: DeviceWorker, probe_interval: float = 30.0,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0):
+        self._driver = driver
+        self._worker = worker
+        self.probe_interval = probe_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._task: Optional[asyncio.Task] = None
+        self.state = "stopped"
+        self.connects = 0
+        self.reconnects = 0
+        self.connect_failures = 0
+        self.probes = 0
+        self.probe_failures = 0
+        self.last_error: Optional[str] = None
+        self.connected_since: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+        self.next_retry_at: Optional[float] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.state == "connected"
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="zk9500-supervisor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.state = "stopped"
+
+    async def _run_job(self, name: str, func) -> None:
+        job = self._worker.submit(name, func)
+        try:
+            await asyncio.wait_for(self._worker.wait(job), timeout=SUPERVISOR_JOB_TIMEOUT)
+        except asyncio.TimeoutError:
+            job.cancel_event.set()
+            raise TimeoutError(f"El trabajo '{name}' no terminó en {SUPERVISOR_JOB_TIMEOUT:.0f} s")
+
+    async def _connect(self) -> None:
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await self._run_job("connect", self._driver.connect)
+            except Exception as exc:  # noqa: BLE001
+                self.connect_failures += 1
+                self.last_error = str(exc)
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                delay *= random.uniform(0.8, 1.2)
+                self.next_retry_at = time.time() + delay
+                logger.warning(
+                    f"[DEVICE] Conexión con ZK9500 fallida (intento {attempt}): {exc}; "
+                    f"reintento en {delay:.1f} s")
+                await asyncio.sleep(delay)
+                continue
+            if self.connects:
+                self.reconnects += 1
+            self.connects += 1
+            self.next_retry_at = None
+            self.connected_since = time.time()
+            self.state = "connected"
+            logger.info(f"ZK9500 ready (intento {attempt}, reconexiones={self.reconnects})")
+            return
+
+    async def _probe(self) -> bool:
+        self.probes += 1
+        self.last_probe_at = time.time()
+        try:
+            await self._run_job("probe", self._driver.probe)
+            return True
+        except Exception as exc:  # noqa: BLE001
+            self.probe_failures += 1
+            self.last_error = str(exc)
+            logger.warning(f"[DEVICE] ZK9500 no responde: {exc}; reconectando")
+            try:
+                await self._run_job("close", self._driver.close)
+            except Exception as close_exc:  # noqa: BLE001
+                logger.debug(f"[DEVICE] Cierre tras fallo de comprobación: {close_exc}")
+            return False
+
+    async def _run(self) -> None:
+        self.state = "connecting"
+        while True:
+            if not self.connected:
+                await self._connect()
+            await asyncio.sleep(self.probe_interval)
+            worker_status = self._worker.status()
+            if worker_status["capture_in_progress"] or worker_status["queued_jobs"]:
+                continue  # lector en uso: la comprobación esperaría a las capturas, y estas ya fallarían
+            if not await self._probe():
+                self.state = "reconnecting"
+                self.connected_since = None
+
+    def status(self) -> dict:
+        now = time.time()
+        return {
+            "state": self.state,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "connect_failures": self.connect_failures,
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "last_error": self.last_error,
+            "connected_seconds": None if self.connected_since is None else round(now - self.connected_since, 1),
+            "last_probe_seconds_ago": None if self.last_probe_at is None else round(now - self.last_probe_at, 1),
+            "next_retry_in": None if self.next_retry_at is None else round(max(0.0, self.next_retry_at - now), 1),
+        }
@@ -0,0 +1,135 @@
+"""
+Hilo dedicado al lector ZK9500.
+
+Todas las operaciones que esperan al sensor (`capture`) se encolan como
+trabajos y se ejecutan en un único hilo, fuera del bucle de asyncio. Los
+endpoints esperan el resultado con `await`; si el cliente HTTP se desconecta
+mientras tanto, el trabajo se cancela (pendiente o entre intentos de captura)
+y el lector queda libre para la siguiente petición.
+"""
+import asyncio
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from loguru import logger
+from starlette.requests import Request
+
+from zk9500_driver import CaptureCancelled
+
+# Cada cuánto se comprueba si el cliente HTTP sigue conectado mientras se espera un trabajo
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class DeviceJob:
+    def __init__(self, job_id: int, name: str, func: Callable[..., Any], args: tuple, kwargs: dict,
+                 loop: asyncio.AbstractEventLoop):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel_event = threading.Event()
+        self.future: asyncio.Future = loop.create_future()
+        self.loop = loop
+        self.started_at: Optional[float] = None
+
+    def _resolve(self, result=None, error: Optional[BaseException] = None) -> None:
+        if self.future.done():
+            return
+        if error is not None:
+            self.future.set_exception(error)
+            if self.cancel_event.is_set():
+                self.future.exception()  # nadie espera ya el resultado: marcarlo como leído
+        else:
+            self.future.set_result(result)
+
+    def resolve(self, result=None, error: Optional[BaseException] = None) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._resolve, result, error)
+        except RuntimeError:
+            pass  # el bucle ya se cerró (apagado del servicio)
+
+
+class DeviceWorker:
+    def __init__(self, name: str = "zk9500-device"):
+        self._name = name
+        self._jobs: "queue.Queue[Optional[DeviceJob]]" = queue.Queue()
+        self._ids = itertools.count(1)
+        self._current: Optional[DeviceJob] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        current = self._current
+        if current is not None:
+            current.cancel_event.set()
+        self._jobs.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            if job.cancel_event.is_set():
+                job.resolve(error=CaptureCancelled("Trabajo cancelado antes de empezar"))
+                continue
+            self._current = job
+            job.started_at = time.monotonic()
+            try:
+                job.resolve(job.func(*job.args, **job.kwargs))
+            except BaseException as exc:  # noqa: BLE001 - se propaga al endpoint
+                job.resolve(error=exc)
+            finally:
+                self._current = None
+
+    def submit(self, name: str, func: Callable[..., Any], *args, cancellable: bool = False, **kwargs) -> DeviceJob:
+        """Encola `func(*args, **kwargs)`; con `cancellable` se le pasa el `cancel_event` del trabajo."""
+        self.start()
+        job = DeviceJob(next(self._ids), name, func, args, kwargs, asyncio.get_running_loop())
+        if cancellable:
+            job.kwargs["cancel_event"] = job.cancel_event
+        self._jobs.put(job)
+        return job
+
+    async def wait(self, job: DeviceJob, request: Optional[Request] = None):
+        """
+        Espera el resultado del trabajo. Si el cliente se desconecta o la tarea
+        se cancela, marca el trabajo como cancelado y lanza `CaptureCancelled`.
+        """
+        try:
+            while True:
+                done, _ = await asyncio.wait({job.future}, timeout=DISCONNECT_POLL_SECONDS)
+                if done:
+                    return job.future.result()
+                if request is not None and await request.is_disconnected():
+                    logger.info(f"[DEVICE] Cliente desconectado; cancelando trabajo {job.id} ({job.name})")
+                    job.cancel_event.set()
+                    raise CaptureCancelled("Cliente desconectado")
+        except asyncio.CancelledError:
+            job.cancel_event.set()
+            raise
+
+    async def capture(self, driver, request: Optional[Request] = None, **capture_kwargs):
+        job = self.submit("capture", driver.capture, cancellable=True, **capture_kwargs)
+        return await self.wait(job, request)
+
+    def status(self) -> dict:
+        current = self._current
+        return {
+            "capture_in_progress": current is not None and current.name == "capture",
+            "current_job": None if current is None else {
+                "id": current.id,
+                "name": current.name,
+                "running_seconds": round(time.monotonic() - (current.started_at or time.monotonic()), 2),
+            },
+            "queued_jobs": self._jobs.qsize(),
+        }
@@ -1,103 +1,210 @@
+import asyncio
 import base64
 import os
-import time
-from typing import Optional, Tuple
+import threading
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
 from loguru import logger
-from as608 import AS608
+from as608_serial import NOT_FOUND, OK, AsyncAS608, open_as608
 
 
 class FingerprintDevice:
-    def __init__(self, serial_port: str, baudrate: int = 57600, password: int = 0x00000000, address: int = 0xFFFFFFFF):
+    """
+    AS608 sensor over the async serial layer (`as608_serial`).
+
+    The serial streams live on a private event loop running in a background
+    thread, so the blocking `enroll`/`search`/`delete` API keeps working from
+    any thread, while async callers (library sync) use `run_async`.
+
+    Whole operations (an enroll, a search, a `call`) are serialised by
+    `_operation_lock`: they share the sensor's char buffers, so a direct
+    enroll must not interleave with a library sync batch. A connection left
+    out of step by a protocol error is dropped and reopened by the next one.
+    """
+
+    def __init__(self, serial_port: str, baudrate: int = 57600, password: int = 0x00000000,
+                 address: int = 0xFFFFFFFF, target_baudrate: Optional[int] = None):
         self.serial_port = serial_port
         self.baudrate = baudrate
+        self.target_baudrate = target_baudrate
         self.password = password
         self.address = address
-        self.device: Optional[AS608] = None
+        self.device: Optional[AsyncAS608] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        # Only used on the serial loop
+        self._operation_lock = asyncio.Lock()
+
+    # --- event loop of the serial port ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="as608-serial", daemon=True).start()
+            return self._loop
+
+    def run(self, coro):
+        """Runs `coro` on the serial loop and blocks until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    async def run_async(self, coro):
+        """Awaits `coro` on the serial loop from another event loop (e.g. FastAPI's)."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()))
+
+    async def _exclusive(self, coro):
+        """Runs `coro` (on the serial loop) as one operation, with the sensor to itself."""
+        async with self._operation_lock:
+            try:
+                return await coro
+            finally:
+                if self.device is not None and self.device.broken:
+                    self.device = None
+
+    async def call(self, func):
+        """Awaits `func(sensor)` on the serial loop, connecting first if needed."""
+        async def job():
+            return await func(await self._ensure_connected())
+        return await self.run_async(self._exclusive(job()))
+
+    # --- connection ---
+
+    async def _connect(self) -> None:
+        logger.info(f"Connecting to AS608 on {self.serial_port} at {self.baudrate} baud...")
+        self.device = await open_as608(self.serial_port, self.baudrate, address=self.address,
+                                       password=self.password, target_baudrate=self.target_baudrate)
+        logger.info("AS608 connected and password verified")
+
+    async def _ensure_connected(self) -> AsyncAS608:
+        if self.device is not None and self.device.broken:
+            self.device = None
+        if self.device is None:
+            await self._connect()
+        return self.device
 
     def connect(self) -> None:
-        logger.info(
-            f"Connecting to AS608 on {self.serial_port} at {self.baudrate} baud...")
-        self.device = AS608(self.serial_port, self.baudrate,
-                            address=self.address, password=self.password)
-        if not self.device.verifyPassword():
-            raise RuntimeError("Failed to verify AS608 password")
-        logger.info("AS608 connected and password verified")
+        self.run(self._exclusive(self._connect()))
 
     def ensure_connected(self) -> None:
-        if self.device is None:
-            self.connect()
+        self.run(self._exclusive(self._ensure_connected()))
 
-    def _wait_for_finger(self, timeout: float = 10.0) -> bool:
-        start = time.time()
-        while time.time() - start < timeout:
-            if self.device.getImage() == self.device.OK:
-                return True
-            time.sleep(0.2)
-        return False
+    def close(self) -> None:
+        async def close():
+            if self.device is not None:
+                await self.device.close()
+                self.device = None
+        self.run(self._exclusive(close()))
 
-    def enroll(self, template_id: Optional[int] = None) -> Tuple[int, Optional[int], Optional[str]]:
-        self.ensure_connected()
+    # --- enroll / search / delete ---
+
+    async def _enroll(self, template_id: Optional[int] = None) -> Tuple[int, Optional[int], Optional[str]]:
+        device = await self._ensure_connected()
 
-        if not self._wait_for_finger():
+        if not await device.wait_for_finger():
             raise RuntimeError("No finger detected in time (step 1)")
-        if self.device.image2Tz(1) != self.device.OK:
+        if await device.image_to_tz(1) != OK:
             raise RuntimeError("Failed to convert image (buf1)")
 
         logger.info("Remove finger")
-        time.sleep(1.5)
+        if not await device.wait_for_removal():
+            raise RuntimeError("Finger was not removed in time")
 
-        if not self._wait_for_finger():
+        if not await device.wait_for_finger():
             raise RuntimeError("No finger detected in time (step 2)")
-        if self.device.image2Tz(2) != self.device.OK:
+        if await device.image_to_tz(2) != OK:
             raise RuntimeError("Failed to convert image (buf2)")
 
-        if self.device.createModel() != self.device.OK:
+        if await device.create_model() != OK:
             raise RuntimeError("Failed to create fingerprint model")
 
         if template_id is None:
-            template_id = self.device.getTemplateCount()
+            template_id = await device.first_free_slot()
             logger.info(f"Selected next template slot: {template_id}")
 
-        if self.device.storeModel(template_id) != self.device.OK:
+        if await device.store_model(template_id) != OK:
             raise RuntimeError("Failed to store template on sensor")
 
         # Extract template bytes for optional external storage
-        char_packet = self.device.getModel()
-        template_b64 = base64.b64encode(char_packet).decode(
-            "ascii") if char_packet else None
+        char_packet = await device.download_model(1)
+        template_b64 = base64.b64encode(char_packet).decode("ascii") if char_packet else None
 
         confidence = None
         return template_id, confidence, template_b64
 
-    def search(self) -> Tuple[bool, Optional[int], Optional[int]]:
-        self.ensure_connected()
+    async def _search(self) -> Tuple[bool, Optional[int], Optional[int]]:
+        device = await self._ensure_connected()
 
-        if not self._wait_for_finger():
+        # wait_for_finger leaves the captured image on the sensor: no second GenImg
+        if not await device.wait_for_finger():
             raise RuntimeError("No finger detected")
-        if self.device.getImage() != self.device.OK:
-            raise RuntimeError("Failed to capture image")
-        if self.device.image2Tz(1) != self.device.OK:
+        if await device.image_to_tz(1) != OK:
             raise RuntimeError("Failed to convert image (buf1)")
 
-        result = self.device.searchTemplate()
-        if result[0] == self.device.OK:
-            position_number = result[1]
-            score = result[2]
+        code, position_number, score = await device.search(1)
+        if code == OK:
             return True, position_number, score
-        if result[0] == self.device.NOTFOUND:
+        if code == NOT_FOUND:
             return False, None, None
         raise RuntimeError("Search failed")
 
-    def delete(self, template_id: int) -> None:
-        self.ensure_connected()
-        if self.device.deleteModel(template_id) != self.device.OK:
+    async def _delete(self, template_id: int) -> None:
+        device = await self._ensure_connected()
+        if await device.delete_model(template_id) != OK:
             raise RuntimeError(f"Failed to delete template {template_id}")
 
+    def enroll(self, template_id: Optional[int] = None) -> Tuple[int, Optional[int], Optional[str]]:
+        return self.run(self._exclusive(self._enroll(template_id)))
+
+    def search(self) -> Tuple[bool, Optional[int], Optional[int]]:
+        return self.run(self._exclusive(self._search()))
+
+    def delete(self, template_id: int) -> None:
+        self.run(self._exclusive(self._delete(template_id)))
+
+    async def enroll_async(self, template_id: Optional[int] = None) -> Tuple[int, Optional[int], Optional[str]]:
+        """`enroll` for async callers (library enrol from FastAPI)."""
+        return await self.run_async(self._exclusive(self._enroll(template_id)))
+
+    async def search_async(self) -> Tuple[bool, Optional[int], Optional[int]]:
+        """`search` for async callers: the calling event loop keeps serving while the finger is awaited."""
+        return await self.run_async(self._exclusive(self._search()))
+
+    # --- bulk template transfer (library <-> Mongo) ---
+
+    async def _download_templates(self, slots: Optional[Iterable[int]] = None) -> List[Tuple[int, bytes]]:
+        device = await self._ensure_connected()
+        return [item async for item in device.download_templates(slots)]
+
+    async def _upload_templates(self, items: Iterable[Tuple[int, bytes]]) -> List[int]:
+        device = await self._ensure_connected()
+        return [slot async for slot in device.upload_templates(items)]
+
+    def download_templates(self, slots: Optional[Iterable[int]] = None) -> List[Tuple[int, bytes]]:
+        """(slot, template) for every used slot of the sensor library (or only `slots`)."""
+        return self.run(self._exclusive(self._download_templates(slots)))
+
+    def upload_templates(self, items: Iterable[Tuple[int, bytes]]) -> List[int]:
+        """Stores each (slot, template) in the sensor library; returns the stored slots."""
+        return self.run(self._exclusive(self._upload_templates(list(items))))
+
+    async def stream_templates(self, slots: Optional[Iterable[int]] = None) -> AsyncIterator[Tuple[int, bytes]]:
+        """Like `download_templates`, yielding each template as soon as it arrives."""
+        device = await self.run_async(self._exclusive(self._ensure_connected()))
+        iterator = device.download_templates(slots).__aiter__()
+        while True:
+            # One template (LoadChar + UpChar on buffer 1) per operation
+            try:
+                yield await self.run_async(self._exclusive(iterator.__anext__()))
+            except StopAsyncIteration:
+                return
+
 
 def build_device_from_env() -> FingerprintDevice:
     serial_port = os.getenv("SERIAL_PORT", "COM3")
     baudrate = int(os.getenv("BAUDRATE", "57600"))
+    # Cambiar la velocidad escribe en la flash del sensor: solo si se pide explícitamente
+    target_baudrate = int(os.getenv("AS608_TARGET_BAUDRATE", "0")) or None
     password = int(os.getenv("SENSOR_PASSWORD", "0"), 16) if isinstance(
         os.getenv("SENSOR_PASSWORD"), str) else int(os.getenv("SENSOR_PASSWORD", 0))
     address = int(os.getenv("SENSOR_ADDRESS", "0xFFFFFFFF"), 16)
-    return FingerprintDevice(serial_port=serial_port, baudrate=baudrate, password=password, address=address)
+    return FingerprintDevice(serial_port=serial_port, baudrate=baudrate, password=password, address=address,
+                             target_baudrate=target_baudrate)
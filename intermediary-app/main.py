@@ -1,17 +1,45 @@
 import os
 import asyncio
-from fastapi import FastAPI, HTTPException
+import json
+from typing import AsyncIterator
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from loguru import logger
 from dotenv import load_dotenv
+from pydantic import ValidationError
 
 from models import (
+    AS608IdentifyResponse,
+    AS608LibraryEntry,
+    AS608LibraryResponse,
+    AS608SyncBinaryRequest,
+    AS608SyncRequest,
+    AS608SyncResponse,
+    BinaryCandidateTemplate,
+    CandidateScore,
     ErrorResponse,
+    RegisterResult,
+    ZKMissingTemplatesResponse,
+    ZKIdentifyRequest,
+    ZKIdentifyResponse,
     ZKRegisterResponse,
+    ZKTemplatesSyncRequest,
+    ZKTemplateCacheResponse,
+    ZKTemplateEntry,
+    ZKTemplatesSyncResponse,
+    ZKVerifyBinaryRequest,
     ZKVerifyRequest,
     ZKVerifyResponse,
 )
-from zk9500_driver import build_driver, ZK9500Driver
+from device_pool import DeviceSlot, UnknownDeviceError, build_device_pool
+from sensor_library import AS608_TEMPLATE_BYTES, SensorLibrary, build_sensor_library
+from template_cache import MatchHints, TemplateStore, build_template_cache
+from transport import MsgpackResponse, is_msgpack, openapi_body, respond, unpack, wants_msgpack
+from zk9500_driver import CaptureCancelled, fuse_templates, ZK9500Driver
 
 try:
     from zkfinger_standard import get_standard_driver, SDK_AVAILABLE
@@ -38,28 +66,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-zk_driver: ZK9500Driver = build_driver()
+# Lectores del equipo (ZK_DEVICES): cada uno con su hilo de E/S, su cola de capturas y su supervisor
+# de conexión (comprobación periódica y reconexión con espera exponencial)
+device_pool = build_device_pool()
+# Matching, base64 y selección de plantillas no dependen del lector: se usa el driver del primero
+zk_driver: ZK9500Driver = device_pool.default.driver
+# Plantillas registradas, indexadas por fid, para identificación 1:N
+template_cache = build_template_cache(zk_driver)
+# Plantillas recibidas por (user_id, hash), para que verify pueda enviar solo los hashes
+template_store = TemplateStore(max_bytes=int(float(os.getenv("TEMPLATE_STORE_MAX_MB", "64")) * 1024 * 1024))
+# Última plantilla que coincidió por usuario: verify la puntúa primero
+match_hints = MatchHints()
+# Sensor AS608 (si hay SERIAL_PORT): librería en el propio sensor, sincronizada desde Mongo por el backend
+sensor_library = build_sensor_library()
+# Score con el que verify acepta un candidato sin puntuar el resto (0 = buscar siempre el mejor)
+IDENTIFY_ACCEPT_SCORE = int(os.getenv("IDENTIFY_ACCEPT_SCORE", "80"))
+
+# Registro: intentos máximos de captura, capturas buenas necesarias y calidad mínima para aceptarlas
+ENROLL_CAPTURE_TRIES = 10
+ENROLL_REQUIRED_TEMPLATES = 3
+ENROLL_MIN_QUALITY = int(os.getenv("ENROLL_MIN_QUALITY", "50"))
+# Sin fusión del SDK, fusionar las 3 mejores capturas por mayoría de bits en lugar de guardar las 3
+ENROLL_FUSE_TEMPLATES = os.getenv("ENROLL_FUSE_TEMPLATES", "true").lower() in ("1", "true", "yes")
+
+# Código de respuesta (convención nginx) cuando el cliente cierra la conexión a mitad de captura
+CLIENT_CLOSED_REQUEST = 499
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
-    for attempt in range(1, 6):
-        try:
-            zk_driver.connect()
-            logger.info(f"ZK9500 ready on startup (attempt {attempt})")
-            break
-        except Exception as exc:  # noqa: BLE001
-            logger.warning(
-                f"Initial connection to ZK9500 failed (attempt {attempt}/5): {exc}")
-            if attempt == 5:
-                break
-            await asyncio.sleep(1.5)
+    device_pool.start()
+    if sensor_library is not None:
+        asyncio.create_task(_reconcile_sensor_library())
+
+
+async def _reconcile_sensor_library() -> None:
+    try:
+        await sensor_library.reconcile()
+    except Exception as exc:  # noqa: BLE001 - el primer lote de sincronización lo reintenta
+        logger.warning(f"[AS608] No se pudo contrastar el mapa de posiciones con el sensor: {exc}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    await device_pool.stop()
+
+
+def _device(device_id: str | None) -> DeviceSlot:
+    """Lector pedido por `device_id` (id de puesto o índice) o, sin él, el menos ocupado."""
+    try:
+        return device_pool.get(device_id)
+    except UnknownDeviceError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
 
 
 @app.get("/fingerprint/zk9500/status")
-async def zk_status():
-    ready = zk_driver.is_ready()
-    return {"ready": ready}
+async def zk_status(device_id: str | None = None):
+    """`ready` indica si hay algún lector conectado (o si lo está `device_id`, si se pasa)."""
+    ready = _device(device_id).ready if device_id is not None else device_pool.ready
+    return {"ready": ready, "devices": device_pool.status(), "template_cache": template_cache.stats(),
+            "template_store": template_store.stats(),
+            "sensor_library": sensor_library.stats() if sensor_library is not None else None}
 
 
 if __name__ == "__main__":
@@ -75,119 +142,461 @@ if __name__ == "__main__":
 
 # ======== ZK9500 Endpoints ========
 
-@app.post("/fingerprint/zk9500/register", response_model=ZKRegisterResponse, responses={400: {"model": ErrorResponse}})
-async def zk_register(user_id: str) -> ZKRegisterResponse:
-    try:
-        logger.info(f"Iniciando registro para usuario: {user_id}")
-        templates_bytes: list[bytes] = []
-        qualities: list[int] = []
-
-        capture_tries = 10
-        timeout_per_capture_ms = int(25000 / capture_tries)
-        for i in range(capture_tries):
-            try:
-                template_bytes, quality = zk_driver.capture(
-                    timeout_ms=timeout_per_capture_ms)
-                templates_bytes.append(template_bytes)
-                qualities.append(int(quality) if quality is not None else 0)
+def _sse(event: dict) -> str:
+    """Serializa un evento de registro en formato Server-Sent Events."""
+    data = json.dumps(jsonable_encoder(event), ensure_ascii=False)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+async def _enroll_events(user_id: str, request: Request, device: DeviceSlot) -> AsyncIterator[dict]:
+    """
+    Captura huellas para el registro emitiendo un evento por paso. Termina en
+    cuanto hay `ENROLL_REQUIRED_TEMPLATES` capturas con calidad >=
+    `ENROLL_MIN_QUALITY` que coinciden entre sí (o tras `ENROLL_CAPTURE_TRIES`
+    intentos) y cierra con un evento `completed` cuyo `result` es el
+    `RegisterResult`. Una captura que no coincide con las demás no hace fallar
+    el registro: se sigue capturando mientras queden intentos. Todas las
+    capturas se hacen en el mismo lector, que cuenta como ocupado hasta el final.
+    """
+    with device.reserve():
+        async for event in _enroll_captures(user_id, request, device):
+            yield event
+
+
+async def _enroll_captures(user_id: str, request: Request, device: DeviceSlot) -> AsyncIterator[dict]:
+    logger.info(f"Iniciando registro para usuario: {user_id} (lector {device.device_id})")
+    templates_bytes: list[bytes] = []
+    qualities: list[int] = []
+    accepted_count = 0
+    ranked: list[int] = []
+
+    capture_tries = ENROLL_CAPTURE_TRIES
+    timeout_per_capture_ms = int(25000 / capture_tries)
+    for i in range(capture_tries):
+        yield {"event": "capture_started", "attempt": i + 1, "max_attempts": capture_tries}
+        try:
+            template_bytes, quality = await device.capture(request, timeout_ms=timeout_per_capture_ms)
+        except CaptureCancelled:
+            raise
+        except Exception as exc:
+            logger.debug(f"Captura {i+1}/{capture_tries} falló: {exc}")
+            yield {"event": "capture_failed", "attempt": i + 1, "detail": str(exc)}
+            continue
+
+        quality = int(quality) if quality is not None else 0
+        accepted = quality >= ENROLL_MIN_QUALITY
+        if accepted:
+            # Las rechazadas solo se notifican: no entran en la selección ni en la fusión
+            templates_bytes.append(template_bytes)
+            qualities.append(quality)
+            accepted_count += 1
+        logger.info(
+            f"Captura {i+1}/{capture_tries}: calidad={quality} ({'aceptada' if accepted else 'rechazada'})")
+        yield {"event": "finger_detected", "attempt": i + 1, "quality": quality}
+        yield {
+            "event": "accepted" if accepted else "rejected",
+            "attempt": i + 1,
+            "quality": quality,
+            "accepted_count": accepted_count,
+            "required": ENROLL_REQUIRED_TEMPLATES,
+        }
+        if accepted_count < ENROLL_REQUIRED_TEMPLATES:
+            continue
+        # Capturas coherentes entre sí, de mejor a peor (calidad × similitud con las demás)
+        ranked = await asyncio.to_thread(zk_driver.select_enrollment, templates_bytes, qualities)
+        if len(ranked) >= ENROLL_REQUIRED_TEMPLATES:
+            break
+        yield {
+            "event": "inconsistent",
+            "attempt": i + 1,
+            "consistent_count": len(ranked),
+            "required": ENROLL_REQUIRED_TEMPLATES,
+        }
+
+    response = await _build_register_response(user_id, templates_bytes, qualities, ranked, capture_tries)
+    yield {"event": "completed", "result": response}
+
+
+async def _build_register_response(user_id: str, templates_bytes: list[bytes], qualities: list[int],
+                                   ranked: list[int], capture_tries: int) -> RegisterResult:
+    if len(templates_bytes) < 3:
+        raise RuntimeError(
+            f"Insuficientes capturas con calidad >= {ENROLL_MIN_QUALITY}: "
+            f"{len(templates_bytes)}/{capture_tries} (mínimo 3 requeridas)")
+
+    logger.info(
+        f"Capturas aceptadas: {len(templates_bytes)}/{capture_tries}, calidades: {qualities}")
+    if len(ranked) < 3:
+        raise RuntimeError(
+            f"Solo {len(ranked)} de {len(templates_bytes)} capturas coinciden entre sí (mínimo 3 requeridas); "
+            "apoya siempre el mismo dedo")
+    top_3_indices = ranked[:3]
+    top_3_templates = [templates_bytes[i] for i in top_3_indices]
+    top_3_qualities = [qualities[i] for i in top_3_indices]
+
+    logger.debug(
+        f"Top 3 templates: índices={top_3_indices}, calidades={top_3_qualities}")
+
+    fused_template = top_3_templates[0]
+    fusion_success = False
+
+    if SDK_AVAILABLE and get_standard_driver:
+        try:
+            standard_driver = get_standard_driver()
+            if standard_driver:
+                fused_template = await asyncio.to_thread(
+                    standard_driver.gen_reg_template,
+                    top_3_templates[0],
+                    top_3_templates[1],
+                    top_3_templates[2]
+                )
                 logger.info(
-                    f"Captura {i+1}/{capture_tries}: calidad={quality}")
-            except Exception as exc:
-                logger.debug(f"Captura {i+1}/{capture_tries} falló: {exc}")
-                continue
+                    f"[REGISTER] SDK estándar fusionó exitosamente: {len(fused_template)} bytes")
+                fusion_success = True
+        except Exception as exc:
+            logger.warning(f"[REGISTER] Fusión SDK estándar falló: {exc}")
+
+    if not fusion_success and ENROLL_FUSE_TEMPLATES and zk_driver.fusable(top_3_templates):
+        # Sin SDK el matching es por bits: la plantilla por mayoría de las 3 es la más representativa
+        fused_template = await asyncio.to_thread(fuse_templates, top_3_templates)
+        logger.info(f"[REGISTER] Top-3 fusionadas por mayoría de bits: {len(fused_template)} bytes")
+        fusion_success = True
+
+    if not fusion_success:
+        logger.warning(
+            f"[REGISTER] Fusión no disponible, retornando Top-3 templates por separado")
+        result_templates = top_3_templates
+    else:
+        result_templates = [fused_template]
+
+    result = RegisterResult(
+        user_id=user_id,
+        templates=result_templates,
+        # Calidad máxima de los top 3
+        qualities=[max(top_3_qualities)] * len(result_templates)
+    )
+    logger.info(
+        f"[REGISTER] Completado para {user_id}: {len(result_templates)} template(s) registrado(s)")
+    _sync_cache(user_id, result_templates)
+    for template in result_templates:
+        template_store.put(user_id, template)
+    return result
 
-        if len(templates_bytes) < 3:
-            raise RuntimeError(
-                f"Insuficientes capturas: {len(templates_bytes)}/10 (mínimo 3 requeridas)")
 
-        logger.info(
-            f"Capturas exitosas: {len(templates_bytes)}/10, calidades: {qualities}")
-        sorted_indices = sorted(
-            range(len(qualities)),
-            key=lambda i: qualities[i],
-            reverse=True
-        )
-        # Ordenar por índice original
-        top_3_indices = sorted(sorted_indices[:3])
-        top_3_templates = [templates_bytes[i] for i in top_3_indices]
-        top_3_qualities = [qualities[i] for i in top_3_indices]
-
-        logger.debug(
-            f"Top 3 templates: índices={top_3_indices}, calidades={top_3_qualities}")
-
-        fused_template = top_3_templates[0]
-        fusion_success = False
-
-        if SDK_AVAILABLE and get_standard_driver:
-            try:
-                standard_driver = get_standard_driver()
-                if standard_driver:
-                    fused_template = standard_driver.gen_reg_template(
-                        top_3_templates[0],
-                        top_3_templates[1],
-                        top_3_templates[2]
-                    )
-                    logger.info(
-                        f"[REGISTER] SDK estándar fusionó exitosamente: {len(fused_template)} bytes")
-                    fusion_success = True
-            except Exception as exc:
-                logger.warning(f"[REGISTER] Fusión SDK estándar falló: {exc}")
-
-        if not fusion_success:
-            logger.warning(
-                f"[REGISTER] Fusión no disponible, retornando Top-3 templates por separado")
-            fused_template_b64 = [
-                zk_driver.to_base64(t) for t in top_3_templates]
-        else:
-            fused_template_b64 = [zk_driver.to_base64(fused_template)]
-
-        response = ZKRegisterResponse(
-            user_id=user_id,
-            templates_base64=fused_template_b64,
-            # Calidad máxima de los top 3
-            qualities=[max(top_3_qualities)] * len(fused_template_b64)
-        )
-        logger.info(
-            f"[REGISTER] Completado para {user_id}: {len(fused_template_b64)} template(s) registrado(s)")
-        return response
+def _sync_cache(user_id: str, templates: list[bytes]) -> bool:
+    try:
+        template_cache.set_user_templates(user_id, templates)
+        return True
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(f"[CACHE] No se pudieron cachear las plantillas de {user_id}: {exc}")
+        return False
+
+
+def _identify_candidates(probe: bytes, candidates: list, candidates_bytes: list[bytes],
+                         include_scores: bool, accept_score: int | None = None) -> tuple:
+    """
+    Puntúa la probe solo contra los candidatos de la petición, con el matcher
+    del driver. La caché 1:N (`template_cache`) no interviene: es de
+    `/identify`, y un verify no la modifica ni busca en ella.
+
+    Con `accept_score` se prueba antes una pasada corta: los candidatos se
+    puntúan empezando por la última plantilla que coincidió de cada usuario y
+    se para en el primero que alcanza ese score. Si ninguno lo alcanza, esa
+    pasada ya los ha puntuado todos y se devuelve el mejor.
+    """
+    if accept_score and not include_scores:
+        order = [idx for idx, cand in enumerate(candidates)
+                 if cand.template_hash is not None and cand.template_hash == match_hints.get(cand.user_id)]
+        best_idx, best_score, scores = zk_driver.identify(
+            probe, candidates_bytes, accept_score=accept_score, order=order)
+        if best_idx is not None and best_score >= accept_score:
+            return best_idx, best_score, None
+        return best_idx, best_score, scores
+    return zk_driver.identify(probe, candidates_bytes)
+
+
+async def _read_verify_request(request: Request) -> ZKVerifyBinaryRequest:
+    """Lee el body de verify en JSON (plantillas en base64) o msgpack (bytes crudos)."""
+    body = await request.body()
+    try:
+        if is_msgpack(request):
+            return ZKVerifyBinaryRequest.model_validate(unpack(body))
+        payload = ZKVerifyRequest.model_validate_json(body)
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Body msgpack inválido: {type(exc).__name__}: {exc}")
+    try:
+        candidates = [
+            BinaryCandidateTemplate(
+                user_id=c.user_id,
+                template=zk_driver.from_base64(c.template_base64) if c.template_base64 is not None else None,
+                template_hash=c.template_hash,
+            )
+            for c in payload.candidates
+        ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Plantilla base64 inválida: {exc}")
+    return ZKVerifyBinaryRequest(candidates=candidates, score_threshold=payload.score_threshold,
+                                 include_scores=payload.include_scores, accept_score=payload.accept_score)
+
+
+def _resolve_templates(candidates: list[BinaryCandidateTemplate]) -> list[str]:
+    """
+    Completa los candidatos que solo traen `template_hash` con las plantillas
+    de `template_store` y guarda las que llegan completas (anotando su hash).
+    Devuelve los hashes que no estaban en caché (vacío si todos los candidatos
+    tienen plantilla).
+    """
+    missing = []
+    for cand in candidates:
+        if cand.template is not None:
+            cand.template_hash = template_store.put(cand.user_id, cand.template)
+            continue
+        cand.template = template_store.get(cand.user_id, cand.template_hash)
+        if cand.template is None:
+            missing.append(cand.template_hash)
+    return missing
 
+
+@app.post("/fingerprint/zk9500/register", response_model=ZKRegisterResponse, responses={400: {"model": ErrorResponse}})
+async def zk_register(user_id: str, request: Request, device_id: str | None = None) -> ZKRegisterResponse:
+    """Con `Accept: application/x-msgpack` responde en msgpack con las plantillas como bytes (`templates`)."""
+    device = _device(device_id)
+    try:
+        async for event in _enroll_events(user_id, request, device):
+            if event["event"] == "completed":
+                result: RegisterResult = event["result"]
+                if wants_msgpack(request):
+                    return MsgpackResponse(result.to_binary())
+                return result.to_response()
+        raise RuntimeError("El registro terminó sin resultado")
+    except CaptureCancelled as exc:
+        logger.info(f"[REGISTER] Cancelado para {user_id}: {exc}")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail=str(exc))
     except Exception as exc:
         logger.exception("ZK register falló")
         raise HTTPException(status_code=400, detail=str(exc))
 
 
-@app.post("/fingerprint/zk9500/verify", response_model=ZKVerifyResponse, responses={400: {"model": ErrorResponse}})
-async def zk_verify(payload: ZKVerifyRequest) -> ZKVerifyResponse:
+@app.post("/fingerprint/zk9500/register/stream")
+async def zk_register_stream(user_id: str, request: Request, device_id: str | None = None) -> StreamingResponse:
+    """
+    Mismo registro que `/register`, pero como stream SSE: `capture_started`,
+    `finger_detected`, `accepted`/`rejected`, `inconsistent`, `capture_failed` y al final
+    `completed` (con el resultado) o `error`.
+    """
+    device = _device(device_id)
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            async for event in _enroll_events(user_id, request, device):
+                if event["event"] == "completed":
+                    event = {**event, "result": event["result"].to_response()}
+                yield _sse(event)
+        except CaptureCancelled as exc:
+            logger.info(f"[REGISTER] Stream cancelado para {user_id}: {exc}")
+        except Exception as exc:
+            logger.exception("ZK register (stream) falló")
+            yield _sse({"event": "error", "detail": str(exc)})
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/fingerprint/zk9500/verify", response_model=ZKVerifyResponse,
+          responses={400: {"model": ErrorResponse}, 409: {"model": ZKMissingTemplatesResponse}},
+          openapi_extra=openapi_body(ZKVerifyRequest, ZKVerifyBinaryRequest))
+async def zk_verify(request: Request, device_id: str | None = None) -> ZKVerifyResponse:
+    """
+    Body en JSON (`ZKVerifyRequest`) o en msgpack (`Content-Type: application/x-msgpack`).
+    Los candidatos pueden traer solo `template_hash`; si alguno no está en caché
+    se responde 409 con `missing_hashes` antes de capturar, para que el cliente
+    reenvíe las plantillas completas.
+    """
+    device = _device(device_id)
+    payload = await _read_verify_request(request)
+    missing = _resolve_templates(payload.candidates)
+    if missing:
+        logger.info(f"[VERIFY] {len(missing)} plantilla(s) fuera de caché; se piden completas")
+        return JSONResponse(status_code=409, content=ZKMissingTemplatesResponse(
+            detail="Plantillas no disponibles en caché", missing_hashes=missing).model_dump())
     try:
         logger.info(
             f"[VERIFY] Iniciando verificación con {len(payload.candidates)} candidatos, threshold={payload.score_threshold}")
-        probe_template, quality = zk_driver.capture(timeout_ms=5000)
+        # Captura en el hilo del lector y matching (CPU) en el pool de hilos;
+        # el matching no toma el lock del dispositivo y no espera a otras capturas
+        probe_template, quality = await device.capture(request, timeout_ms=5000)
         logger.info(
-            f"[VERIFY] Probe capturada: calidad={quality}, template={len(probe_template)} bytes")
-
-        candidates_bytes = [zk_driver.from_base64(
-            c.template_base64) for c in payload.candidates]
-        found, best_score = zk_driver.identify(
-            probe_template, candidates_bytes)
+            f"[VERIFY] Probe capturada en lector {device.device_id}: calidad={quality}, "
+            f"template={len(probe_template)} bytes")
+
+        candidates_bytes = [c.template for c in payload.candidates]
+        accept_score = IDENTIFY_ACCEPT_SCORE if payload.accept_score is None else payload.accept_score
+        best_idx, best_score, scores = await asyncio.to_thread(
+            _identify_candidates, probe_template, payload.candidates, candidates_bytes, payload.include_scores,
+            accept_score)
+        candidate_scores = [
+            CandidateScore(user_id=c.user_id, score=score)
+            for c, score in zip(payload.candidates, scores)
+        ] if payload.include_scores else None
 
         logger.info(
-            f"[VERIFY] Identify resultado: found={found}, best_score={best_score}, threshold={payload.score_threshold}")
+            f"[VERIFY] Identify resultado: best_idx={best_idx}, best_score={best_score}, threshold={payload.score_threshold}")
 
-        if not found or best_score is None or best_score < payload.score_threshold:
+        if best_idx is None or best_score < payload.score_threshold:
             logger.warning(
-                f"[VERIFY] Match FALLIDO: found={found}, score={best_score} < threshold={payload.score_threshold}")
-            return ZKVerifyResponse(match=False, user_id=None, score=best_score, quality=quality)
-        best_idx = -1
-        for idx, cand in enumerate(candidates_bytes):
-            s = zk_driver.match(probe_template, cand)
-            if s == best_score:
-                best_idx = idx
-                break
-
-        matched_user = payload.candidates[best_idx].user_id if best_idx >= 0 else None
+                f"[VERIFY] Match FALLIDO: score={best_score} < threshold={payload.score_threshold}")
+            return respond(request, ZKVerifyResponse(match=False, user_id=None, score=best_score, quality=quality,
+                                                     candidate_scores=candidate_scores))
+
+        matched_user = payload.candidates[best_idx].user_id
+        match_hints.record(matched_user, payload.candidates[best_idx].template_hash)
         logger.info(
             f"[VERIFY] Match EXITOSO: usuario={matched_user}, score={best_score}")
-        return ZKVerifyResponse(match=True, user_id=matched_user, score=best_score, quality=quality)
+        return respond(request, ZKVerifyResponse(match=True, user_id=matched_user, score=best_score, quality=quality,
+                                                 candidate_scores=candidate_scores))
+    except CaptureCancelled as exc:
+        logger.info(f"[VERIFY] Cancelado: {exc}")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail=str(exc))
     except Exception as exc:
         logger.exception("[VERIFY] ZK verify failed")
         raise HTTPException(status_code=400, detail=str(exc))
+
+
+@app.get("/fingerprint/zk9500/templates", response_model=ZKTemplateCacheResponse)
+async def zk_cached_templates() -> ZKTemplateCacheResponse:
+    """Plantillas de la caché 1:N como (user_id, hash), para que el backend la ponga al día con Mongo."""
+    return ZKTemplateCacheResponse(
+        entries=[ZKTemplateEntry(user_id=user_id, template_hash=digest)
+                 for user_id, digest in template_cache.manifest()])
+
+
+@app.put("/fingerprint/zk9500/templates/{user_id}", response_model=ZKTemplatesSyncResponse)
+async def zk_set_templates(user_id: str, payload: ZKTemplatesSyncRequest) -> ZKTemplatesSyncResponse:
+    """Sustituye las plantillas cacheadas de un usuario (p.ej. al arrancar o tras cambios en Mongo)."""
+    try:
+        templates = [zk_driver.from_base64(t) for t in payload.templates_base64]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Plantilla base64 inválida: {exc}")
+    try:
+        fids = await asyncio.to_thread(template_cache.set_user_templates, user_id, templates)
+        for template in templates:
+            template_store.put(user_id, template)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=f"No se pudieron cachear las plantillas: {exc}")
+    return ZKTemplatesSyncResponse(user_id=user_id, templates_count=len(set(fids)))
+
+
+@app.delete("/fingerprint/zk9500/templates/{user_id}", response_model=ZKTemplatesSyncResponse)
+async def zk_delete_templates(user_id: str) -> ZKTemplatesSyncResponse:
+    removed = await asyncio.to_thread(template_cache.remove_user, user_id)
+    template_store.remove_user(user_id)
+    match_hints.forget(user_id)
+    logger.info(f"[CACHE] {removed} plantilla(s) de {user_id} eliminadas")
+    return ZKTemplatesSyncResponse(user_id=user_id, templates_count=0)
+
+
+@app.post("/fingerprint/zk9500/identify", response_model=ZKIdentifyResponse, responses={400: {"model": ErrorResponse}})
+async def zk_identify(payload: ZKIdentifyRequest, request: Request,
+                      device_id: str | None = None) -> ZKIdentifyResponse:
+    """1:N sin candidatos: busca la huella capturada entre todas las plantillas cacheadas."""
+    device = _device(device_id)
+    try:
+        probe_template, quality = await device.capture(request, timeout_ms=5000)
+        hit = await asyncio.to_thread(template_cache.identify, probe_template)
+        if hit is None or hit[1] < payload.score_threshold:
+            logger.info(f"[IDENTIFY] Sin coincidencia: {hit}")
+            return ZKIdentifyResponse(match=False, score=hit[1] if hit else None, quality=quality)
+        fid, score = hit
+        user_id = template_cache.user_of(fid)
+        logger.info(f"[IDENTIFY] Coincidencia: usuario={user_id}, fid={fid}, score={score}")
+        return ZKIdentifyResponse(match=user_id is not None, user_id=user_id, score=score, quality=quality)
+    except CaptureCancelled as exc:
+        logger.info(f"[IDENTIFY] Cancelado: {exc}")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail=str(exc))
+    except Exception as exc:
+        logger.exception("[IDENTIFY] ZK identify failed")
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+# ======== AS608 Endpoints ========
+
+def _sensor_library() -> SensorLibrary:
+    if sensor_library is None:
+        raise HTTPException(status_code=503, detail="Sensor AS608 no configurado (SERIAL_PORT)")
+    return sensor_library
+
+
+@app.get("/fingerprint/as608/library", response_model=AS608LibraryResponse)
+async def as608_library() -> AS608LibraryResponse:
+    """Plantillas guardadas en el sensor, como (user_id, hash), para que el backend calcule la diferencia."""
+    library = _sensor_library()
+    return AS608LibraryResponse(
+        template_bytes=AS608_TEMPLATE_BYTES,
+        entries=[AS608LibraryEntry(user_id=user_id, template_hash=digest) for user_id, digest in library.manifest()],
+    )
+
+
+@app.post("/fingerprint/as608/library/sync", response_model=AS608SyncResponse,
+          responses={400: {"model": ErrorResponse}},
+          openapi_extra=openapi_body(AS608SyncRequest, AS608SyncBinaryRequest))
+async def as608_library_sync(request: Request) -> AS608SyncResponse:
+    """Un lote de la sincronización: guarda `upserts` en posiciones libres y borra los hashes de `deletes`."""
+    library = _sensor_library()
+    body = await request.body()
+    try:
+        if is_msgpack(request):
+            payload = AS608SyncBinaryRequest.model_validate(unpack(body))
+            upserts = [(item.user_id, item.template) for item in payload.upserts]
+        else:
+            payload = AS608SyncRequest.model_validate_json(body)
+            upserts = [(item.user_id, zk_driver.from_base64(item.template_base64)) for item in payload.upserts]
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Body inválido: {type(exc).__name__}: {exc}")
+    try:
+        result = await library.apply(upserts, payload.deletes)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("[AS608] Sincronización fallida")
+        raise HTTPException(status_code=400, detail=str(exc))
+    return AS608SyncResponse(**result)
+
+
+@app.post("/fingerprint/as608/register", response_model=ZKRegisterResponse,
+          responses={400: {"model": ErrorResponse}})
+async def as608_register(user_id: str, request: Request) -> ZKRegisterResponse:
+    """
+    Registra la huella en el propio sensor y devuelve su plantilla con el mismo
+    formato que `/fingerprint/zk9500/register`, para que el backend la guarde.
+    """
+    library = _sensor_library()
+    try:
+        _, template = await library.enroll(user_id)
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("[AS608] Registro fallido")
+        raise HTTPException(status_code=400, detail=str(exc))
+    result = RegisterResult(user_id=user_id, templates=[template], qualities=[])
+    if wants_msgpack(request):
+        return MsgpackResponse(result.to_binary())
+    return result.to_response()
+
+
+@app.post("/fingerprint/as608/identify", response_model=AS608IdentifyResponse,
+          responses={400: {"model": ErrorResponse}})
+async def as608_identify() -> AS608IdentifyResponse:
+    """1:N en el propio sensor: captura y `Search` sobre su librería, sin enviar candidatos."""
+    library = _sensor_library()
+    try:
+        user_id, score, slot = await library.identify()
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("[AS608] Identify fallido")
+        raise HTTPException(status_code=400, detail=str(exc))
+    if user_id is None:
+        logger.info(f"[AS608] Sin coincidencia (posición={slot})")
+        return AS608IdentifyResponse(match=False, score=score, slot=slot)
+    logger.info(f"[AS608] Coincidencia: usuario={user_id}, posición={slot}, score={score}")
+    return AS608IdentifyResponse(match=True, user_id=user_id, score=score, slot=slot)
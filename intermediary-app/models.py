@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field
+import base64
+from dataclasses import dataclass
+
+from pydantic import BaseModel, Field, model_validator
 
 
 class ErrorResponse(BaseModel):
@@ -11,15 +14,80 @@ class ZKRegisterResponse(BaseModel):
     qualities: list[int]
 
 
+@dataclass
+class RegisterResult:
+    """Resultado interno del registro, con las plantillas en bytes; se serializa al responder."""
+    user_id: str
+    templates: list[bytes]
+    qualities: list[int]
+
+    def to_response(self) -> ZKRegisterResponse:
+        return ZKRegisterResponse(
+            user_id=self.user_id,
+            templates_base64=[base64.b64encode(t).decode("ascii") for t in self.templates],
+            qualities=self.qualities,
+        )
+
+    def to_binary(self) -> dict:
+        """Cuerpo de la respuesta msgpack: plantillas como bytes crudos en `templates`."""
+        return {"user_id": self.user_id, "templates": self.templates, "qualities": self.qualities}
+
+
+TEMPLATE_HASH_DESCRIPTION = "SHA-1 (hex) de la plantilla; basta si el intermediary ya la tiene en caché"
+
+
 class CandidateTemplate(BaseModel):
     user_id: str
-    template_base64: str
+    template_base64: str | None = None
+    template_hash: str | None = Field(None, description=TEMPLATE_HASH_DESCRIPTION)
+
+    @model_validator(mode="after")
+    def _template_or_hash(self):
+        if self.template_base64 is None and self.template_hash is None:
+            raise ValueError("Cada candidato necesita `template_base64` o `template_hash`")
+        return self
+
+
+class BinaryCandidateTemplate(BaseModel):
+    user_id: str
+    template: bytes | None = Field(None, min_length=1)
+    template_hash: str | None = Field(None, description=TEMPLATE_HASH_DESCRIPTION)
+
+    @model_validator(mode="after")
+    def _template_or_hash(self):
+        if self.template is None and self.template_hash is None:
+            raise ValueError("Cada candidato necesita `template` o `template_hash`")
+        return self
 
 
 class ZKVerifyRequest(BaseModel):
     candidates: list[CandidateTemplate]
     score_threshold: int = Field(
         40, description="Umbral mínimo de score para considerar match")
+    include_scores: bool = Field(
+        False, description="Incluir el score de cada candidato en la respuesta (diagnóstico)")
+    accept_score: int | None = Field(
+        None, description="Score a partir del cual se acepta el candidato sin puntuar el resto "
+                          "(por defecto IDENTIFY_ACCEPT_SCORE; 0 para buscar siempre el mejor)")
+
+
+class ZKVerifyBinaryRequest(BaseModel):
+    """Mismo `ZKVerifyRequest` en msgpack, con las plantillas como bytes."""
+    candidates: list[BinaryCandidateTemplate]
+    score_threshold: int = 40
+    include_scores: bool = False
+    accept_score: int | None = None
+
+
+class ZKMissingTemplatesResponse(BaseModel):
+    """409 de verify: hay hashes que no están en caché; el cliente reenvía las plantillas completas."""
+    detail: str
+    missing_hashes: list[str]
+
+
+class CandidateScore(BaseModel):
+    user_id: str
+    score: int
 
 
 class ZKVerifyResponse(BaseModel):
@@ -27,3 +95,78 @@ class ZKVerifyResponse(BaseModel):
     user_id: str | None = None
     score: int | None = None
     quality: int | None = None
+    candidate_scores: list[CandidateScore] | None = None
+
+
+class ZKTemplatesSyncRequest(BaseModel):
+    templates_base64: list[str]
+
+
+class ZKTemplatesSyncResponse(BaseModel):
+    user_id: str
+    templates_count: int
+
+
+class ZKTemplateEntry(BaseModel):
+    user_id: str
+    template_hash: str = Field(..., description="SHA-1 (hex) de la plantilla cacheada")
+
+
+class ZKTemplateCacheResponse(BaseModel):
+    entries: list[ZKTemplateEntry]
+
+
+class ZKIdentifyRequest(BaseModel):
+    score_threshold: int = Field(
+        40, description="Umbral mínimo de score para considerar match")
+
+
+class ZKIdentifyResponse(BaseModel):
+    match: bool
+    user_id: str | None = None
+    score: int | None = None
+    quality: int | None = None
+
+
+class AS608LibraryEntry(BaseModel):
+    user_id: str
+    template_hash: str = Field(..., description="SHA-1 (hex) de la plantilla guardada en el sensor")
+
+
+class AS608LibraryResponse(BaseModel):
+    template_bytes: int = Field(..., description="Tamaño de plantilla que acepta el sensor")
+    entries: list[AS608LibraryEntry]
+
+
+class AS608Template(BaseModel):
+    user_id: str
+    template_base64: str
+
+
+class AS608BinaryTemplate(BaseModel):
+    user_id: str
+    template: bytes
+
+
+class AS608SyncRequest(BaseModel):
+    upserts: list[AS608Template] = Field(default_factory=list, description="Plantillas a guardar en el sensor")
+    deletes: list[str] = Field(default_factory=list, description="Hashes de las plantillas a borrar del sensor")
+
+
+class AS608SyncBinaryRequest(BaseModel):
+    """Mismo `AS608SyncRequest` en msgpack, con las plantillas como bytes."""
+    upserts: list[AS608BinaryTemplate] = Field(default_factory=list)
+    deletes: list[str] = Field(default_factory=list)
+
+
+class AS608SyncResponse(BaseModel):
+    uploaded: int
+    deleted: int
+    templates: int
+
+
+class AS608IdentifyResponse(BaseModel):
+    match: bool
+    user_id: str | None = None
+    score: int | None = None
+    slot: int | None = None
@@ -0,0 +1,236 @@
+"""
+Librería del sensor AS608 sincronizada con las plantillas de Mongo.
+
+El AS608 busca 1:N en su propia flash (`Search`), sin que las plantillas
+viajen en cada petición. Las plantillas viven en Mongo, así que el backend
+sincroniza la librería en segundo plano:
+
+1. `GET /fingerprint/as608/library` devuelve lo que hay en el sensor: pares
+   (user_id, hash de contenido).
+2. El backend compara con Mongo y envía solo la diferencia, por lotes:
+   `POST /fingerprint/as608/library/sync` con las plantillas nuevas y los
+   hashes a borrar.
+
+Las plantillas del AS608 nacen en el propio sensor: `POST /fingerprint/as608/register`
+registra la huella en una posición libre (`enroll`), la anota en el mapa y
+devuelve la plantilla (`UpChar`) para que el backend la guarde en Mongo. A
+partir de ahí la sincronización la mantiene en este y en otros sensores.
+
+`SensorLibrary` asigna posiciones libres, sube las plantillas en bloque
+(`upload_templates`) y mantiene el mapa posición → (user_id, hash), guardado
+en `AS608_SLOT_MAP` para que sobreviva a reinicios. Al arrancar se contrasta
+con la tabla de índices del sensor y se descartan las entradas de posiciones
+vacías (sensor borrado o cambiado).
+"""
+import asyncio
+import base64
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from as608_serial import OK, AS608Error, AsyncAS608
+from fingerprint_device import FingerprintDevice, build_device_from_env
+from template_cache import template_digest
+
+# Tamaño de una plantilla del AS608 (`UpChar` del buffer tras `RegModel`)
+AS608_TEMPLATE_BYTES = 512
+
+
+class SensorLibrary:
+    def __init__(self, device: FingerprintDevice, slot_map_path: Optional[str] = None):
+        self.device = device
+        self.slot_map_path = slot_map_path
+        # posición -> (user_id, hash)
+        self._slots: Dict[int, Tuple[str, str]] = {}
+        self._lock = asyncio.Lock()
+        self.reconciled = False
+        self.uploaded = 0
+        self.deleted = 0
+        self.searches = 0
+        self._load()
+
+    # --- mapa de posiciones ---
+
+    def _load(self) -> None:
+        if not self.slot_map_path or not os.path.exists(self.slot_map_path):
+            return
+        try:
+            with open(self.slot_map_path, "r", encoding="utf-8") as fh:
+                raw = json.load(fh)
+            self._slots = {int(slot): (entry["user_id"], entry["hash"]) for slot, entry in raw.items()}
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning(f"[AS608] Mapa de posiciones ilegible ({self.slot_map_path}): {exc}; se empieza vacío")
+            self._slots = {}
+
+    def _save(self) -> None:
+        if not self.slot_map_path:
+            return
+        tmp = f"{self.slot_map_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({str(slot): {"user_id": user_id, "hash": digest}
+                       for slot, (user_id, digest) in sorted(self._slots.items())}, fh)
+        os.replace(tmp, self.slot_map_path)
+
+    def user_of(self, slot: int) -> Optional[str]:
+        entry = self._slots.get(slot)
+        return entry[0] if entry else None
+
+    def manifest(self) -> List[Tuple[str, str]]:
+        """(user_id, hash) de cada plantilla del sensor."""
+        return [entry for _, entry in sorted(self._slots.items())]
+
+    async def reconcile(self) -> None:
+        """Descarta del mapa las posiciones que el sensor tiene vacías."""
+        async with self._lock:
+            await self._reconcile()
+
+    async def _reconcile(self) -> None:
+        used = set(await self.device.call(_used_slots))
+        stale = [slot for slot in self._slots if slot not in used]
+        for slot in stale:
+            del self._slots[slot]
+        if stale:
+            logger.warning(f"[AS608] {len(stale)} posición(es) del mapa vacías en el sensor; descartadas")
+            self._save()
+        self.reconciled = True
+
+    # --- sincronización ---
+
+    async def apply(self, upserts: Iterable[Tuple[str, bytes]], deletes: Iterable[str]) -> dict:
+        """
+        Borra del sensor las plantillas con hash en `deletes` y guarda las
+        (user_id, plantilla) de `upserts` que aún no están, en posiciones libres.
+        """
+        async with self._lock:
+            if not self.reconciled:
+                await self._reconcile()
+            delete_hashes = set(deletes)
+            to_delete = sorted(slot for slot, (_, digest) in self._slots.items() if digest in delete_hashes)
+            present = {entry for entry in self._slots.values() if entry[1] not in delete_hashes}
+            pending = []
+            for user_id, template in upserts:
+                if len(template) != AS608_TEMPLATE_BYTES:
+                    raise ValueError(
+                        f"Plantilla de {user_id} de {len(template)} B; el AS608 usa {AS608_TEMPLATE_BYTES} B")
+                entry = (user_id, template_digest(template))
+                if entry not in present:
+                    present.add(entry)
+                    pending.append((entry, template))
+
+            if to_delete:
+                await self.device.call(lambda sensor: _delete_slots(sensor, to_delete))
+                for slot in to_delete:
+                    del self._slots[slot]
+                self.deleted += len(to_delete)
+                self._save()
+
+            stored = []
+            if pending:
+                reserved = set(self._slots)
+                slots = await self.device.call(lambda sensor: _free_slots(sensor, reserved, len(pending)))
+                entries = dict(zip(slots, (entry for entry, _ in pending)))
+                items = [(slot, template) for slot, (_, template) in zip(slots, pending)]
+                try:
+                    await self.device.call(lambda sensor: _upload(sensor, items, stored))
+                finally:
+                    # Lo subido antes de un fallo queda en el mapa: el siguiente lote no lo repite
+                    for slot in stored:
+                        self._slots[slot] = entries[slot]
+                    self.uploaded += len(stored)
+                    self._save()
+            logger.info(f"[AS608] Sincronización: {len(stored)} plantilla(s) subidas, {len(to_delete)} borradas, "
+                        f"{len(self._slots)} en el sensor")
+            return {"uploaded": len(stored), "deleted": len(to_delete), "templates": len(self._slots)}
+
+    # --- registro ---
+
+    async def enroll(self, user_id: str) -> Tuple[int, bytes]:
+        """
+        Registra una huella en el sensor (dos capturas) en una posición libre y
+        la anota en el mapa: (posición, plantilla). La plantilla es la que el
+        backend guarda en Mongo, así que la siguiente sincronización ya la
+        encuentra en el sensor y no la vuelve a subir.
+        """
+        async with self._lock:
+            if not self.reconciled:
+                await self._reconcile()
+            reserved = set(self._slots)
+            slot = (await self.device.call(lambda sensor: _free_slots(sensor, reserved, 1)))[0]
+            slot, _, template_b64 = await self.device.enroll_async(slot)
+            template = base64.b64decode(template_b64) if template_b64 else b""
+            if len(template) != AS608_TEMPLATE_BYTES:
+                await self.device.call(lambda sensor: _delete_slots(sensor, [slot]))
+                raise RuntimeError(
+                    f"El sensor devolvió una plantilla de {len(template)} B; se esperaban {AS608_TEMPLATE_BYTES} B")
+            self._slots[slot] = (user_id, template_digest(template))
+            self._save()
+        logger.info(f"[AS608] Huella de {user_id} registrada en la posición {slot}")
+        return slot, template
+
+    # --- búsqueda ---
+
+    async def identify(self) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+        """
+        Captura y busca en el sensor: (user_id, score, posición); sin
+        coincidencia, user_id None. Espera a que termine un lote de
+        sincronización en curso: ambos usan el buffer 1 del sensor.
+        """
+        async with self._lock:
+            self.searches += 1
+            found, slot, score = await self.device.search_async()
+        if not found:
+            return None, None, None
+        return self.user_of(slot), score, slot
+
+    def stats(self) -> dict:
+        return {
+            "templates": len(self._slots),
+            "users": len({user_id for user_id, _ in self._slots.values()}),
+            "reconciled": self.reconciled,
+            "uploaded": self.uploaded,
+            "deleted": self.deleted,
+            "searches": self.searches,
+        }
+
+
+async def _used_slots(sensor: AsyncAS608) -> List[int]:
+    if not sensor.library_size:
+        await sensor.read_system_parameters()
+    return await sensor.used_slots()
+
+
+async def _free_slots(sensor: AsyncAS608, reserved: Set[int], count: int) -> List[int]:
+    used = set(await _used_slots(sensor)) | reserved
+    free = [slot for slot in range(sensor.library_size) if slot not in used][:count]
+    if len(free) < count:
+        raise RuntimeError(f"Librería del AS608 llena: {len(free)} posición(es) libres para {count} plantilla(s)")
+    return free
+
+
+async def _delete_slots(sensor: AsyncAS608, slots: List[int]) -> None:
+    """Borra las posiciones agrupando las consecutivas en un solo `DeletChar`."""
+    runs: List[List[int]] = []
+    for slot in slots:
+        if runs and slot == runs[-1][0] + runs[-1][1]:
+            runs[-1][1] += 1
+        else:
+            runs.append([slot, 1])
+    for start, count in runs:
+        code = await sensor.delete_model(start, count)
+        if code != OK:
+            raise AS608Error(f"No se pudieron borrar las posiciones {start}..{start + count - 1}", code)
+
+
+async def _upload(sensor: AsyncAS608, items: List[Tuple[int, bytes]], stored: List[int]) -> None:
+    """Sube las plantillas en bloque, anotando en `stored` cada posición según queda guardada."""
+    async for slot in sensor.upload_templates(items):
+        stored.append(slot)
+
+
+def build_sensor_library() -> Optional[SensorLibrary]:
+    """Librería del AS608 si hay `SERIAL_PORT` configurado; sin él, None (solo ZK9500)."""
+    if not os.getenv("SERIAL_PORT"):
+        return None
+    return SensorLibrary(build_device_from_env(), slot_map_path=os.getenv("AS608_SLOT_MAP", "as608_slots.json"))
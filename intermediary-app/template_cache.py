@@ -0,0 +1,293 @@
+"""
+Caché caliente de plantillas para identificación 1:N.
+
+Cada plantilla registrada recibe un id entero compacto (`fid`) y se asocia al
+`user_id` que la registró. Hay dos implementaciones con la misma interfaz:
+
+- `SDKTemplateCache`: guarda las plantillas en la DB cache del ZKFinger SDK
+  (ZKFPM_DBAdd / ZKFPM_DBDel) e identifica con ZKFPM_DBIdentify, el matcher
+  optimizado del fabricante.
+- `PythonTemplateCache`: mantiene las plantillas en memoria y las compara con
+  el matcher vectorizado del driver (`score_candidates`); se usa cuando la DLL
+  del SDK no está disponible. Al dar de alta cada plantilla guarda también su
+  firma compacta (`template_signature`, 256 bytes) y en `identify` compara
+  primero las firmas: solo las plantillas que pueden superar el score mínimo
+  pasan al matcher completo.
+
+Las plantillas de un usuario se sustituyen en bloque con `set_user_templates`:
+solo se añaden/borran las que cambian (se comparan por hash de contenido).
+
+`TemplateStore` es independiente de lo anterior: guarda los bytes de las
+plantillas recibidas, direccionadas por (user_id, hash), con desalojo LRU por
+tamaño. Permite que `verify` reciba solo los hashes de los candidatos.
+
+`MatchHints` recuerda, por usuario, el hash de la última plantilla que
+coincidió, para que `verify` la puntúe primero y pueda parar antes.
+"""
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+
+def template_digest(template: bytes) -> str:
+    return hashlib.sha1(template).hexdigest()
+
+
+class TemplateCache(ABC):
+    """Mapa fid <-> (user_id, hash) común; las subclases guardan y comparan las plantillas."""
+
+    backend = "base"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._next_fid = 1
+        self._owners: Dict[int, str] = {}
+        self._user_fids: Dict[str, Dict[str, int]] = {}
+
+    # --- almacenamiento, implementado por cada backend ---
+
+    @abstractmethod
+    def _store(self, fid: int, template: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def _delete(self, fid: int) -> None:
+        ...
+
+    @abstractmethod
+    def _identify(self, probe: bytes) -> Optional[Tuple[int, int]]:
+        ...
+
+    # --- interfaz pública ---
+
+    def set_user_templates(self, user_id: str, templates: Sequence[bytes]) -> List[int]:
+        """Deja en la caché exactamente `templates` para `user_id`; devuelve sus fids en el mismo orden."""
+        with self._lock:
+            current = self._user_fids.get(user_id, {})
+            wanted = {template_digest(t): t for t in templates}
+            for digest in [d for d in current if d not in wanted]:
+                fid = current.pop(digest)
+                self._delete(fid)
+                self._owners.pop(fid, None)
+            for digest, template in wanted.items():
+                if digest in current:
+                    continue
+                fid = self._next_fid
+                self._store(fid, template)
+                self._next_fid += 1
+                current[digest] = fid
+                self._owners[fid] = user_id
+            if current:
+                self._user_fids[user_id] = current
+            else:
+                self._user_fids.pop(user_id, None)
+            return [current[template_digest(t)] for t in templates]
+
+    def remove_user(self, user_id: str) -> int:
+        with self._lock:
+            fids = self._user_fids.pop(user_id, {})
+            for fid in fids.values():
+                self._delete(fid)
+                self._owners.pop(fid, None)
+            return len(fids)
+
+    def user_of(self, fid: int) -> Optional[str]:
+        return self._owners.get(fid)
+
+    def manifest(self) -> List[Tuple[str, str]]:
+        """(user_id, hash) de cada plantilla cacheada, para que el backend calcule qué falta."""
+        with self._lock:
+            return [(user_id, digest) for user_id, fids in self._user_fids.items() for digest in fids]
+
+    def identify(self, probe: bytes) -> Optional[Tuple[int, int]]:
+        """(fid, score) de la plantilla más parecida de toda la caché, o None si no hay coincidencia."""
+        return self._identify(probe)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.backend, "templates": len(self._owners), "users": len(self._user_fids)}
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+
+class SDKTemplateCache(TemplateCache):
+    backend = "sdk"
+
+    def __init__(self, standard_driver):
+        super().__init__()
+        self._sdk = standard_driver
+
+    def _store(self, fid: int, template: bytes) -> None:
+        self._sdk.db_add(fid, template)
+
+    def _delete(self, fid: int) -> None:
+        self._sdk.db_del(fid)
+
+    def _identify(self, probe: bytes) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            if not self._owners:
+                return None
+            return self._sdk.db_identify(probe)
+
+
+class PythonTemplateCache(TemplateCache):
+    backend = "python"
+
+    def __init__(self, scorer: Callable[[bytes, Sequence[bytes]], List[int]],
+                 signature: Optional[Callable[[bytes], Optional[bytes]]] = None,
+                 prefilter: Optional[Callable[[bytes, Sequence[bytes]], List[int]]] = None):
+        super().__init__()
+        self._scorer = scorer
+        self._signature = signature
+        self._prefilter = prefilter
+        self._templates: Dict[int, bytes] = {}
+        self._signatures: Dict[int, bytes] = {}
+        self.pruned = 0
+
+    def _store(self, fid: int, template: bytes) -> None:
+        self._templates[fid] = template
+        signature = self._signature(template) if self._signature is not None else None
+        if signature is not None:
+            self._signatures[fid] = signature
+
+    def _delete(self, fid: int) -> None:
+        self._templates.pop(fid, None)
+        self._signatures.pop(fid, None)
+
+    def _survivors(self, probe: bytes, fids: List[int], signatures: List[Optional[bytes]]) -> List[int]:
+        """Posiciones de `fids` que pasan al matcher completo según su firma (todas si no hay filtro)."""
+        probe_signature = self._signature(probe) if self._prefilter is not None else None
+        if probe_signature is None:
+            return list(range(len(fids)))
+        comparable = [idx for idx, sig in enumerate(signatures)
+                      if sig is not None and len(sig) == len(probe_signature)]
+        if not comparable:
+            return list(range(len(fids)))
+        kept = {comparable[pos] for pos in self._prefilter(probe_signature, [signatures[i] for i in comparable])}
+        comparable_set = set(comparable)
+        survivors = [idx for idx in range(len(fids)) if idx in kept or idx not in comparable_set]
+        self.pruned += len(fids) - len(survivors)
+        return survivors
+
+    def _identify(self, probe: bytes) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            fids = list(self._templates)
+            templates = [self._templates[fid] for fid in fids]
+            signatures = [self._signatures.get(fid) for fid in fids]
+        if not fids:
+            return None
+        # El scoring es CPU pura: fuera del lock para no bloquear altas/bajas
+        survivors = self._survivors(probe, fids, signatures)
+        if not survivors:
+            return None
+        scores = self._scorer(probe, [templates[idx] for idx in survivors])
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return (fids[survivors[best]], scores[best]) if scores[best] > 0 else None
+
+    def stats(self) -> dict:
+        return {**super().stats(), "prefilter": self._prefilter is not None, "pruned": self.pruned}
+
+
+class TemplateStore:
+    """Plantillas decodificadas por (user_id, hash), con desalojo LRU al superar `max_bytes`."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, user_id: str, template: bytes) -> str:
+        digest = template_digest(template)
+        key = (user_id, digest)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return digest
+            self._entries[key] = template
+            self._bytes += len(template)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return digest
+
+    def get(self, user_id: str, digest: str) -> Optional[bytes]:
+        key = (user_id, digest)
+        with self._lock:
+            template = self._entries.get(key)
+            if template is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return template
+
+    def remove_user(self, user_id: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == user_id]
+            for key in keys:
+                self._bytes -= len(self._entries.pop(key))
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "templates": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class MatchHints:
+    """Hash de la última plantilla que coincidió por usuario, acotado a `max_users` (LRU)."""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._last: "OrderedDict[str, str]" = OrderedDict()
+
+    def record(self, user_id: str, digest: str) -> None:
+        with self._lock:
+            self._last[user_id] = digest
+            self._last.move_to_end(user_id)
+            while len(self._last) > self.max_users:
+                self._last.popitem(last=False)
+
+    def get(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            return self._last.get(user_id)
+
+    def forget(self, user_id: str) -> None:
+        with self._lock:
+            self._last.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+
+def build_template_cache(driver) -> TemplateCache:
+    """DB cache del SDK si la DLL está disponible; si no, caché en Python con el matcher del driver."""
+    try:
+        from zkfinger_standard import get_standard_driver
+        standard_driver = get_standard_driver()
+    except Exception as exc:  # noqa: BLE001
+        logger.debug(f"SDK estándar no disponible para la caché de plantillas: {exc}")
+        standard_driver = None
+    if standard_driver is not None:
+        logger.info("Caché de plantillas: DB cache del ZKFinger SDK")
+        return SDKTemplateCache(standard_driver)
+    logger.info("Caché de plantillas: implementación en Python")
+    from zk9500_driver import prefilter_signatures, template_signature
+    return PythonTemplateCache(driver.score_candidates, signature=template_signature, prefilter=prefilter_signatures)
@@ -0,0 +1,81 @@
+"""
+Transporte binario (msgpack) entre el backend y el intermediary-app.
+
+Las plantillas pesan más de 50 KB; en JSON viajan en base64 (+33 %) y cada
+extremo las codifica o decodifica en cada petición. Con msgpack viajan como
+bytes crudos. Se negocia por cabeceras HTTP y JSON sigue siendo el formato
+por defecto:
+
+- `Content-Type: application/x-msgpack` en la petición → el body es msgpack.
+- `Accept: application/x-msgpack` → la respuesta se devuelve en msgpack.
+
+En msgpack las plantillas van en los campos `templates` (registro) y
+`template` (candidatos de verify) en lugar de `templates_base64` /
+`template_base64`.
+"""
+from typing import Any
+
+import msgpack
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def is_msgpack(request: Request) -> bool:
+    return request.headers.get("content-type", "").split(";")[0].strip() == MSGPACK_MEDIA_TYPE
+
+
+def wants_msgpack(request: Request) -> bool:
+    return MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def unpack(body: bytes) -> Any:
+    return msgpack.unpackb(body, raw=False)
+
+
+def respond(request: Request, model: BaseModel):
+    """`model` tal cual (FastAPI lo serializa a JSON) o en msgpack si el cliente lo acepta."""
+    if wants_msgpack(request):
+        return MsgpackResponse(jsonable_encoder(model))
+    return model
+
+
+def _inline_schema(model: type[BaseModel]) -> dict:
+    """JSON Schema del modelo con los submodelos (`$defs`) expandidos, válido dentro de OpenAPI."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/$defs/"):
+                return resolve(defs[ref.rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+
+def openapi_body(json_model: type[BaseModel], binary_model: type[BaseModel]) -> dict:
+    """`openapi_extra` para endpoints que leen el body a mano (JSON o msgpack)."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": _inline_schema(json_model)},
+                MSGPACK_MEDIA_TYPE: {"schema": _inline_schema(binary_model)},
+            },
+        }
+    }
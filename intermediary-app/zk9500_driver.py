@@ -4,9 +4,13 @@ Driver wrapper para el lector ZKTeco ZK9500.
 Nota: Manejo del SDK estándar y el nativo como libreria de python.
 """
 import base64
+import functools
+import os
 import threading
 import time
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
 from loguru import logger
 
 try:
@@ -34,10 +38,128 @@ except Exception as exc:  # noqa: BLE001
         "SDK ZK9500 (pyzkfp) no disponible. Instala con `pip install pyzkfp`.")
 
 
+# Inicio de los datos biométricos dentro del template del ZK9500 (antes va la imagen)
+BIOMETRIC_OFFSET = 50000
+
+# Score mínimo (exclusivo) de la comparación de datos biométricos; por debajo el score es 0
+BIOMETRIC_MIN_SCORE = 60
+
+# Tamaño máximo de cada bloque de la matriz de candidatos en identify (acota la memoria)
+IDENTIFY_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Firma compacta para el filtro previo de la caché 1:N: bytes muestreados a paso fijo de la sección biométrica
+SIGNATURE_BYTES = 256
+
+# Puntos por debajo de BIOMETRIC_MIN_SCORE con los que la firma aún deja pasar un candidato al matcher
+# completo. Con 2048 bits la estimación tiene una desviación de ~1 punto: un score real > 60 no cae
+# por debajo de 54 y un impostor (~50) casi nunca llega
+SIGNATURE_MARGIN = 6
+
+# Número de bits a 1 de cada valor de byte, para NumPy sin `np.bitwise_count` (< 2.0)
+_POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values]
+
+
+def matching_bits(template_a: bytes, template_b: bytes) -> int:
+    """Bits iguales entre dos buffers del mismo tamaño (8·len − distancia de Hamming)."""
+    xor = np.bitwise_xor(np.frombuffer(template_a, dtype=np.uint8),
+                         np.frombuffer(template_b, dtype=np.uint8))
+    differing = int(_popcount(xor).sum(dtype=np.int64))
+    return len(template_a) * 8 - differing
+
+
+def batch_similarity(probe: bytes, candidates: Sequence[bytes],
+                     chunk_bytes: int = IDENTIFY_CHUNK_BYTES) -> np.ndarray:
+    """
+    Porcentaje entero de bits iguales entre `probe` y cada candidato (todos del
+    mismo tamaño). Los candidatos se apilan en una matriz uint8 contigua por
+    bloques de como mucho `chunk_bytes`, y cada bloque se compara en una pasada.
+    """
+    row_len = len(probe)
+    scores = np.zeros(len(candidates), dtype=np.int64)
+    if row_len == 0 or not candidates:
+        return scores
+    probe_row = np.frombuffer(probe, dtype=np.uint8)
+    rows_per_chunk = max(1, chunk_bytes // row_len)
+    total_bits = row_len * 8
+    for start in range(0, len(candidates), rows_per_chunk):
+        chunk = candidates[start:start + rows_per_chunk]
+        matrix = np.frombuffer(b"".join(chunk), dtype=np.uint8).reshape(len(chunk), row_len)
+        differing = _popcount(np.bitwise_xor(matrix, probe_row)).sum(axis=1, dtype=np.int64)
+        scores[start:start + len(chunk)] = ((total_bits - differing) * 100) // total_bits
+    return scores
+
+
+def pairwise_similarity(sections: Sequence[bytes]) -> np.ndarray:
+    """Matriz n×n con el porcentaje entero de bits iguales entre cada par de buffers del mismo tamaño."""
+    matrix = np.frombuffer(b"".join(sections), dtype=np.uint8).reshape(len(sections), -1)
+    total_bits = matrix.shape[1] * 8
+    differing = _popcount(matrix[:, None, :] ^ matrix[None, :, :]).sum(axis=2, dtype=np.int64)
+    return ((total_bits - differing) * 100) // total_bits
+
+
+def fuse_templates(templates: Sequence[bytes]) -> bytes:
+    """
+    Plantilla "media" de un número impar de capturas del mismo dedo: cada bit
+    de la sección biométrica es el voto mayoritario; la cabecera (imagen) es
+    la de la primera. Con el matcher por bits del driver queda más cerca de
+    cualquier captura nueva que cada plantilla por separado.
+    """
+    if len(templates) % 2 == 0:
+        raise ValueError("La fusión por mayoría necesita un número impar de plantillas")
+    sections = np.frombuffer(b"".join(t[BIOMETRIC_OFFSET:] for t in templates), dtype=np.uint8)
+    bits = np.unpackbits(sections.reshape(len(templates), -1), axis=1)
+    majority = (bits.sum(axis=0, dtype=np.int64) * 2 > len(templates)).astype(np.uint8)
+    return templates[0][:BIOMETRIC_OFFSET] + np.packbits(majority).tobytes()
+
+
+@functools.lru_cache(maxsize=8)
+def _signature_positions(biometric_len: int, size: int) -> np.ndarray:
+    return np.linspace(0, biometric_len - 1, size).astype(np.intp)
+
+
+def template_signature(template: bytes, size: int = SIGNATURE_BYTES) -> Optional[bytes]:
+    """
+    `size` bytes repartidos uniformemente por la sección biométrica. Su
+    porcentaje de bits iguales estima el score de `match` a 1/8 de coste
+    (sección de 2 KB). None si el template no tiene sección biométrica.
+    """
+    if len(template) <= BIOMETRIC_OFFSET:
+        return None
+    biometric = np.frombuffer(template, dtype=np.uint8, offset=BIOMETRIC_OFFSET)
+    if len(biometric) <= size:
+        return biometric.tobytes()
+    return biometric[_signature_positions(len(biometric), size)].tobytes()
+
+
+def prefilter_signatures(probe_signature: bytes, signatures: Sequence[bytes]) -> List[int]:
+    """Índices de `signatures` (mismo tamaño que la de la probe) que pueden superar BIOMETRIC_MIN_SCORE."""
+    similarity = batch_similarity(probe_signature, signatures)
+    return np.flatnonzero(similarity >= BIOMETRIC_MIN_SCORE - SIGNATURE_MARGIN).tolist()
+
+
+class CaptureCancelled(Exception):
+    """La captura se canceló (cliente desconectado o apagado del servicio)."""
+
+
 class ZK9500Driver:
-    def __init__(self):
+    # Init()/Terminate() del SDK son globales: Terminate solo al cerrar el último lector abierto
+    _sdk_lock = threading.Lock()
+    _sdk_users = 0
+
+    def __init__(self, device_index: int = 0):
+        self.device_index = device_index
         self._device = None
-        self._lock = threading.Lock()
+        # True si este lector cuenta en `_sdk_users` (Init correcto): close solo descuenta lo suyo
+        self._sdk_counted = False
+        # Serializa el acceso al SDK (captura, matcher del dispositivo, conexión).
+        # Reentrante: capture reconecta (close/connect) sin soltarlo.
+        self._lock = threading.RLock()
 
     @staticmethod
     def _resolve_device_class():
@@ -50,16 +172,16 @@ class ZK9500Driver:
             f"No se encontró clase de dispositivo en pyzkfp. Miembros: {dir(zkfp)}")
         return None
 
-    def _open_device(self) -> None:
-        if not self._device:
-            raise RuntimeError("Instancia de dispositivo no creada")
-        if hasattr(self._device, "OpenDevice"):
+    def _open_device(self, device) -> None:
+        if hasattr(device, "OpenDevice"):
             ret_open = None
             try:
                 try:
-                    ret_open = self._device.OpenDevice(0)
+                    ret_open = device.OpenDevice(self.device_index)
                 except TypeError:
-                    ret_open = self._device.OpenDevice()
+                    if self.device_index:
+                        raise RuntimeError("pyzkfp no admite índice de dispositivo en OpenDevice")
+                    ret_open = device.OpenDevice()
             except Exception as exc:  # noqa: BLE001
                 logger.error(f"OpenDevice lanzó excepción: {exc}")
                 raise
@@ -80,23 +202,50 @@ class ZK9500Driver:
         if zkfp is None:
             raise RuntimeError("SDK ZK9500 no instalado (pyzkfp)")
         with self._lock:
+            if self._device is not None:
+                self.close()
             device_cls = self._resolve_device_class()
             if device_cls is None:
                 raise RuntimeError(
                     "pyzkfp instalado pero no expone clase ZKFP/ZKFP2")
-            self._device = device_cls()
+            # `_device` solo se asigna con Init y OpenDevice correctos: un fallo no deja
+            # un lector a medias que un close posterior descuente (y haga Terminate)
+            device = device_cls()
             ret = None
             try:
-                ret = self._device.Init()
+                ret = device.Init()
             except Exception as exc:  # noqa: BLE001
                 logger.error(f"Init() lanzó excepción: {exc}")
                 raise
 
-            if ret not in (0, None):
+            # 1 = ZKFP_ERR_ALREADY_INIT: otro lector del pool ya inicializó el SDK
+            if ret not in (0, 1, None):
                 raise RuntimeError(
                     f"No se pudo inicializar ZK9500. Código: {ret}")
-            logger.info(f"ZK9500 inicializado (pyzkfp). Init retornó: {ret}")
-            self._open_device()
+            logger.info(f"ZK9500 #{self.device_index} inicializado (pyzkfp). Init retornó: {ret}")
+            with ZK9500Driver._sdk_lock:
+                ZK9500Driver._sdk_users += 1
+                self._sdk_counted = True
+            try:
+                self._open_device(device)
+            except Exception:
+                self._release_sdk(device)
+                raise
+            self._device = device
+
+    def _release_sdk(self, device) -> None:
+        """Descuenta este lector de `_sdk_users` (si contaba) y hace Terminate si era el último."""
+        with ZK9500Driver._sdk_lock:
+            if not self._sdk_counted:
+                return
+            self._sdk_counted = False
+            ZK9500Driver._sdk_users = max(0, ZK9500Driver._sdk_users - 1)
+            last_user = ZK9500Driver._sdk_users == 0
+        if last_user:
+            try:
+                device.Terminate()
+            except Exception:
+                pass
 
     def close(self) -> None:
         with self._lock:
@@ -104,22 +253,33 @@ class ZK9500Driver:
                 try:
                     if hasattr(self._device, "CloseDevice"):
                         try:
-                            self._device.CloseDevice(0)
+                            self._device.CloseDevice(self.device_index)
                         except TypeError:
                             self._device.CloseDevice()
                 except Exception:
                     pass
-                try:
-                    self._device.Terminate()
-                except Exception:
-                    pass
+                self._release_sdk(self._device)
                 self._device = None
-                logger.info("ZK9500 cerrado")
+                logger.info(f"ZK9500 #{self.device_index} cerrado")
 
     def ensure_connected(self) -> None:
         if self._device is None:
             self.connect()
 
+    @property
+    def connected(self) -> bool:
+        return self._device is not None
+
+    def probe(self) -> None:
+        """Comprobación barata de que el lector sigue conectado; lanza excepción si no."""
+        with self._lock:
+            if self._device is None:
+                raise RuntimeError("ZK9500 no conectado")
+            if hasattr(self._device, "GetDeviceCount"):
+                count = self._device.GetDeviceCount()
+                if not count:
+                    raise RuntimeError("No hay ningún ZK9500 conectado por USB")
+
     def is_ready(self) -> bool:
         try:
             self.ensure_connected()
@@ -135,31 +295,46 @@ class ZK9500Driver:
             # Algunos bindings no aceptan timeout
             return self._device.AcquireFingerprint()
 
-    def capture(self, timeout_ms: int = 5000, retries: int = 20, delay: float = 0.5) -> Tuple[bytes, int]:
+    def capture(self, timeout_ms: int = 5000, retries: int = 20, delay: float = 0.5,
+                cancel_event: Optional[threading.Event] = None) -> Tuple[bytes, int]:
+        """
+        Espera un dedo y devuelve (template, calidad). Si se pasa `cancel_event`,
+        la captura se abandona con `CaptureCancelled` entre intentos en cuanto
+        se activa (una llamada a AcquireFingerprint en curso no se interrumpe).
+        """
+        def wait(seconds: float) -> None:
+            if cancel_event is None:
+                time.sleep(seconds)
+            elif cancel_event.wait(seconds):
+                raise CaptureCancelled("Captura cancelada")
+
         self.ensure_connected()
         with self._lock:
             last_error = None
+            reconnected = False
             for attempt in range(1, retries + 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise CaptureCancelled("Captura cancelada")
                 try:
                     result = self._acquire_once(timeout_ms)
                 except Exception as exc:
-                    if DeviceNotInitializedError and isinstance(exc, DeviceNotInitializedError):
+                    # Una sola reconexión inmediata; si vuelve a fallar, la petición
+                    # falla y el supervisor (device_supervisor.py) reconecta con espera
+                    if DeviceNotInitializedError and isinstance(exc, DeviceNotInitializedError) and not reconnected:
                         logger.debug(
                             "DeviceNotInitializedError: reintentando tras reconectar...")
+                        reconnected = True
                         self.close()
-                        time.sleep(0.2)
                         self.connect()
-                        time.sleep(0.2)
                         continue
-                    else:
-                        raise
+                    raise
 
                 if result is None:
                     last_error = "None"
                     if attempt % 5 == 0:
                         logger.debug(
                             f"Esperando dedo... ({attempt}/{retries})")
-                    time.sleep(delay)
+                    wait(delay)
                     continue
 
                 fp_image = fp_template = None
@@ -186,7 +361,7 @@ class ZK9500Driver:
                     if attempt % 5 == 0:
                         logger.debug(
                             f"Datos incompletos... ({attempt}/{retries})")
-                    time.sleep(delay)
+                    wait(delay)
                     continue
 
                 template_bytes = bytes(fp_template)
@@ -213,47 +388,44 @@ class ZK9500Driver:
                 f"AcquireFingerprint falló tras {retries} intentos (último error: {last_error})")
 
     def match(self, template_a: bytes, template_b: bytes) -> int:
-        self.ensure_connected()
-        with self._lock:
-            # Validación básica
-            if len(template_a) != len(template_b):
-                logger.warning(
-                    f"[MATCH] Tamaños diferentes: {len(template_a)} vs {len(template_b)}")
-                return 0
+        # Validación básica
+        if len(template_a) != len(template_b):
+            logger.warning(
+                f"[MATCH] Tamaños diferentes: {len(template_a)} vs {len(template_b)}")
+            return 0
 
-            if len(template_a) == 0:
-                logger.warning("[MATCH] Templates vacíos")
-                return 0
+        if len(template_a) == 0:
+            logger.warning("[MATCH] Templates vacíos")
+            return 0
 
-            BIOMETRIC_OFFSET = 50000
+        if len(template_a) >= BIOMETRIC_OFFSET and len(template_b) >= BIOMETRIC_OFFSET:
+            # Extraer datos biométricos completos
+            biom_a = template_a[BIOMETRIC_OFFSET:]
+            biom_b = template_b[BIOMETRIC_OFFSET:]
 
-            if len(template_a) >= BIOMETRIC_OFFSET and len(template_b) >= BIOMETRIC_OFFSET:
-                # Extraer datos biométricos completos
-                biom_a = template_a[BIOMETRIC_OFFSET:]
-                biom_b = template_b[BIOMETRIC_OFFSET:]
+            # Comparar bit a bit para máxima precisión
+            total_bits = len(biom_a) * 8
+            same_bits = matching_bits(biom_a, biom_b) if total_bits > 0 else 0
 
-                # Comparar bit a bit para máxima precisión
-                matching_bits = 0
-                total_bits = len(biom_a) * 8
-                for byte_a, byte_b in zip(biom_a, biom_b):
-                    xor_byte = byte_a ^ byte_b
-                    matching_bits += 8 - bin(xor_byte).count('1')
+            similarity_pct = (
+                same_bits * 100) // total_bits if total_bits > 0 else 0
 
-                similarity_pct = (
-                    matching_bits * 100) // total_bits if total_bits > 0 else 0
+            logger.info(
+                f"[MATCH] Biometric features (bytes {BIOMETRIC_OFFSET}-{len(template_a)}): "
+                f"{same_bits}/{total_bits} bits = {similarity_pct}%")
 
+            if similarity_pct > BIOMETRIC_MIN_SCORE:
                 logger.info(
-                    f"[MATCH] Biometric features (bytes {BIOMETRIC_OFFSET}-{len(template_a)}): "
-                    f"{matching_bits}/{total_bits} bits = {similarity_pct}%")
-
-                if similarity_pct > 60:
-                    logger.info(
-                        f"[MATCH] Score {similarity_pct}% > 60% threshold ✓ VÁLIDO")
-                    return max(0, min(100, similarity_pct))
-                else:
-                    logger.warning(
-                        f"[MATCH] Score {similarity_pct}% <= 60% threshold ✗ RECHAZADO")
-                    return 0
+                    f"[MATCH] Score {similarity_pct}% > {BIOMETRIC_MIN_SCORE}% threshold ✓ VÁLIDO")
+                return max(0, min(100, similarity_pct))
+            else:
+                logger.warning(
+                    f"[MATCH] Score {similarity_pct}% <= {BIOMETRIC_MIN_SCORE}% threshold ✗ RECHAZADO")
+                return 0
+        # Solo el matcher del dispositivo usa el SDK y comparte el lock con capture;
+        # la comparación de bits de arriba es CPU pura y se ejecuta sin él
+        self.ensure_connected()
+        with self._lock:
             if self._device:
                 for method_name in ("Identify", "IdentifyTemplate", "MatchFingerprint", "MatchTemplate", "Match", "Verify"):
                     try:
@@ -279,34 +451,124 @@ class ZK9500Driver:
                     except Exception as exc:
                         logger.debug(f"[MATCH] {method_name} falló: {exc}")
 
-            matching_bits = 0
-            total_bits = len(template_a) * 8
+        total_bits = len(template_a) * 8
+        # Contar bits matching usando XOR
+        same_bits = matching_bits(template_a, template_b)
 
-            for byte_a, byte_b in zip(template_a, template_b):
-                # Contar bits matching usando XOR
-                xor_byte = byte_a ^ byte_b
-                matching_bits += 8 - bin(xor_byte).count('1')
-
-            if total_bits > 0:
-                similarity_pct = (matching_bits * 100) // total_bits
-                logger.warning(
-                    f"[MATCH] Fallback bit-comparison: {matching_bits}/{total_bits} bits = {similarity_pct}%")
-                return max(0, min(100, similarity_pct))
-
-            return 0
-
-    def identify(self, probe_template: bytes, candidates: List[bytes]) -> Tuple[bool, Optional[int]]:
-        best = -1
-        scores = []
+        if total_bits > 0:
+            similarity_pct = (same_bits * 100) // total_bits
+            logger.warning(
+                f"[MATCH] Fallback bit-comparison: {same_bits}/{total_bits} bits = {similarity_pct}%")
+            return max(0, min(100, similarity_pct))
+
+        return 0
+
+    def score_candidates(self, probe_template: bytes, candidates: Sequence[bytes]) -> List[int]:
+        """
+        Mismo score que `match` para cada candidato. Los que comparten tamaño con
+        la probe y tienen sección biométrica se comparan juntos con
+        `batch_similarity`; el resto (tamaño distinto o templates cortos que
+        dependen del matcher del dispositivo) pasa por `match` uno a uno.
+        """
+        scores = [0] * len(candidates)
+        size = len(probe_template)
+        batch_idx: List[int] = []
+        single_idx: List[int] = []
         for idx, cand in enumerate(candidates):
-            score = self.match(probe_template, cand)
-            scores.append(score)
-            if score > best:
-                best = score
-            logger.debug(
-                f"[IDENTIFY] Candidato {idx+1}/{len(candidates)}: score={score}")
-        logger.info(f"[IDENTIFY] Scores totales: {scores}, máximo={best}")
-        return (best >= 0, best if best >= 0 else None)
+            if len(cand) != size or size == 0:
+                continue
+            (batch_idx if size >= BIOMETRIC_OFFSET else single_idx).append(idx)
+
+        if batch_idx:
+            similarity = batch_similarity(
+                probe_template[BIOMETRIC_OFFSET:],
+                [memoryview(candidates[idx])[BIOMETRIC_OFFSET:] for idx in batch_idx])
+            for idx, pct in zip(batch_idx, similarity.tolist()):
+                scores[idx] = min(100, pct) if pct > BIOMETRIC_MIN_SCORE else 0
+        for idx in single_idx:
+            scores[idx] = self.match(probe_template, candidates[idx])
+        return scores
+
+    def identify(self, probe_template: bytes, candidates: Sequence[bytes], accept_score: Optional[int] = None,
+                 order: Optional[Sequence[int]] = None) -> Tuple[Optional[int], Optional[int], List[Optional[int]]]:
+        """
+        Devuelve (índice del mejor candidato, su score, scores de todos) en una
+        sola pasada. En caso de empate gana el primero; sin candidatos, (None, None, []).
+
+        Con `accept_score` los candidatos se puntúan por orden (primero los
+        índices de `order`, p.ej. la plantilla que coincidió la última vez, y
+        luego el resto) en bloques de 1, 4, 16... y se para en cuanto uno
+        alcanza ese score; los no puntuados quedan a None en la lista. Si
+        ninguno lo alcanza el resultado es el mismo que sin `accept_score`.
+        """
+        if not candidates:
+            return None, None, []
+        if accept_score is None:
+            scores = self.score_candidates(probe_template, candidates)
+            best_idx = max(range(len(scores)), key=scores.__getitem__)
+            logger.info(
+                f"[IDENTIFY] {len(candidates)} candidatos, mejor índice={best_idx}, score={scores[best_idx]}")
+            logger.debug(f"[IDENTIFY] Scores totales: {scores}")
+            return best_idx, scores[best_idx], scores
+
+        preferred = [idx for idx in dict.fromkeys(order or ()) if 0 <= idx < len(candidates)]
+        preferred_set = set(preferred)
+        ordered = preferred + [idx for idx in range(len(candidates)) if idx not in preferred_set]
+        scores: List[Optional[int]] = [None] * len(candidates)
+        best_idx, best_score = ordered[0], -1
+        start, step = 0, 1
+        while start < len(ordered):
+            batch = ordered[start:start + step]
+            for idx, score in zip(batch, self.score_candidates(probe_template, [candidates[i] for i in batch])):
+                scores[idx] = score
+                if score > best_score:
+                    best_idx, best_score = idx, score
+            start += step
+            if best_score >= accept_score:
+                logger.info(
+                    f"[IDENTIFY] Aceptado tras {start}/{len(candidates)} candidatos: "
+                    f"índice={best_idx}, score={best_score} >= {accept_score}")
+                return best_idx, best_score, scores
+            step *= 4
+        logger.info(
+            f"[IDENTIFY] {len(candidates)} candidatos, mejor índice={best_idx}, score={best_score}")
+        return best_idx, best_score, scores
+
+    @staticmethod
+    def fusable(templates: Sequence[bytes]) -> bool:
+        """Todas las plantillas tienen sección biométrica y el mismo tamaño (comparables bit a bit)."""
+        return bool(templates) and len(templates[0]) > BIOMETRIC_OFFSET and \
+            all(len(t) == len(templates[0]) for t in templates)
+
+    def select_enrollment(self, templates: Sequence[bytes], qualities: Sequence[int]) -> List[int]:
+        """
+        Índices de las capturas de registro que representan al dedo, de mejor a
+        peor. Con plantillas comparables se calcula la similitud de todos los
+        pares de una vez; se descartan las capturas que no coinciden
+        (score > BIOMETRIC_MIN_SCORE) con al menos la mitad de las demás y el
+        resto se ordena por calidad × similitud media con las otras aceptadas.
+        Si no son comparables, solo por calidad (como antes).
+        """
+        by_quality = sorted(range(len(templates)), key=lambda i: qualities[i], reverse=True)
+        if len(templates) < 3 or not self.fusable(templates):
+            return by_quality
+        similarity = pairwise_similarity([t[BIOMETRIC_OFFSET:] for t in templates])
+        np.fill_diagonal(similarity, 0)
+        support = (similarity > BIOMETRIC_MIN_SCORE).sum(axis=1)
+        inliers = [i for i in range(len(templates)) if support[i] * 2 >= len(templates) - 1]
+        outliers = sorted(set(range(len(templates))) - set(inliers))
+        if outliers:
+            logger.info(f"[REGISTER] Capturas descartadas por no coincidir con el resto: {outliers}")
+        if len(inliers) < 2:
+            return inliers
+
+        def weight(idx: int) -> float:
+            centrality = similarity[idx, inliers].sum() / (len(inliers) - 1)
+            return max(qualities[idx], 1) * centrality
+
+        ranked = sorted(inliers, key=weight, reverse=True)
+        logger.debug(f"[REGISTER] Similitud entre capturas:\n{similarity}\nOrden: {ranked}")
+        return ranked
 
     @staticmethod
     def to_base64(template: bytes) -> str:
@@ -314,8 +576,29 @@ class ZK9500Driver:
 
     @staticmethod
     def from_base64(b64: str) -> bytes:
-        return base64.b64decode(b64.encode("ascii"))
-
-
-def build_driver() -> ZK9500Driver:
-    return ZK9500Driver()
+        """Plantilla en base64 estricto; ValueError (incluido binascii.Error) si es inválida o vacía."""
+        template = base64.b64decode(b64.encode("ascii"), validate=True)
+        if not template:
+            raise ValueError("Plantilla vacía")
+        return template
+
+
+def build_driver(device_index: int = 0) -> ZK9500Driver:
+    """
+    Driver del lector `device_index` (orden del SDK). `ZK_DRIVER=simulated`
+    devuelve un lector simulado (sin pyzkfp ni hardware), configurable con
+    `ZK_SIMULATED_LATENCY`, `ZK_SIMULATED_FAILURE_RATE`, `ZK_SIMULATED_NOISE`,
+    `ZK_SIMULATED_FINGERS` y `ZK_SIMULATED_SEED`.
+    """
+    if os.getenv("ZK_DRIVER", "pyzkfp").lower() == "simulated":
+        from zk9500_simulator import SimulatedZK9500Driver
+
+        return SimulatedZK9500Driver(
+            latency=float(os.getenv("ZK_SIMULATED_LATENCY", "0.3")),
+            failure_rate=float(os.getenv("ZK_SIMULATED_FAILURE_RATE", "0.0")),
+            noise=float(os.getenv("ZK_SIMULATED_NOISE", "0.1")),
+            fingers=int(os.getenv("ZK_SIMULATED_FINGERS", "1")),
+            seed=int(os.getenv("ZK_SIMULATED_SEED", "0")),
+            device_index=device_index,
+        )
+    return ZK9500Driver(device_index)
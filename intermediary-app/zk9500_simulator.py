@@ -0,0 +1,118 @@
+"""
+Lector ZK9500 simulado, para pruebas de carga, benchmarks y CI sin hardware.
+
+`SimulatedZK9500Driver` hereda de `ZK9500Driver` (mismo matching, identify y
+base64) y sustituye solo la parte que habla con el SDK: la conexión y la
+captura. Cada captura ocupa el lector `latency` segundos, falla con
+probabilidad `failure_rate` y devuelve una lectura ruidosa de la plantilla del
+dedo presentado. Las plantillas son deterministas: el mismo `seed` y el mismo
+dedo producen siempre la misma plantilla base, y `noise` (fracción de bits
+biométricos invertidos) controla la similitud entre capturas del mismo dedo
+(score ≈ 100·(1 − noise)).
+
+Se activa con `ZK_DRIVER=simulated`; ver `build_driver`.
+"""
+import random
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from zk9500_driver import BIOMETRIC_OFFSET, CaptureCancelled, ZK9500Driver
+
+SIMULATED_TEMPLATE_SIZE = BIOMETRIC_OFFSET + 2048
+
+
+class SimulatedZK9500Driver(ZK9500Driver):
+    def __init__(self, latency: float = 0.3, failure_rate: float = 0.0, noise: float = 0.1,
+                 fingers: int = 1, seed: int = 0, template_size: int = SIMULATED_TEMPLATE_SIZE,
+                 device_index: int = 0):
+        super().__init__(device_index)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.noise = noise
+        self.fingers = max(1, fingers)
+        self.seed = seed
+        self.template_size = template_size
+        self._finger: Optional[str] = None
+        # Mismas plantillas base en todos los lectores (mismo dedo); ruido independiente por lector
+        self._rng = random.Random(seed * 1000 + device_index)
+        self._base_templates: dict[str, bytes] = {}
+        # False simula el lector desenchufado: connect, probe y capture fallan
+        self.plugged = True
+        self.captures = 0
+        self.failures = 0
+
+    # --- conexión: no hay SDK que inicializar ---
+
+    def connect(self) -> None:
+        with self._lock:
+            if not self.plugged:
+                raise RuntimeError("ZK9500 simulado desconectado")
+            self._device = self
+            logger.info(
+                f"ZK9500 simulado #{self.device_index} listo (latencia={self.latency}s, fallos={self.failure_rate:.0%}, "
+                f"ruido={self.noise:.0%}, dedos={self.fingers})")
+
+    def close(self) -> None:
+        with self._lock:
+            self._device = None
+
+    def probe(self) -> None:
+        super().probe()
+        if not self.plugged:
+            raise RuntimeError("ZK9500 simulado desconectado")
+
+    # --- dedos y plantillas ---
+
+    def present_finger(self, finger_id: Optional[str]) -> None:
+        """Fija el dedo que se apoyará en las siguientes capturas (None = uno al azar del pool)."""
+        self._finger = finger_id
+
+    def finger_template(self, finger_id: str) -> bytes:
+        """Plantilla base (sin ruido) de un dedo; determinista para `seed` y `finger_id`."""
+        template = self._base_templates.get(finger_id)
+        if template is None:
+            rng = np.random.default_rng([self.seed, zlib.crc32(finger_id.encode())])
+            template = rng.integers(0, 256, self.template_size, dtype=np.uint8).tobytes()
+            self._base_templates[finger_id] = template
+        return template
+
+    def noisy_template(self, finger_id: str, rng: random.Random) -> bytes:
+        base = np.frombuffer(self.finger_template(finger_id), dtype=np.uint8).copy()
+        biometric_bits = (self.template_size - BIOMETRIC_OFFSET) * 8
+        flips = int(biometric_bits * self.noise)
+        if flips:
+            positions = np.random.default_rng(rng.getrandbits(64)).choice(biometric_bits, flips, replace=False)
+            np.bitwise_xor.at(base, BIOMETRIC_OFFSET + positions // 8,
+                              (1 << (positions % 8)).astype(np.uint8))
+        return base.tobytes()
+
+    # --- captura ---
+
+    def capture(self, timeout_ms: int = 5000, retries: int = 20, delay: float = 0.5,
+                cancel_event: Optional[threading.Event] = None) -> Tuple[bytes, int]:
+        self.ensure_connected()
+        with self._lock:
+            if cancel_event is not None:
+                if cancel_event.wait(self.latency):
+                    raise CaptureCancelled("Captura cancelada")
+            else:
+                time.sleep(self.latency)
+            if not self.plugged:
+                raise RuntimeError("ZK9500 simulado desconectado")
+            self.captures += 1
+            if self._rng.random() < self.failure_rate:
+                self.failures += 1
+                raise RuntimeError(
+                    f"AcquireFingerprint falló tras {retries} intentos (último error: simulado)")
+            finger = self._finger or f"finger-{self._rng.randrange(self.fingers)}"
+            template = self.noisy_template(finger, self._rng)
+            quality = self._rng.randint(40, 95)
+            return template, quality
+
+    def stats(self) -> dict:
+        return {"captures": self.captures, "failures": self.failures}
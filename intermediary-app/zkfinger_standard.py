@@ -5,7 +5,8 @@ Manejo del SDK descargado, (ya no tenemos muchos usos sobre el SDK debido a el u
 import ctypes
 import os
 import sys
-from typing import Tuple, Optional, List
+import threading
+from typing import Dict, Tuple, Optional, List
 
 try:
     from loguru import logger
@@ -64,6 +65,62 @@ if not SDK_AVAILABLE:
         )
 
 
+def _declare_prototypes(lib) -> None:
+    """
+    Firmas de las funciones usadas. Sin ellas ctypes trata el HANDLE de la DB
+    cache como int de 32 bits, que en x64 trunca el puntero.
+    """
+    handle = ctypes.c_void_p
+    prototypes = {
+        "ZKFPM_CreateDBCache": ([], handle),
+        "ZKFPM_CloseDBCache": ([handle], ctypes.c_int),
+        "ZKFPM_MatchFinger": ([handle, ctypes.c_char_p, ctypes.c_uint, ctypes.c_char_p, ctypes.c_uint], ctypes.c_int),
+        "ZKFPM_GenRegTemplate": ([handle, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p,
+                                  ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint)], ctypes.c_int),
+        "ZKFPM_DBAdd": ([handle, ctypes.c_uint, ctypes.c_char_p, ctypes.c_uint], ctypes.c_int),
+        "ZKFPM_DBDel": ([handle, ctypes.c_uint], ctypes.c_int),
+        "ZKFPM_DBClear": ([handle], ctypes.c_int),
+        "ZKFPM_DBCount": ([handle, ctypes.POINTER(ctypes.c_uint)], ctypes.c_int),
+        "ZKFPM_DBIdentify": ([handle, ctypes.c_char_p, ctypes.c_uint,
+                              ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint)], ctypes.c_int),
+    }
+    for name, (argtypes, restype) in prototypes.items():
+        try:
+            func = getattr(lib, name)
+        except AttributeError:
+            logger.warning(f"{name} no exportada por la DLL")
+            continue
+        func.argtypes = argtypes
+        func.restype = restype
+
+
+if SDK_AVAILABLE:
+    _declare_prototypes(_libzkfp)
+
+# Plantillas a partir de este tamaño no pasan por ZKFPM_MatchFinger (se comparan por bits)
+SDK_MATCH_MAX_BYTES = 10000
+# Plantillas preparadas (argumentos de ctypes) que se conservan entre llamadas
+PREPARED_TEMPLATES_MAX = 4096
+# Tamaño del buffer de salida de ZKFPM_GenRegTemplate
+REG_TEMPLATE_BYTES = 4096
+
+PreparedTemplate = Tuple[ctypes.c_char_p, ctypes.c_uint]
+
+
+def _bit_similarity(template_a: bytes, template_b: bytes) -> int:
+    """Porcentaje de bits iguales: comparación de reserva cuando el SDK no puntúa."""
+    matching_bits = 0
+    total_bits = len(template_a) * 8
+    for byte_a, byte_b in zip(template_a, template_b):
+        xor_byte = byte_a ^ byte_b
+        matching_bits += 8 - bin(xor_byte).count('1')
+
+    if total_bits > 0:
+        similarity_pct = (matching_bits * 100) // total_bits
+        return max(0, min(100, similarity_pct))
+    return 0
+
+
 class ZKFingerStandard:
 
     def __init__(self):
@@ -75,8 +132,17 @@ class ZKFingerStandard:
                 "o en el PATH del sistema."
             )
         self._hdb_cache = None
+        # Handle de la DB cache ya convertido a argumento de ctypes, para no convertirlo en cada match
+        self._hdb_arg: Optional[ctypes.c_void_p] = None
         self._is_initialized = False
         self._init_lock = False
+        # plantilla -> (puntero, longitud) listos para ZKFPM_MatchFinger; ver `_prepare`
+        self._prepared: Dict[bytes, PreparedTemplate] = {}
+        self._prepared_lock = threading.Lock()
+        # Buffer de salida de ZKFPM_GenRegTemplate, reservado una vez
+        self._reg_buffer = ctypes.create_string_buffer(REG_TEMPLATE_BYTES)
+        self._reg_size = ctypes.c_uint(REG_TEMPLATE_BYTES)
+        self._reg_lock = threading.Lock()
 
     def initialize(self) -> None:
         """Inicializa el SDK (o reutiliza contexto existente de pyzkfp)."""
@@ -96,6 +162,7 @@ class ZKFingerStandard:
             self._hdb_cache = _libzkfp.ZKFPM_CreateDBCache()
             if not self._hdb_cache:
                 raise RuntimeError("ZKFPM_CreateDBCache falló")
+            self._hdb_arg = ctypes.c_void_p(self._hdb_cache)
             logger.debug("DB cache creada")
         except Exception as exc:
             logger.warning(f"No se pudo inicializar SDK: {exc}")
@@ -106,6 +173,7 @@ class ZKFingerStandard:
             if self._hdb_cache:
                 _libzkfp.ZKFPM_CloseDBCache(self._hdb_cache)
                 self._hdb_cache = None
+                self._hdb_arg = None
             if self._is_initialized:
                 ret = _libzkfp.ZKFPM_Terminate()
                 if ret != 0:
@@ -115,56 +183,66 @@ class ZKFingerStandard:
         except Exception as exc:
             logger.error(f"Cierre falló: {exc}")
 
-    def match_finger(self, template_a: bytes, template_b: bytes) -> int:
+    def _ensure_match_ready(self) -> bool:
         if not self._is_initialized:
             logger.debug("SDK no inicializado, intentando inicializar...")
             try:
                 self.initialize()
             except Exception as exc:
                 logger.error(f"Inicialización automática falló: {exc}")
-                return 0
+                return False
 
         if not self._hdb_cache:
             logger.error("DB cache no disponible")
+            return False
+        return True
+
+    @staticmethod
+    def _prepare_once(template: bytes) -> PreparedTemplate:
+        """(puntero, longitud) de `template` para ZKFPM_MatchFinger, sin guardarlos."""
+        return ctypes.c_char_p(template), ctypes.c_uint(len(template))
+
+    def _prepare(self, template: bytes) -> PreparedTemplate:
+        """
+        Como `_prepare_once`, pero creados la primera vez y reutilizados
+        después: solo para candidatos, que se repiten entre llamadas (las
+        probes son nuevas cada vez y desplazarían a los candidatos).
+        `c_char_p` apunta a los bytes del propio objeto (sin copia) y los
+        mantiene vivos, así que la entrada es válida mientras esté en la caché.
+        Un candidato repetido como el mismo objeto `bytes` (hash Python ya
+        calculado) cuesta una búsqueda en el dict, sin crear objetos de ctypes.
+        """
+        prepared = self._prepared.get(template)
+        if prepared is not None:
+            return prepared
+        prepared = self._prepare_once(template)
+        with self._prepared_lock:
+            if len(self._prepared) >= PREPARED_TEMPLATES_MAX:
+                # La más antigua primero (orden de inserción del dict)
+                self._prepared.pop(next(iter(self._prepared)), None)
+            self._prepared[template] = prepared
+        return prepared
+
+    def _sdk_score(self, match, probe: PreparedTemplate, candidate: PreparedTemplate) -> int:
+        try:
+            return match(self._hdb_arg, probe[0], probe[1], candidate[0], candidate[1])
+        except Exception as exc:
+            logger.debug(f"ZKFPM_MatchFinger falló: {exc}")
             return 0
 
-        if len(template_a) < 10000:
-            if not self._is_initialized:
-                logger.debug("SDK no inicializado, intentando inicializar...")
-                try:
-                    self.initialize()
-                except Exception as exc:
-                    logger.error(f"Inicialización automática falló: {exc}")
-                    return 0
-
-            if not self._hdb_cache:
-                logger.error("DB cache no disponible")
-                return 0
-
-            try:
-                score = _libzkfp.ZKFPM_MatchFinger(
-                    self._hdb_cache,
-                    ctypes.c_char_p(template_a),
-                    ctypes.c_uint(len(template_a)),
-                    ctypes.c_char_p(template_b),
-                    ctypes.c_uint(len(template_b))
-                )
-                if score > 0:
-                    logger.debug(f"SDK Match score: {score}")
-                    return max(0, min(100, int(score)))
-            except Exception as exc:
-                logger.debug(f"ZKFPM_MatchFinger falló: {exc}")
+    def match_finger(self, template_a: bytes, template_b: bytes) -> int:
+        if not self._ensure_match_ready():
+            return 0
 
-        matching_bits = 0
-        total_bits = len(template_a) * 8
-        for byte_a, byte_b in zip(template_a, template_b):
-            xor_byte = byte_a ^ byte_b
-            matching_bits += 8 - bin(xor_byte).count('1')
+        if len(template_a) < SDK_MATCH_MAX_BYTES:
+            # Solo lo usa el fallback de gen_reg_template, con capturas: nada que guardar
+            score = self._sdk_score(_libzkfp.ZKFPM_MatchFinger,
+                                    self._prepare_once(template_a), self._prepare_once(template_b))
+            if score > 0:
+                logger.debug(f"SDK Match score: {score}")
+                return max(0, min(100, int(score)))
 
-        if total_bits > 0:
-            similarity_pct = (matching_bits * 100) // total_bits
-            return max(0, min(100, similarity_pct))
-        return 0
+        return _bit_similarity(template_a, template_b)
 
     def gen_reg_template(
         self, template1: bytes, template2: bytes, template3: bytes
@@ -193,26 +271,27 @@ class ZKFingerStandard:
                 logger.warning("Uno o más templates vacíos, usando template1")
                 return template1
 
-            reg_template = ctypes.create_string_buffer(4096)
-            cb_reg = ctypes.c_uint(4096)
-
-            ret = _libzkfp.ZKFPM_GenRegTemplate(
-                self._hdb_cache,
-                ctypes.c_char_p(template1),
-                ctypes.c_char_p(template2),
-                ctypes.c_char_p(template3),
-                reg_template,
-                ctypes.byref(cb_reg)
-            )
+            with self._reg_lock:
+                cb_reg = self._reg_size
+                cb_reg.value = REG_TEMPLATE_BYTES
+                ret = _libzkfp.ZKFPM_GenRegTemplate(
+                    self._hdb_arg,
+                    template1,
+                    template2,
+                    template3,
+                    self._reg_buffer,
+                    ctypes.byref(cb_reg)
+                )
+                reg_len = cb_reg.value
+                result = self._reg_buffer[:reg_len] if ret == 0 else b""
 
-            if ret == 0 and cb_reg.value > 0:
-                result = bytes(reg_template[:cb_reg.value])
+            if ret == 0 and reg_len > 0:
                 logger.info(
-                    f"ZKFPM_GenRegTemplate éxito: {cb1}+{cb2}+{cb3} -> {cb_reg.value} bytes")
+                    f"ZKFPM_GenRegTemplate éxito: {cb1}+{cb2}+{cb3} -> {reg_len} bytes")
                 return result
             else:
                 logger.warning(
-                    f"ZKFPM_GenRegTemplate error: ret={ret}, cb_reg={cb_reg.value}; intentando fallback")
+                    f"ZKFPM_GenRegTemplate error: ret={ret}, cb_reg={reg_len}; intentando fallback")
 
                 try:
                     score12 = self.match_finger(template1, template2)
@@ -250,12 +329,77 @@ class ZKFingerStandard:
                 f"ZKFPM_GenRegTemplate excepción: {exc}, usando template1")
             return template1
 
+    def _require_db_cache(self) -> None:
+        if not self._is_initialized:
+            self.initialize()
+        if not self._hdb_cache:
+            raise RuntimeError("DB cache no disponible")
+
+    def db_add(self, fid: int, template: bytes) -> None:
+        """Añade una plantilla a la DB cache con el id entero `fid`."""
+        self._require_db_cache()
+        ret = _libzkfp.ZKFPM_DBAdd(self._hdb_cache, fid, template, len(template))
+        if ret != 0:
+            raise RuntimeError(f"ZKFPM_DBAdd falló para fid={fid}: código {ret}")
+
+    def db_del(self, fid: int) -> None:
+        self._require_db_cache()
+        ret = _libzkfp.ZKFPM_DBDel(self._hdb_cache, fid)
+        if ret != 0:
+            logger.warning(f"ZKFPM_DBDel retornó {ret} para fid={fid}")
+
+    def db_clear(self) -> None:
+        self._require_db_cache()
+        _libzkfp.ZKFPM_DBClear(self._hdb_cache)
+
+    def db_count(self) -> int:
+        self._require_db_cache()
+        count = ctypes.c_uint(0)
+        _libzkfp.ZKFPM_DBCount(self._hdb_cache, ctypes.byref(count))
+        return count.value
+
+    def db_identify(self, probe_template: bytes) -> Optional[Tuple[int, int]]:
+        """1:N contra toda la DB cache: (fid, score) o None si ninguna plantilla coincide."""
+        self._require_db_cache()
+        fid = ctypes.c_uint(0)
+        score = ctypes.c_uint(0)
+        ret = _libzkfp.ZKFPM_DBIdentify(self._hdb_cache, probe_template, len(probe_template),
+                                        ctypes.byref(fid), ctypes.byref(score))
+        if ret != 0:
+            logger.debug(f"ZKFPM_DBIdentify sin coincidencia (código {ret})")
+            return None
+        return fid.value, max(0, min(100, int(score.value)))
+
     def identify(
         self, probe_template: bytes, candidate_templates: List[bytes]
     ) -> Tuple[bool, Optional[int]]:
+        """
+        Mejor score de `probe_template` contra los candidatos. Con plantillas
+        de menos de `SDK_MATCH_MAX_BYTES` (formato del SDK, ~2 KB) compara con
+        ZKFPM_MatchFinger: la sonda se prepara una vez, sin guardarla, y cada
+        candidato ya visto reutiliza su preparación (`_prepare`), así que el
+        bucle solo llama a la DLL. Las plantillas más grandes se comparan por
+        bits. El verify del servicio no pasa por aquí: puntúa con
+        `ZK9500Driver.identify` (NumPy).
+        """
+        if not self._ensure_match_ready():
+            return False, None
+
+        match = _libzkfp.ZKFPM_MatchFinger
+        hdb = self._hdb_arg
+        prepared_get = self._prepared.get
+        use_sdk = len(probe_template) < SDK_MATCH_MAX_BYTES
+        probe_ptr, probe_len = self._prepare_once(probe_template) if use_sdk else (None, None)
         best_score = 0
         for cand in candidate_templates:
-            score = self.match_finger(probe_template, cand)
+            score = 0
+            if use_sdk:
+                cand_ptr, cand_len = prepared_get(cand) or self._prepare(cand)
+                try:
+                    score = match(hdb, probe_ptr, probe_len, cand_ptr, cand_len)
+                except Exception as exc:
+                    logger.debug(f"ZKFPM_MatchFinger falló: {exc}")
+            score = min(100, score) if score > 0 else _bit_similarity(probe_template, cand)
             if score > best_score:
                 best_score = score
 